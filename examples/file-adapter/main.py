@@ -2,7 +2,7 @@ import logging
 import os
 import csv
 
-from surround import Estimator, State, Assembler, Stage, Runner, RunMode, load_config
+from surround import Estimator, SlottedState, Assembler, Stage, Runner, RunMode, load_config
 from config import Config
 
 prefix = ""
@@ -53,13 +53,13 @@ class ProcessCSV(Estimator):
         print("No training implemented")
 
 
-class AssemblerState(State):
-    outputs = []
-    rows = []
-    row = None
-    word_count = None
-    company = None
-    csv_file = None
+class AssemblerState(SlottedState):
+    outputs: list = []
+    rows: list = []
+    row: dict = None
+    word_count: int = None
+    company: str = None
+    csv_file: str = None
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
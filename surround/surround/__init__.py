@@ -1,11 +1,20 @@
-import pkg_resources
-
 from .run_modes import RunMode
 from .surround import Surround
-from .state import State
+from .state import State, SlottedState
 from .config import SurroundConfig, BaseConfig, config, load_config
 from .stage import Stage, Estimator
 from .assembler import Assembler
-from .runners import Runner
+from .runners import Runner, ParallelBatchRunner, StreamingRunner
+from .pool import StatePool
+from .cache import ResultCache, CachedStage
+from .registry import ModelRegistry, MODEL_REGISTRY
+from .prefork import PreforkServer
+from .batching import RequestBatcher
+from .admission import AdmissionController, Overloaded
 
-__version__ = pkg_resources.get_distribution("surround").version
+def __getattr__(name):
+    # Resolved on first use as reading the package metadata slows down importing surround
+    if name == "__version__":
+        from importlib.metadata import version # pylint: disable=import-outside-toplevel
+        return version("surround")
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
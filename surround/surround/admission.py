@@ -0,0 +1,167 @@
+# admission.py
+#
+# Limits the number of requests running at once, queueing or rejecting the rest.
+import math
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+class Overloaded(Exception):
+    """
+    Raised by :class:`AdmissionController` when a request is rejected, e.g. to respond with
+    ``503 Service Unavailable``.
+
+    :ivar int retry_after: seconds the client should wait before retrying (for a ``Retry-After`` header)
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Admits at most ``max_in_flight`` requests at once so that latency stays bounded under load
+    spikes. Further requests wait in a queue of at most ``max_queue`` requests for up to
+    ``queue_timeout`` seconds, requests arriving when the queue is full or waiting longer than
+    that are rejected straight away with :class:`Overloaded`.
+
+    Waiting requests are admitted in the order they arrived. Must be used from a single event loop.
+
+    Example::
+
+        ADMISSION = AdmissionController(max_in_flight=32, max_queue=64, queue_timeout=0.5)
+
+        try:
+            async with ADMISSION.admit():
+                await assembler.arun(data)
+        except Overloaded as e:
+            return Response(status_code=503, headers={"Retry-After": str(e.retry_after)})
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, max_in_flight=64, max_queue=64, queue_timeout=1.0, retry_after=None):
+        """
+        :param max_in_flight: maximum number of requests admitted at once
+        :type max_in_flight: int
+        :param max_queue: maximum number of requests waiting to be admitted
+        :type max_queue: int
+        :param queue_timeout: maximum seconds a request waits to be admitted
+        :type queue_timeout: float
+        :param retry_after: seconds clients are told to wait before retrying, by default ``queue_timeout`` rounded up
+        :type retry_after: int
+        """
+
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after or max(int(math.ceil(queue_timeout)), 1)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.__waiters = deque()
+
+    async def acquire(self):
+        """
+        Wait until the request is admitted, it must then be released with :meth:`AdmissionController.release`.
+
+        :raises Overloaded: when the queue is full or the request waited longer than ``queue_timeout``
+        """
+
+        if self.in_flight < self.max_in_flight and not self.__waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self.__waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Too many requests waiting", self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.__waiters.append(waiter)
+
+        try:
+            # The slot is handed over by release(), so in_flight was already incremented
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.rejected += 1
+            raise Overloaded("Timed out waiting to be admitted", self.retry_after) from None
+        except BaseException:
+            # Cancelled (e.g. the client disconnected) after being handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.__waiters:
+                self.__waiters.remove(waiter)
+
+        self.admitted += 1
+
+    def release(self):
+        """
+        Release an admitted request, handing its slot to the next waiting request.
+        """
+
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Async context manager that acquires a slot and releases it on exit.
+
+        :raises Overloaded: when the request is rejected
+        """
+
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """
+        Returns the number of requests in flight, waiting, admitted, rejected and timed out while waiting.
+
+        :rtype: dict
+        """
+
+        return {
+            "in_flight": self.in_flight,
+            "waiting": len(self.__waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def to_prometheus(self, prefix="surround"):
+        """
+        Export the admission statistics in the Prometheus text exposition format.
+
+        :param prefix: prefix of each metric name
+        :type prefix: str
+        :rtype: str
+        """
+
+        stats = self.stats()
+        lines = []
+        for name, metric_type, description in (
+                ("in_flight", "gauge", "Number of requests currently admitted."),
+                ("waiting", "gauge", "Number of requests waiting to be admitted."),
+                ("admitted", "counter", "Number of requests admitted."),
+                ("rejected", "counter", "Number of requests rejected because the service was saturated.")):
+            metric = "%s_requests_%s%s" % (prefix, name, "_total" if metric_type == "counter" else "")
+            lines.append("# HELP %s %s" % (metric, description))
+            lines.append("# TYPE %s %s" % (metric, metric_type))
+            lines.append("%s %d" % (metric, stats[name]))
+
+        return "\n".join(lines) + "\n"
@@ -1,15 +1,25 @@
 # assembler.py
 
+import asyncio
+import inspect
 import logging
+import threading
+import contextvars
 from abc import ABC
-from datetime import datetime
+from time import perf_counter_ns
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from .config import BaseConfig
 from .run_modes import RunMode
 from .stage import Stage, Estimator
+from .scheduler import build_stage_graph
+from .instrumentation import StageInstrumentation
 
 LOGGER = logging.getLogger(__name__)
 
+# Start of the error recorded when a pipeline is cancelled because its timeout passed
+TIMEOUT_MESSAGE = "Timed out"
+
 
 class Assembler(ABC):
     """
@@ -47,30 +57,91 @@ class Assembler(ABC):
         assembler.init_assembler(batch_mode=False)
         assembler.run(data, is_training=False)
 
+    The same assembler may be ran concurrently from several threads (or asyncio tasks), each call
+    keeps its own execution context. Stages that set :attr:`surround.stage.Stage.thread_safe` to
+    ``False`` are given a separate instance per thread (see :meth:`surround.stage.Stage.clone`).
+
+    Per-stage latency percentiles, call counts and error counts are available from
+    ``assembler.instrumentation`` (see :class:`surround.instrumentation.StageInstrumentation`)::
+
+        assembler.instrumentation.summary()
+        assembler.instrumentation.to_prometheus()
+
     Constructor for an Assembler pipeline:
 
     :param assembler_name: The name of the pipeline
     :type assembler_name: str
-    :param config: Configuration instance
+    :param config: Configuration instance (defaults to a new :class:`surround.config.BaseConfig`)
     :type config: BaseConfig
     """
 
     # pylint: disable=too-many-instance-attributes
-    def __init__(self, assembler_name="", config=BaseConfig()):
+    def __init__(self, assembler_name="", config=None):
         self.assembler_name = assembler_name
-        self.config = config
+        self.config = config if config is not None else BaseConfig()
         self.stages = None
         self.batch_mode = False
         self.finaliser = None
-        self.state = None
+        self.__state = contextvars.ContextVar("surround_assembler_state", default=None)
+        self.__thread_stages = threading.local()
+        self.__stage_owners = {}
         self.metrics = None
+        self.stage_graph = None
+        self.executor = None
+        self.instrumentation = StageInstrumentation(assembler_name)
+        self.profiler = None
+        self.cache = None
+        self.ready = False
+        self.stage_init_times = {}
+        self.init_lock = threading.Lock()
+
+    def __getstate__(self):
+        # Thread pools, locks and profiles can't be pickled (e.g. when sent to spawned worker processes)
+        state = self.__dict__.copy()
+        state["executor"] = None
+        state["profiler"] = None
+        state["init_lock"] = None
+        state["_Assembler__state"] = None
+        state["_Assembler__thread_stages"] = None
+        state["_Assembler__stage_owners"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.init_lock = threading.Lock()
+        self.__state = contextvars.ContextVar("surround_assembler_state", default=None)
+        self.__thread_stages = threading.local()
+
+    @property
+    def state(self):
+        """
+        The state passed to the last run made by the current thread (or asyncio task), so
+        concurrent runs don't see each other's state.
+        """
+
+        return self.__state.get()
+
+    @state.setter
+    def state(self, state):
+        self.__state.set(state)
 
     def init_assembler(self):
 
         """
         Initializes the assembler and all of it's stages.
 
-        Calls the :meth:`surround.stage.Stage.initialise` method of all stages and the estimator.
+        Calls the :meth:`surround.stage.Stage.initialise` method of all stages and the estimator,
+        then validates the fields declared by each stage and builds the dependency graph used
+        when ``surround.parallel_stages`` is enabled.
+
+        When ``surround.parallel_stage_init`` is enabled the stages are initialised concurrently on a
+        thread pool (e.g. to load several models at once), and when ``surround.lazy_stage_init`` is
+        enabled each stage is instead initialised the first time it is ran. The time taken to
+        initialise each stage is reported by :meth:`surround.assembler.Assembler.readiness`.
+
+        The sample rate of :attr:`instrumentation` is also set from ``surround.stage_timing_sample_rate``
+        and, when ``surround.enable_stage_profiling`` or ``surround.enable_stage_memory_tracking`` is
+        enabled, a :class:`surround.profiling.StageProfiler` is created.
 
         .. note:: Should be called after :meth:`surround.assembler.Assembler.set_config`.
 
@@ -78,27 +149,73 @@ class Assembler(ABC):
         :rtype: bool
         """
 
+        self.ready = False
+        self.stage_init_times = {}
+        self.__thread_stages = threading.local()
+        self.__stage_owners = {}
+
         try:
+            self.instrumentation.set_sample_rate(self.config.surround.stage_timing_sample_rate)
+
+            surround_config = self.config.surround
+            if not self.profiler and (surround_config.enable_stage_profiling or surround_config.enable_stage_memory_tracking):
+                # Only loads cProfile and tracemalloc when profiling is enabled
+                from .profiling import StageProfiler # pylint: disable=import-outside-toplevel
+                self.profiler = StageProfiler(surround_config.enable_stage_profiling,
+                                              surround_config.enable_stage_memory_tracking,
+                                              surround_config.profile_report_top_n)
+
             if self.stages:
-                estimator_count = 0
-                for stage in self.stages:
-                    stage.initialise(self.config)
-                    if isinstance(stage, Estimator):
-                        estimator_count += 1
-                    if estimator_count > 1:
-                        raise ValueError("Stages can only have one Estimator class")
+                if len([stage for stage in self.stages if isinstance(stage, Estimator)]) > 1:
+                    raise ValueError("Stages can only have one Estimator class")
+
+                self.stage_graph = build_stage_graph(self.stages)
 
-            if self.finaliser:
-                self.finaliser.initialise(self.config)
+            stages = self._initialised_stages()
+            if not surround_config.lazy_stage_init:
+                if surround_config.parallel_stage_init and len(stages) > 1:
+                    with ThreadPoolExecutor(max_workers=surround_config.max_init_workers) as executor:
+                        for future in [executor.submit(self._initialise_stage, stage) for stage in stages]:
+                            future.result()
+                else:
+                    for stage in stages:
+                        self._initialise_stage(stage)
 
         except Exception as e:
             if self.config.surround.surface_exceptions:
                 raise e
             LOGGER.exception(e)
             return False
+
+        self.ready = True
         return True
 
-    def run(self, state=None, mode=RunMode.PREDICT):
+    def readiness(self):
+        """
+        Report whether the assembler has been initialised and which stages are warm, e.g. for the
+        health check of a web service.
+
+        Example::
+
+            assembler.readiness()
+            # {'ready': True, 'stages': [{'name': 'Baseline', 'warm': True, 'init_time': 1.52}]}
+
+        :return: whether :meth:`surround.assembler.Assembler.init_assembler` succeeded and, for each
+                 stage and the finaliser, whether it has been initialised and how long it took in seconds
+        :rtype: dict
+        """
+
+        init_times = dict(self.stage_init_times)
+        return {
+            "ready": self.ready,
+            "stages": [{
+                "name": type(stage).__name__,
+                "warm": stage in init_times,
+                "init_time": init_times.get(stage),
+            } for stage in self._initialised_stages()],
+        }
+
+    def run(self, state=None, mode=RunMode.PREDICT, timeout=None):
         """
         Run the pipeline using the input data provided.
 
@@ -108,6 +225,22 @@ class Assembler(ABC):
         If ``surround.enable_stage_output_dump`` is enabled in the Config instance then each stage and
         estimator's :meth:`surround.stage.Stage.dump_output` method will be called.
 
+        If ``surround.parallel_stages`` is enabled then stages that don't depend on each other
+        (see :attr:`surround.stage.Stage.reads`) are ran concurrently on a thread pool. Once a stage
+        records an error no further stages are started, the metrics stage and finaliser are always
+        ran after all other stages have finished.
+
+        If a cache has been set with :meth:`surround.assembler.Assembler.set_cache` and the
+        state's inputs are found in it, the stages are skipped.
+
+        If a ``timeout`` is given, the pipeline is cancelled cooperatively once it has passed: the
+        running stage finishes but no further stages are started, and an error starting with
+        :data:`TIMEOUT_MESSAGE` is recorded (or a :class:`TimeoutError` raised when
+        ``surround.surface_exceptions`` is enabled).
+
+        Stages defined with ``async def`` are ran to completion on a new event loop,
+        use :meth:`surround.assembler.Assembler.arun` when calling from a coroutine.
+
         This method doesn't return anything, instead results should be stored in the ``state``
         object passed in the parameters.
 
@@ -115,63 +248,426 @@ class Assembler(ABC):
         :type state: :class:`surround.State`
         :param is_training: Run the pipeline in training mode or not
         :type is_training: bool
+        :param timeout: Seconds after which no further stages are started
+        :type timeout: float
         """
-        is_training = mode == RunMode.TRAIN
 
         LOGGER.info("Starting '%s'", self.assembler_name)
 
-        if not self.stages:
-            raise ValueError("There are no stages to run!")
-
         if not state:
             raise ValueError("state is required to run an assembler")
+        self._check_stages(mode)
         self.state = state
+        deadline = _get_deadline(timeout)
 
         state.freeze()
 
-        has_estimator = [s for s in self.stages if isinstance(s, Estimator)]
-        if is_training and not has_estimator:
-            raise ValueError("No Estimator class added to stages.")
+        if not self._load_cached(state, mode):
+            if self.config.surround.parallel_stages:
+                self._run_stages_parallel(state, mode, deadline)
+            else:
+                for stage in self.stages:
+                    if self._check_deadline(stage, [state], deadline):
+                        break
+                    self._run_stage_safe(stage, state, mode)
+                    if state.errors:
+                        break
 
-        def _run_stage_safe(a_stage):
-            start_time = datetime.now()
-            try:
-                if isinstance(a_stage, Estimator):
-                    if is_training:
-                        a_stage.fit(state, self.config)
-                    else:
-                        a_stage.estimate(state, self.config)
-                else:
-                    a_stage.operate(state, self.config)
+            self._store_cached(state, mode)
 
-                if self.config.surround.enable_stage_output_dump:
-                    a_stage.dump_output(state, self.config)
+        if self.metrics and mode != RunMode.PREDICT:
+            self._run_stage_safe(self.metrics, state, mode)
 
-            except Exception as e:
-                if self.config.surround.surface_exceptions:
-                    raise e
-                state.errors.append(str(e))
-                LOGGER.exception(e)
-            execution_time = datetime.now() - start_time
-            state.execution_time.append(str(execution_time))
-            LOGGER.info("%s took %s secs", type(a_stage).__name__, execution_time)
+        if self.finaliser:
+            self._run_stage_safe(self.finaliser, state, mode)
 
-        for stage in self.stages:
-            _run_stage_safe(stage)
-            if state.errors:
-                break
+        if state.errors:
+            LOGGER.error(state.errors)
+
+        state.thaw()
+
+    async def arun(self, state=None, mode=RunMode.PREDICT, timeout=None):
+        """
+        Run the pipeline using the input data provided without blocking the event loop.
+
+        Stages whose ``operate``, ``estimate`` or ``fit`` method is defined with ``async def``
+        are awaited directly, all other stages are offloaded to a thread so that many pipelines
+        can be in flight at once (e.g. in an ``async`` web request handler).
+
+        If ``surround.parallel_stages`` is enabled then stages that don't depend on each other
+        are awaited concurrently. Otherwise this behaves the same as
+        :meth:`surround.assembler.Assembler.run`, including the cooperative ``timeout``.
+
+        Example::
+
+            class FetchFeatures(Stage):
+                async def operate(self, state, config):
+                    state.features = await feature_store.get(state.input_data)
+
+            data = AssemblyState("some data")
+            await assembler.arun(data)
+
+        :param state: Data passed between each stage in the pipeline
+        :type state: :class:`surround.State`
+        :param mode: Mode to run the pipeline in
+        :type mode: :class:`surround.run_modes.RunMode`
+        :param timeout: Seconds after which no further stages are started
+        :type timeout: float
+        """
+
+        LOGGER.info("Starting '%s'", self.assembler_name)
+
+        if not state:
+            raise ValueError("state is required to run an assembler")
+        self._check_stages(mode)
+        self.state = state
+        deadline = _get_deadline(timeout)
+
+        state.freeze()
+
+        if not self._load_cached(state, mode):
+            if self.config.surround.parallel_stages:
+                await self._arun_stages_parallel(state, mode, deadline)
+            else:
+                for stage in self.stages:
+                    if self._check_deadline(stage, [state], deadline):
+                        break
+                    await self._arun_stage_safe(stage, state, mode)
+                    if state.errors:
+                        break
+
+            self._store_cached(state, mode)
 
         if self.metrics and mode != RunMode.PREDICT:
-            _run_stage_safe(self.metrics)
+            await self._arun_stage_safe(self.metrics, state, mode)
 
         if self.finaliser:
-            _run_stage_safe(self.finaliser)
+            await self._arun_stage_safe(self.finaliser, state, mode)
 
         if state.errors:
             LOGGER.error(state.errors)
 
         state.thaw()
 
+    def run_batch(self, states=None, mode=RunMode.PREDICT, timeout=None):
+        """
+        Run the pipeline over a batch of states, amortising the per-stage overhead.
+
+        Stages that implement :meth:`surround.stage.Stage.operate_batch` (or
+        :meth:`surround.stage.Estimator.estimate_batch`) are called once with every
+        state still active in the batch, all other stages are called once per state.
+
+        Errors are isolated per state: a state that has errors after a stage is
+        dropped from the remaining stages while the rest of the batch continues.
+        When a batch hook raises, the error is recorded against every state it was called with.
+        The metrics stage and finaliser are run against every state in the batch.
+
+        The time taken by a batch hook is recorded as one call per state, each taking the time
+        of the whole batch divided by the number of states in the call.
+
+        If a ``timeout`` is given, no further stages are started once it has passed, see
+        :meth:`surround.assembler.Assembler.run`.
+
+        Example::
+
+            states = [AssemblyState(message) for message in messages]
+            assembler.run_batch(states)
+
+            outputs = [state.output_data for state in states]
+
+        :param states: Data passed between each stage in the pipeline, one per record
+        :type states: list of :class:`surround.State`
+        :param mode: Mode to run the pipeline in
+        :type mode: :class:`surround.run_modes.RunMode`
+        :param timeout: Seconds after which no further stages are started
+        :type timeout: float
+        """
+
+        LOGGER.info("Starting '%s' with a batch of %d", self.assembler_name, len(states or []))
+
+        if not states or not isinstance(states, list):
+            raise ValueError("a list of states is required to run a batch")
+        self._check_stages(mode)
+        deadline = _get_deadline(timeout)
+
+        for state in states:
+            state.freeze()
+
+        uncached = [state for state in states if not self._load_cached(state, mode)]
+        active = uncached
+        for stage in self.stages:
+            if not active or self._check_deadline(stage, active, deadline):
+                break
+            self._run_stage_batch_safe(stage, active, mode)
+            active = [state for state in active if not state.errors]
+
+        for state in uncached:
+            self._store_cached(state, mode)
+
+        if self.metrics and mode != RunMode.PREDICT:
+            self._run_stage_batch_safe(self.metrics, states, mode)
+
+        if self.finaliser:
+            self._run_stage_batch_safe(self.finaliser, states, mode)
+
+        for state in states:
+            if state.errors:
+                LOGGER.error(state.errors)
+            state.thaw()
+
+    def _load_cached(self, state, mode):
+        if not self.cache or mode == RunMode.TRAIN:
+            return False
+        return self.cache.load(state)
+
+    def _store_cached(self, state, mode):
+        if self.cache and mode != RunMode.TRAIN and not state.errors:
+            self.cache.store(state)
+
+    def _initialised_stages(self):
+        return list(self.stages or []) + ([self.finaliser] if self.finaliser else [])
+
+    def _initialise_stage(self, stage):
+        start_time = perf_counter_ns()
+        stage.initialise(self.config)
+        elapsed = (perf_counter_ns() - start_time) / 1e9
+
+        self.stage_init_times[stage] = elapsed
+        LOGGER.info("Initialised %s in %.3f secs", type(stage).__name__, elapsed)
+
+    def _ensure_initialised(self, stage):
+        """
+        Initialise the stage if it hasn't been yet when ``surround.lazy_stage_init`` is enabled.
+        """
+
+        if not self.config.surround.lazy_stage_init or stage in self.stage_init_times or stage is self.metrics:
+            return
+
+        with self.init_lock:
+            if stage not in self.stage_init_times:
+                self._initialise_stage(stage)
+
+    def _get_stage_instance(self, stage):
+        """
+        Returns the instance of the stage to run in the current thread, stages that aren't thread
+        safe are ran by the first thread to use them and cloned for every other thread.
+        """
+
+        if getattr(stage, "thread_safe", True):
+            return stage
+
+        thread_id = threading.get_ident()
+        with self.init_lock:
+            owner = self.__stage_owners.setdefault(id(stage), thread_id)
+        if owner == thread_id:
+            return stage
+
+        clones = getattr(self.__thread_stages, "clones", None)
+        if clones is None:
+            clones = self.__thread_stages.clones = {}
+
+        clone = clones.get(id(stage))
+        if clone is None:
+            LOGGER.debug("Cloning %s for thread %d", type(stage).__name__, thread_id)
+            clone = clones[id(stage)] = stage.clone()
+        return clone
+
+    def _get_executor(self):
+        if not self.executor:
+            with self.init_lock:
+                if not self.executor:
+                    self.executor = ThreadPoolExecutor(max_workers=self.config.surround.max_stage_workers)
+        return self.executor
+
+    def _get_stage_graph(self):
+        graph = self.stage_graph
+        if graph is None:
+            graph = self.stage_graph = build_stage_graph(self.stages)
+        return graph
+
+    def _check_deadline(self, stage, states, deadline):
+        """
+        Records a timeout against the states when the deadline has passed, returning whether it has.
+        """
+
+        if deadline is None or perf_counter_ns() < deadline:
+            return False
+
+        message = "%s before running %s" % (TIMEOUT_MESSAGE, type(stage).__name__)
+        if self.config.surround.surface_exceptions:
+            raise TimeoutError(message)
+
+        for state in states:
+            state.errors.append(message)
+        LOGGER.warning("%s for %d state(s)", message, len(states))
+        return True
+
+    def _check_stages(self, mode):
+        if not self.stages:
+            raise ValueError("There are no stages to run!")
+
+        has_estimator = [s for s in self.stages if isinstance(s, Estimator)]
+        if mode == RunMode.TRAIN and not has_estimator:
+            raise ValueError("No Estimator class added to stages.")
+
+    def _run_stages_parallel(self, state, mode, deadline=None):
+        executor = self._get_executor()
+        pending = {index: set(dependencies) for index, dependencies in enumerate(self._get_stage_graph())}
+        running = {}
+
+        while pending or running:
+            if not state.errors:
+                ready = [index for index, dependencies in pending.items() if not dependencies]
+                if ready and self._check_deadline(self.stages[ready[0]], [state], deadline):
+                    ready = []
+                for index in ready:
+                    del pending[index]
+                    future = executor.submit(self._run_stage_safe, self.stages[index], state, mode)
+                    running[future] = index
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                for dependencies in pending.values():
+                    dependencies.discard(index)
+
+                # Re-raises the stage's exception when surround.surface_exceptions is enabled
+                future.result()
+
+    async def _arun_stages_parallel(self, state, mode, deadline=None):
+        pending = {index: set(dependencies) for index, dependencies in enumerate(self._get_stage_graph())}
+        running = {}
+
+        while pending or running:
+            if not state.errors:
+                ready = [index for index, dependencies in pending.items() if not dependencies]
+                if ready and self._check_deadline(self.stages[ready[0]], [state], deadline):
+                    ready = []
+                for index in ready:
+                    del pending[index]
+                    task = asyncio.ensure_future(self._arun_stage_safe(self.stages[index], state, mode))
+                    running[task] = index
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = running.pop(task)
+                for dependencies in pending.values():
+                    dependencies.discard(index)
+
+                # Re-raises the stage's exception when surround.surface_exceptions is enabled
+                task.result()
+
+    def _run_stage_safe(self, stage, state, mode):
+        start_time = self.instrumentation.start(type(stage).__name__)
+        error_counts = [len(state.errors)]
+        try:
+            self._ensure_initialised(stage)
+            instance = self._get_stage_instance(stage)
+
+            if self.profiler:
+                self.profiler.call(type(stage).__name__, _call_stage, instance, state, self.config, mode)
+            else:
+                _call_stage(instance, state, self.config, mode)
+
+            if self.config.surround.enable_stage_output_dump:
+                instance.dump_output(state, self.config)
+
+        except Exception as e:
+            self._handle_stage_error(stage, e, [state])
+        self._record_execution_time(stage, [state], start_time, error_counts)
+
+    async def _arun_stage_safe(self, stage, state, mode):
+        method = _get_stage_method(stage, mode)
+
+        if not asyncio.iscoroutinefunction(method):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._run_stage_safe, stage, state, mode)
+            return
+
+        start_time = self.instrumentation.start(type(stage).__name__)
+        error_counts = [len(state.errors)]
+        try:
+            if self.config.surround.lazy_stage_init and stage not in self.stage_init_times:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self._ensure_initialised, stage)
+
+            instance = self._get_stage_instance(stage)
+            await _get_stage_method(instance, mode)(state, self.config)
+
+            if self.config.surround.enable_stage_output_dump:
+                instance.dump_output(state, self.config)
+
+        except Exception as e:
+            self._handle_stage_error(stage, e, [state])
+        self._record_execution_time(stage, [state], start_time, error_counts)
+
+    def _handle_stage_error(self, stage, error, states):
+        if self.config.surround.surface_exceptions:
+            self.instrumentation.record_error(type(stage).__name__, len(states))
+            raise error
+        for state in states:
+            state.errors.append(str(error))
+        LOGGER.exception(error)
+
+    def _record_execution_time(self, stage, states, start_time, error_counts):
+        """
+        Records the time taken by a stage across the states it was called with, amortised per state,
+        and the number of states that gained errors (``error_counts`` being their errors before the stage ran).
+        Calls that weren't sampled (``start_time`` is ``None``) aren't timed and record ``None``.
+        """
+
+        stage_name = type(stage).__name__
+
+        if start_time is None:
+            for state in states:
+                state.execution_time.append(None)
+        else:
+            elapsed = (perf_counter_ns() - start_time) // len(states)
+            for state in states:
+                state.execution_time.append(elapsed / 1e9)
+
+            self.instrumentation.observe(stage_name, elapsed, len(states))
+
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug("%s took %.6f secs for %d state(s)", stage_name, elapsed * len(states) / 1e9, len(states))
+
+        failed = sum(1 for state, count in zip(states, error_counts) if len(state.errors) > count)
+        if failed:
+            self.instrumentation.record_error(stage_name, failed)
+
+    def _run_stage_batch_safe(self, stage, states, mode):
+        batch_hook = _get_batch_hook(stage, mode)
+
+        if not batch_hook:
+            for state in states:
+                self._run_stage_safe(stage, state, mode)
+            return
+
+        start_time = self.instrumentation.start(type(stage).__name__, len(states))
+        error_counts = [len(state.errors) for state in states]
+        try:
+            self._ensure_initialised(stage)
+            instance = self._get_stage_instance(stage)
+            batch_hook = _get_batch_hook(instance, mode)
+
+            if self.profiler:
+                self.profiler.call(type(stage).__name__, batch_hook, states, self.config)
+            else:
+                batch_hook(states, self.config)
+
+            if self.config.surround.enable_stage_output_dump:
+                for state in states:
+                    instance.dump_output(state, self.config)
+
+        except Exception as e:
+            self._handle_stage_error(stage, e, states)
+        self._record_execution_time(stage, states, start_time, error_counts)
+
     def set_config(self, config):
         """
         Set the configuration data to be used during pipeline execution.
@@ -198,6 +694,7 @@ class Assembler(ABC):
             raise ValueError("stages must be a list of Stages's only!")
 
         self.stages = stages
+        self.stage_graph = None
 
         return self
 
@@ -229,3 +726,65 @@ class Assembler(ABC):
         self.metrics = metrics
 
         return self
+
+    def set_cache(self, cache):
+        """
+        Set the cache used to skip the stages for inputs that have already been processed.
+
+        Before running the stages, the output fields of the state are looked up in the cache
+        using its input fields. On a hit the stages are skipped (the metrics stage and finaliser
+        still run), on a miss the outputs are stored in the cache once the stages complete
+        without errors. The cache isn't used in ``RunMode.TRAIN``.
+
+        Example::
+
+            assembler.set_cache(ResultCache(["input_data"], ["output_data"], max_size=10000, ttl=3600))
+
+        :param cache: the cache to use, or ``None`` to disable caching
+        :type cache: :class:`surround.cache.ResultCache`
+        """
+
+        self.cache = cache
+
+        return self
+
+
+def _get_deadline(timeout):
+    return perf_counter_ns() + int(timeout * 1e9) if timeout else None
+
+def _call_stage(stage, state, config, mode):
+    result = _get_stage_method(stage, mode)(state, config)
+
+    # Coroutine stages ran outside of Assembler.arun
+    if inspect.isawaitable(result):
+        asyncio.run(result)
+
+def _get_stage_method(stage, mode):
+    """
+    Returns the bound method of the stage that should be called for the given mode.
+    """
+
+    if isinstance(stage, Estimator):
+        if mode == RunMode.TRAIN:
+            return stage.fit
+        return stage.estimate
+    return stage.operate
+
+def _get_batch_hook(stage, mode):
+    """
+    Returns the bound batch method of the stage for the given mode, or ``None``
+    when the stage hasn't overridden the default per-state fallback.
+    """
+
+    if isinstance(stage, Estimator):
+        if mode == RunMode.TRAIN:
+            return None
+        name = "estimate_batch"
+        base = Estimator
+    else:
+        name = "operate_batch"
+        base = Stage
+
+    if getattr(type(stage), name) is getattr(base, name):
+        return None
+    return getattr(stage, name)
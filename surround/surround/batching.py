@@ -0,0 +1,189 @@
+# batching.py
+#
+# Groups concurrent requests into batches ran through Assembler.run_batch.
+import asyncio
+import logging
+import threading
+
+from .run_modes import RunMode
+
+LOGGER = logging.getLogger(__name__)
+
+class RequestBatcher:
+    """
+    Queues states submitted by concurrent requests and runs them through
+    :meth:`surround.assembler.Assembler.run_batch` in batches, so stages implementing
+    :meth:`surround.stage.Stage.operate_batch` (or :meth:`surround.stage.Estimator.estimate_batch`)
+    process many requests with one call.
+
+    A batch is started once ``max_batch_size`` states are queued or ``max_wait`` seconds after
+    its first state was queued. Batches are ran one at a time on a thread, so the batches grow
+    with the load: requests arriving while a batch is running are picked up together by the next one.
+
+    Example::
+
+        BATCHER = RequestBatcher(assembler, max_batch_size=32, max_wait=0.005)
+
+        @APP.post("/estimate")
+        async def post_estimate(request_input: EstimateInput):
+            data = AssemblerState(input_data=request_input.message)
+            await BATCHER.submit(data)
+            return EstimateOutput(output=data.output_data)
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, assembler, max_batch_size=32, max_wait=0.005, mode=RunMode.PREDICT, timeout=None):
+        """
+        :param assembler: the initialised assembler to run the batches with
+        :type assembler: :class:`surround.assembler.Assembler`
+        :param max_batch_size: maximum number of states in a batch
+        :type max_batch_size: int
+        :param max_wait: maximum seconds to wait for a batch to fill up
+        :type max_wait: float
+        :param mode: the mode to run the batches in
+        :type mode: :class:`surround.run_modes.RunMode`
+        :param timeout: seconds after which no further stages are started for a batch
+        :type timeout: float
+        """
+
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.assembler = assembler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.mode = mode
+        self.timeout = timeout
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = {}
+        self.max_queue_depth = 0
+        self.__queue = None
+        self.__task = None
+        self.__loop = None
+        self.__lock = threading.Lock()
+
+    async def submit(self, state):
+        """
+        Queue the state and wait until the batch it was added to has been ran.
+
+        :param state: the state to run through the pipeline
+        :type state: :class:`surround.State`
+        """
+
+        loop = asyncio.get_running_loop()
+
+        if self.__task is None or self.__task.done() or self.__loop is not loop:
+            # Created lazily so the batcher can be created before forking or starting the event loop
+            self.__loop = loop
+            self.__queue = asyncio.Queue()
+            self.__task = asyncio.ensure_future(self.__process())
+
+        future = loop.create_future()
+        self.__queue.put_nowait((state, future))
+
+        with self.__lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.__queue.qsize())
+
+        await future
+
+    def queue_depth(self):
+        """
+        Returns the number of states waiting for a batch.
+
+        :rtype: int
+        """
+
+        return self.__queue.qsize() if self.__queue else 0
+
+    def stats(self):
+        """
+        Returns the number of batches and requests ran, the current and maximum queue depth
+        and the number of batches of each size.
+
+        :rtype: dict
+        """
+
+        with self.__lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": self.requests / self.batches if self.batches else None,
+                "queue_depth": self.queue_depth(),
+                "max_queue_depth": self.max_queue_depth,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
+
+    def to_prometheus(self, prefix="surround"):
+        """
+        Export the queue depth and batch sizes in the Prometheus text exposition format.
+
+        :param prefix: prefix of each metric name
+        :type prefix: str
+        :rtype: str
+        """
+
+        stats = self.stats()
+        lines = [
+            "# HELP %s_request_queue_depth Number of requests waiting for a batch." % prefix,
+            "# TYPE %s_request_queue_depth gauge" % prefix,
+            "%s_request_queue_depth %d" % (prefix, stats["queue_depth"]),
+            "# HELP %s_request_batch_size Number of requests in each batch." % prefix,
+            "# TYPE %s_request_batch_size histogram" % prefix,
+        ]
+
+        cumulative = 0
+        for size in range(1, self.max_batch_size + 1):
+            cumulative += stats["batch_sizes"].get(size, 0)
+            lines.append('%s_request_batch_size_bucket{le="%d"} %d' % (prefix, size, cumulative))
+        lines.append('%s_request_batch_size_bucket{le="+Inf"} %d' % (prefix, cumulative))
+        lines.append("%s_request_batch_size_sum %d" % (prefix, stats["requests"]))
+        lines.append("%s_request_batch_size_count %d" % (prefix, stats["batches"]))
+
+        return "\n".join(lines) + "\n"
+
+    async def __process(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.__queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                if not self.__queue.empty():
+                    batch.append(self.__queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                get = asyncio.ensure_future(self.__queue.get())
+                done, _ = await asyncio.wait({get}, timeout=timeout)
+                if not done:
+                    get.cancel()
+                    break
+                batch.append(get.result())
+
+            # Requests that were cancelled while queued (e.g. the client disconnected) are skipped
+            batch = [(state, future) for state, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            with self.__lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+            try:
+                await loop.run_in_executor(None, self.assembler.run_batch,
+                                           [state for state, _ in batch], self.mode, self.timeout)
+            except Exception as e: # pylint: disable=broad-except
+                LOGGER.exception(e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
@@ -0,0 +1,237 @@
+# cache.py
+#
+# Memoises the output fields of a pipeline (or part of one) keyed on its input fields.
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .stage import Stage, Estimator
+
+class ResultCache:
+    # pylint: disable=too-many-instance-attributes
+    """
+    LRU cache of the output fields of a state, keyed by a hash of its input fields.
+
+    Used by :meth:`surround.assembler.Assembler.set_cache` to skip the whole pipeline for repeated
+    inputs, or by :class:`CachedStage` to skip a prefix of the stages.
+
+    Values are stored pickled, so every hit gets its own copy of the cached outputs. When
+    ``cache_dir`` is given, entries are also written to disk so that they survive between runs
+    (e.g. batch reruns skip records that were already computed), the disk cache is not limited
+    in size but entries older than ``ttl`` are ignored.
+
+    Example::
+
+        cache = ResultCache(["input_data"], ["output_data"], max_size=10000, ttl=3600,
+                            cache_dir=os.path.join(config.project_root, "cache"))
+        assembler.set_cache(cache)
+
+    :ivar int hits: number of lookups found in the cache
+    :ivar int misses: number of lookups not found in the cache
+    :ivar int evictions: number of entries evicted from memory because the cache was full
+    """
+
+    def __init__(self, input_fields, output_fields, max_size=1024, ttl=None, cache_dir=None, key_func=None):
+        """
+        :param input_fields: names of the State fields the outputs depend on
+        :type input_fields: list of str
+        :param output_fields: names of the State fields to cache
+        :type output_fields: list of str
+        :param max_size: maximum number of entries kept in memory
+        :type max_size: int
+        :param ttl: seconds after which an entry expires (``None`` to never expire)
+        :type ttl: float
+        :param cache_dir: directory to persist entries in (``None`` to only cache in memory)
+        :type cache_dir: str
+        :param key_func: function returning the cache key of a state, by default a hash of the input fields
+        :type key_func: callable
+        """
+
+        self.input_fields = tuple(input_fields)
+        self.output_fields = tuple(output_fields)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.key_func = key_func or self.hash_inputs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def hash_inputs(self, state):
+        """
+        Returns a hash of the pickled input fields of the state.
+
+        :param state: the state to hash
+        :type state: :class:`surround.State`
+        :rtype: str
+        """
+
+        inputs = tuple(getattr(state, field) for field in self.input_fields)
+        return hashlib.blake2b(pickle.dumps(inputs, protocol=4), digest_size=20).hexdigest()
+
+    def load(self, state):
+        """
+        Set the output fields of the state from the cache.
+
+        :param state: the state to look up and set the outputs of
+        :type state: :class:`surround.State`
+        :return: whether the state was found in the cache
+        :rtype: bool
+        """
+
+        key = self.key_func(state)
+        payload = self.__get_memory(key)
+
+        if payload is None and self.cache_dir:
+            payload = self.__get_disk(key)
+            if payload is not None:
+                self.__put_memory(key, payload)
+
+        with self.__lock:
+            if payload is None:
+                self.misses += 1
+                return False
+            self.hits += 1
+
+        for field, value in pickle.loads(payload).items():
+            setattr(state, field, value)
+
+        return True
+
+    def store(self, state):
+        """
+        Store the output fields of the state in the cache.
+
+        :param state: the state whose outputs should be cached
+        :type state: :class:`surround.State`
+        """
+
+        key = self.key_func(state)
+        payload = pickle.dumps({field: getattr(state, field) for field in self.output_fields}, protocol=4)
+        self.__put_memory(key, payload)
+
+        if self.cache_dir:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, os.path.join(self.cache_dir, key + ".pkl"))
+
+    def clear(self):
+        """
+        Remove every entry from memory (entries on disk are kept).
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self):
+        """
+        Returns the number of hits, misses, evictions and entries in memory.
+
+        :rtype: dict
+        """
+
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.__entries)}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_ResultCache__lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __get_memory(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+
+            stored_at, payload = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.__entries[key]
+                return None
+
+            self.__entries.move_to_end(key)
+            return payload
+
+    def __put_memory(self, key, payload):
+        with self.__lock:
+            self.__entries[key] = (time.monotonic(), payload)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def __get_disk(self, key):
+        path = os.path.join(self.cache_dir, key + ".pkl")
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+class CachedStage(Stage):
+    """
+    Stage that runs a sequence of stages (e.g. the expensive prefix of a pipeline) and
+    caches their outputs with a :class:`ResultCache`, skipping them for inputs seen before.
+
+    The stages are initialised when this stage is initialised. Outputs are only cached when the
+    stages complete without errors, and the stage declares the cache's input and output
+    fields as the fields it reads and writes. The stages are ran with ``operate``, so they can't
+    be an :class:`surround.stage.Estimator` (which is ran with ``estimate`` or ``fit``).
+
+    Example::
+
+        cache = ResultCache(["input_data"], ["features"], max_size=10000)
+        assembler.set_stages([InputValidator(), CachedStage([Tokenise(), Embed()], cache), Predict()])
+    """
+
+    def __init__(self, stages, cache):
+        """
+        :param stages: stages to run when the inputs aren't cached
+        :type stages: list of :class:`surround.stage.Stage`
+        :param cache: the cache to store the outputs in
+        :type cache: :class:`ResultCache`
+        """
+
+        if not isinstance(stages, list) or not all(isinstance(stage, Stage) for stage in stages):
+            raise ValueError("stages must be a list of Stages's only!")
+
+        if any(isinstance(stage, Estimator) for stage in stages):
+            raise TypeError("CachedStage can't run an Estimator, add it to the assembler after the CachedStage")
+
+        self.stages = stages
+        self.cache = cache
+        self.reads = cache.input_fields
+        self.writes = cache.output_fields
+
+    def initialise(self, config):
+        for stage in self.stages:
+            stage.initialise(config)
+
+    def operate(self, state, config):
+        if self.cache.load(state):
+            return
+
+        for stage in self.stages:
+            stage.operate(state, config)
+            if state.errors:
+                return
+
+        self.cache.store(state)
@@ -1,50 +1,149 @@
 import os
 import sys
+import logging
+import hashlib
+import tempfile
 import functools
+import threading
 from dataclasses import dataclass, field
 from typing import Optional
 from pathlib import Path
 from datetime import datetime
-from hydra.core.config_store import ConfigStore
-from hydra.experimental import compose, initialize_config_dir
 from .project import PROJECTS
 from .util import generate_docker_volume_path
 
-def get_project_root(current_directory: str = os.getcwd()) -> Optional[str]:
+LOGGER = logging.getLogger(__name__)
+
+# Environment variables that skip searching for the project (e.g. in containers)
+PROJECT_ROOT_ENV = "SURROUND_PROJECT_ROOT"
+PACKAGE_PATH_ENV = "SURROUND_PACKAGE_PATH"
+
+# Environment variable enabling config snapshots in load_config, and the snapshot format version
+SNAPSHOT_DIR_ENV = "SURROUND_CONFIG_SNAPSHOT_DIR"
+SNAPSHOT_VERSION = 1
+
+# Directories that never contain the project package, so aren't searched for its config.yaml
+SKIPPED_DIRECTORIES = frozenset([
+    "input", "output", "models", "notebooks", "tests",
+    "node_modules", "__pycache__", "venv", "site-packages",
+])
+
+# Results of the project searches, cleared when the working directory changes
+_DISCOVERY_CACHE = {}
+_DISCOVERY_LOCK = threading.Lock()
+_DISCOVERY_CWD = None
+
+def get_project_root(current_directory: Optional[str] = None) -> Optional[str]:
     """
     Attempts to find the root path of the project by looking for the .surround
     folder that should be present in all generated Surround projects.
 
-    :param current_directory: directory to start searching from
+    The result is cached until the working directory changes (see :func:`clear_project_cache`),
+    the search can be skipped by setting the ``SURROUND_PROJECT_ROOT`` environment variable.
+
+    :param current_directory: directory to start searching from (defaults to the current working directory)
     :type current_directory: str
     """
-    home = str(Path.home())
 
-    while True:
-        list_ = os.listdir(current_directory)
-        parent_directory = os.path.dirname(current_directory)
-        if current_directory in (home, parent_directory):
-            break
-        if ".surround" in list_:
-            return current_directory
-        current_directory = parent_directory
+    override = os.environ.get(PROJECT_ROOT_ENV)
+    if override:
+        return os.path.abspath(override)
 
-def find_package_path(project_root: str = get_project_root()) -> Optional[str]:
+    if current_directory is None:
+        current_directory = os.getcwd()
+    current_directory = os.path.abspath(current_directory)
+
+    return _cached(("root", current_directory), lambda: _search_project_root(current_directory),
+                   lambda root: os.path.exists(os.path.join(root, ".surround")))
+
+def find_package_path(project_root: Optional[str] = None) -> Optional[str]:
     """
     Attempts to find the projects package path by looking for the config.yaml file.
     This should only be used when the package name seems to be different from the root folder name.
 
-    :param project_root: root of the project
+    Directories that can't contain the package (e.g. ``input``, ``output``, ``models``, hidden
+    directories and virtualenvs) aren't searched. The result is cached until the working directory
+    changes, the search can be skipped by setting the ``SURROUND_PACKAGE_PATH`` environment variable.
+
+    :param project_root: root of the project (defaults to the project containing the current working directory)
     :type project_root: str
     :return: path to the package or None if unable to find it
     :rtype: str
     """
 
+    override = os.environ.get(PACKAGE_PATH_ENV)
+    if override:
+        return os.path.abspath(override)
+
+    if project_root is None:
+        project_root = get_project_root()
+
     if project_root:
-        results = [path for path, _, files in os.walk(project_root) if 'config.yaml' in files]
-        results = [path for path in results if os.path.basename(path) not in PROJECTS['new']['dirs'] and ".hydra" not in path]
+        project_root = os.path.abspath(project_root)
+        return _cached(("package", project_root), lambda: _search_package_path(project_root),
+                       lambda path: os.path.isfile(os.path.join(path, "config.yaml")))
+
+    return None
+
+def clear_project_cache():
+    """
+    Forget the cached results of :func:`get_project_root` and :func:`find_package_path`,
+    e.g. after creating a project in the current working directory.
+    """
+
+    with _DISCOVERY_LOCK:
+        _DISCOVERY_CACHE.clear()
+
+def _cached(key, search, is_valid):
+    global _DISCOVERY_CWD # pylint: disable=global-statement
 
-        return results[0] if len(results) == 1 else None
+    cwd = os.getcwd()
+    with _DISCOVERY_LOCK:
+        if cwd != _DISCOVERY_CWD:
+            _DISCOVERY_CACHE.clear()
+            _DISCOVERY_CWD = cwd
+
+        if key in _DISCOVERY_CACHE:
+            result = _DISCOVERY_CACHE[key]
+            # Searched again when the project has since been moved or deleted
+            if result is None or is_valid(result):
+                return result
+
+    result = search()
+    with _DISCOVERY_LOCK:
+        if cwd == _DISCOVERY_CWD:
+            _DISCOVERY_CACHE[key] = result
+    return result
+
+def _search_project_root(current_directory):
+    home = str(Path.home())
+
+    while True:
+        parent_directory = os.path.dirname(current_directory)
+        if current_directory in (home, parent_directory):
+            return None
+        if os.path.exists(os.path.join(current_directory, ".surround")):
+            return current_directory
+        current_directory = parent_directory
+
+def _search_package_path(project_root):
+    result = None
+
+    for path, directories, files in os.walk(project_root):
+        # Prune the directories that can't contain the package before descending into them
+        directories[:] = [
+            directory for directory in directories
+            if directory not in SKIPPED_DIRECTORIES and not directory.startswith(".")
+            and not os.path.exists(os.path.join(path, directory, "pyvenv.cfg"))
+        ]
+
+        if "config.yaml" in files and os.path.basename(path) not in PROJECTS['new']['dirs']:
+            if result:
+                # The package is ambiguous when there are several config.yaml files
+                return None
+            result = path
+
+    return result
 
 def get_project_root_or_cwd():
     """
@@ -59,6 +158,7 @@ def get_project_root_or_cwd():
 
     return os.getcwd()
 
+# pylint: disable=too-many-instance-attributes
 @dataclass
 class SurroundConfig:
     """
@@ -66,6 +166,26 @@ class SurroundConfig:
 
     :cvar bool enable_stage_ouput_dump: Configures whether the dump_output method of Stage is called after its operation.
     :cvar bool surface_exceptions: Configurs whether exceptions are thrown during pipeline execution or consumed.
+    :cvar bool parallel_stages: Configures whether stages that don't depend on each other are ran concurrently.
+    :cvar int max_stage_workers: Maximum number of threads used to run stages concurrently.
+    :cvar int batch_workers: Number of worker processes used by the ParallelBatchRunner (0 uses every CPU).
+    :cvar int batch_chunk_size: Number of records sent to a ParallelBatchRunner worker at a time.
+    :cvar int stream_window: Maximum number of records a StreamingRunner has loaded but not yet passed to its sink.
+    :cvar int stream_workers: Number of threads a StreamingRunner uses to run records through the assembler.
+    :cvar float stage_timing_sample_rate: Fraction of stage runs that are timed, their latency recorded by the assembler's instrumentation.
+    :cvar bool enable_stage_profiling: Configures whether the CPU time of each stage is profiled with cProfile.
+    :cvar bool enable_stage_memory_tracking: Configures whether the allocations of each stage are tracked with tracemalloc.
+    :cvar int profile_report_top_n: Number of entries per stage in the profiling reports.
+    :cvar bool parallel_stage_init: Configures whether stages are initialised concurrently by init_assembler.
+    :cvar int max_init_workers: Maximum number of threads used to initialise stages concurrently.
+    :cvar bool lazy_stage_init: Configures whether each stage is initialised the first time it is ran instead of by init_assembler.
+    :cvar int web_workers: Number of worker processes forked by the generated web runner after initialising the assembler.
+    :cvar int request_batch_size: Maximum number of concurrent web requests ran as one batch (0 runs each request on its own).
+    :cvar float request_batch_wait: Maximum seconds a web request waits for its batch to fill up.
+    :cvar int max_in_flight_requests: Maximum number of web requests ran at once (0 for no limit).
+    :cvar int max_queued_requests: Maximum number of web requests waiting to run before new ones are rejected.
+    :cvar float request_queue_timeout: Maximum seconds a web request waits to run before it is rejected.
+    :cvar float request_timeout: Seconds after which no further stages are started for a web request (0 for no timeout).
     """
 
     # Configures whether the dump_output method of Stage is called after its operation.
@@ -74,6 +194,66 @@ class SurroundConfig:
     # Configures whether exceptions thrown during pipeline execution are surfaced.
     surface_exceptions: bool = False
 
+    # Configures whether stages that declare disjoint State fields are ran concurrently.
+    parallel_stages: bool = False
+
+    # Maximum number of threads used to run stages concurrently.
+    max_stage_workers: int = 4
+
+    # Number of worker processes used by the ParallelBatchRunner (0 uses every CPU).
+    batch_workers: int = 0
+
+    # Number of records sent to a ParallelBatchRunner worker at a time.
+    batch_chunk_size: int = 1000
+
+    # Maximum number of records a StreamingRunner has loaded but not yet passed to its sink.
+    stream_window: int = 16
+
+    # Number of threads a StreamingRunner uses to run records through the assembler.
+    stream_workers: int = 1
+
+    # Fraction of stage runs that are timed, their latency recorded by the assembler's instrumentation (calls and errors are always counted).
+    stage_timing_sample_rate: float = 1.0
+
+    # Configures whether the CPU time of each stage is profiled with cProfile (dumped to output_path by the runner).
+    enable_stage_profiling: bool = False
+
+    # Configures whether the allocations of each stage are tracked with tracemalloc (dumped to output_path by the runner).
+    enable_stage_memory_tracking: bool = False
+
+    # Number of entries per stage in the profiling reports.
+    profile_report_top_n: int = 20
+
+    # Configures whether stages are initialised concurrently on a thread pool by init_assembler.
+    parallel_stage_init: bool = False
+
+    # Maximum number of threads used to initialise stages concurrently.
+    max_init_workers: int = 4
+
+    # Configures whether each stage is initialised the first time it is ran instead of by init_assembler.
+    lazy_stage_init: bool = False
+
+    # Number of worker processes forked by the generated web runner after initialising the assembler (1 serves in-process).
+    web_workers: int = 1
+
+    # Maximum number of concurrent web requests ran as one batch by the generated web runner (0 runs each request on its own).
+    request_batch_size: int = 0
+
+    # Maximum seconds a web request waits for its batch to fill up.
+    request_batch_wait: float = 0.005
+
+    # Maximum number of web requests ran at once by the generated web runner, others wait in a queue (0 for no limit).
+    max_in_flight_requests: int = 0
+
+    # Maximum number of web requests waiting to run, further requests are rejected with 503.
+    max_queued_requests: int = 64
+
+    # Maximum seconds a web request waits to run before it is rejected with 503.
+    request_queue_timeout: float = 1.0
+
+    # Seconds after which no further stages are started for a web request (0 for no timeout).
+    request_timeout: float = 0.0
+
 @dataclass
 class BaseConfig:
     """
@@ -158,6 +338,9 @@ def config(config_class=None, name="config", group=None):
 
     @functools.wraps(config_class)
     def wrapper(config_class, name, group):
+        # Hydra is slow to import, so it is only imported once a configuration is used
+        from hydra.core.config_store import ConfigStore # pylint: disable=import-outside-toplevel
+
         cs = ConfigStore.instance()
         cs.store(name=name, node=config_class, group=group)
         return config_class
@@ -170,7 +353,7 @@ def config(config_class=None, name="config", group=None):
 
     return recursive_wrapper
 
-def load_config(name="config", config_class=BaseConfig, config_dir=None, overrides=None):
+def load_config(name="config", config_class=BaseConfig, config_dir=None, overrides=None, snapshot_dir=None):
     """
     Loads the configuration instance using `Hydra's Compose API <https://hydra.cc/docs/experimental/compose_api>`_.
 
@@ -190,6 +373,13 @@ def load_config(name="config", config_class=BaseConfig, config_dir=None, overrid
 
         host: mysql://192.168.1.2
 
+    Composing the configuration with Hydra is slow compared to short jobs, so with a
+    ``snapshot_dir`` the values set by the YAML files and overrides are saved to a snapshot
+    which is loaded instead while the YAML files, overrides and the module defining the config
+    class are unchanged. Fields with generated defaults (e.g. ``output_path``) are generated
+    again when a snapshot is loaded. Snapshots that are out of date or fail validation against
+    the config class are composed and saved again.
+
     :param name: Name of the configuration, used to locate overrides.
     :type name: str
     :param config_class: The class describing the schema of the configuration.
@@ -198,6 +388,8 @@ def load_config(name="config", config_class=BaseConfig, config_dir=None, overrid
     :type config_dir: str
     :param overrides: Manual overrides of the configuration properties.
     :type overrides: dict
+    :param snapshot_dir: Directory to save configuration snapshots in (defaults to the ``SURROUND_CONFIG_SNAPSHOT_DIR`` environment variable, snapshots aren't used when neither is set).
+    :type snapshot_dir: str
     """
 
     if overrides is None:
@@ -219,13 +411,142 @@ def load_config(name="config", config_class=BaseConfig, config_dir=None, overrid
     if not config_search_path:
         config_search_path = os.getcwd()
 
-    # Register Config class with Hydra.
+    snapshot_dir = snapshot_dir or os.environ.get(SNAPSHOT_DIR_ENV)
+    if snapshot_dir:
+        key = _get_snapshot_key(name, config_class, config_search_path, overrides, snapshot_dir)
+        snapshot_path = os.path.join(snapshot_dir, "%s-%s.yaml" % (name, key[:16]))
+
+        config_instance = _load_snapshot(snapshot_path, key, config_class)
+        if config_instance is not None:
+            return config_instance
+
+    # pylint: disable=import-outside-toplevel
+    from omegaconf import OmegaConf
+    from hydra.core.config_store import ConfigStore
+    from hydra.experimental import compose, initialize_config_dir
+
+    # Register Config class with Hydra, keeping the node to know which values were composed into it
+    schema = OmegaConf.structured(config_class) if config_class else OmegaConf.create()
     if config_class:
-        cs = ConfigStore.instance()
-        cs.store(name=name, node=config_class)
+        ConfigStore.instance().store(name=name, node=schema)
 
     # Initialize hydra with the config search path.
     with initialize_config_dir(config_dir=config_search_path):
         # Create an instance of the config class, with any overrides found.
         config_instance = compose(config_name=name, overrides=overrides)
+
+    if snapshot_dir:
+        _save_snapshot(snapshot_path, key, schema, config_instance)
+
+    return config_instance
+
+def _get_snapshot_key(name, config_class, config_search_path, overrides, snapshot_dir):
+    """
+    Hash of everything the composed configuration depends on: the YAML files Hydra can read from
+    the search path (see :func:`_get_config_files`), the overrides and the source of the module
+    defining the config class.
+    """
+
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(repr((SNAPSHOT_VERSION, name, list(overrides))).encode())
+
+    if config_class:
+        digest.update(("%s.%s" % (config_class.__module__, config_class.__qualname__)).encode())
+        module_path = getattr(sys.modules.get(config_class.__module__), "__file__", None)
+        if module_path and os.path.isfile(module_path):
+            with open(module_path, "rb") as f:
+                digest.update(f.read())
+
+    for path in _get_config_files(config_search_path, snapshot_dir):
+        digest.update(os.path.relpath(path, config_search_path).encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.blake2b(f.read()).digest())
+
+    return digest.hexdigest()
+
+def _get_config_files(config_search_path, snapshot_dir):
+    """
+    Returns the YAML files Hydra can read from the search path, without walking the whole tree
+    (the search path may be the working directory): the YAML files at the top of the search path
+    and every YAML file in its config groups, the directories directly in the search path holding
+    YAML files (except the snapshot directory).
+    """
+
+    def is_yaml(entry):
+        return entry.is_file() and entry.name.endswith((".yaml", ".yml"))
+
+    snapshot_dir = os.path.abspath(snapshot_dir)
+    with os.scandir(config_search_path) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+
+    paths = [entry.path for entry in entries if is_yaml(entry)]
+
+    for entry in entries:
+        if (not entry.is_dir() or entry.name in SKIPPED_DIRECTORIES or entry.name.startswith(".")
+                or os.path.abspath(entry.path) == snapshot_dir):
+            continue
+
+        with os.scandir(entry.path) as group_entries:
+            if not any(is_yaml(group_entry) for group_entry in group_entries):
+                continue
+
+        for path, directories, files in os.walk(entry.path):
+            directories[:] = sorted(directory for directory in directories if not directory.startswith("."))
+            paths.extend(os.path.join(path, filename) for filename in sorted(files)
+                         if filename.endswith((".yaml", ".yml")))
+
+    return paths
+
+def _load_snapshot(snapshot_path, key, config_class):
+    if not os.path.isfile(snapshot_path):
+        return None
+
+    from omegaconf import OmegaConf # pylint: disable=import-outside-toplevel
+
+    try:
+        snapshot = OmegaConf.load(snapshot_path)
+        if snapshot.get("key") != key or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        # Merging into a new instance of the schema validates the values and generates the defaults again
+        schema = OmegaConf.structured(config_class) if config_class else OmegaConf.create()
+        config_instance = OmegaConf.merge(schema, snapshot.config)
+        OmegaConf.set_struct(config_instance, True)
         return config_instance
+    except Exception: # pylint: disable=broad-except
+        LOGGER.warning("Ignoring invalid config snapshot %s", snapshot_path, exc_info=True)
+        return None
+
+def _save_snapshot(snapshot_path, key, schema, config_instance):
+    from omegaconf import OmegaConf # pylint: disable=import-outside-toplevel
+
+    try:
+        # Only the values that differ from the schema node that was composed are saved, so generated
+        # defaults aren't frozen (generating them again could give different values, e.g. timestamps)
+        values = _get_changed_values(OmegaConf.to_container(config_instance, resolve=False),
+                                     OmegaConf.to_container(schema, resolve=False))
+        snapshot = OmegaConf.create({"version": SNAPSHOT_VERSION, "key": key, "config": values or {}})
+
+        os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(snapshot_path)), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(OmegaConf.to_yaml(snapshot))
+        os.replace(temp_path, snapshot_path)
+    except Exception: # pylint: disable=broad-except
+        LOGGER.warning("Failed to save config snapshot %s", snapshot_path, exc_info=True)
+
+def _get_changed_values(values, defaults):
+    """
+    Returns the values that differ from the defaults, recursing into dictionaries.
+    """
+
+    if not isinstance(values, dict) or not isinstance(defaults, dict):
+        return values
+
+    changed = {}
+    for key, value in values.items():
+        if key not in defaults:
+            changed[key] = value
+        elif value != defaults[key]:
+            changed[key] = _get_changed_values(value, defaults[key])
+    return changed
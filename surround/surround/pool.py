@@ -0,0 +1,137 @@
+# pool.py
+#
+# Reuses pre-allocated states between pipeline runs.
+import threading
+from contextlib import contextmanager
+
+class StatePool:
+    """
+    Thread-safe pool of reusable states, avoiding a new allocation (and the garbage it
+    leaves behind) for every request a runner handles.
+
+    States are reset with their ``reset`` method when released back into the pool, so the state
+    class must define one, e.g. by subclassing :class:`surround.state.SlottedState`.
+
+    Example::
+
+        POOL = StatePool(AssemblyState, size=32)
+
+        data = POOL.acquire(input_data="some data")
+        try:
+            assembler.run(data)
+            return data.output_data
+        finally:
+            POOL.release(data)
+
+    The pool keeps count of ``hits`` (states reused from the pool), ``misses`` (states that
+    had to be allocated because the pool was empty) and ``dropped`` (states released while the
+    pool was already full or discarded), see :meth:`StatePool.stats`.
+    """
+
+    def __init__(self, state_class, size=64, preallocate=True):
+        """
+        :param state_class: the class of the states to pool, must define ``reset()``
+        :type state_class: type
+        :param size: the maximum number of idle states kept in the pool
+        :type size: int
+        :param preallocate: whether to fill the pool with ``size`` states up front
+        :type preallocate: bool
+        """
+
+        if not callable(getattr(state_class, "reset", None)):
+            raise TypeError("state_class must define reset(), e.g. by subclassing SlottedState")
+
+        self.state_class = state_class
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self.__idle = [state_class() for _ in range(size)] if preallocate else []
+        self.__lock = threading.Lock()
+
+    def acquire(self, **fields):
+        """
+        Take a state from the pool (or allocate one when the pool is empty) and set its fields.
+
+        :param fields: values of the fields to set on the state
+        :return: a state in its default state, apart from the fields given
+        """
+
+        with self.__lock:
+            if self.__idle:
+                state = self.__idle.pop()
+                self.hits += 1
+            else:
+                state = None
+                self.misses += 1
+
+        if state is None:
+            state = self.state_class()
+
+        for key, value in fields.items():
+            setattr(state, key, value)
+
+        return state
+
+    def release(self, state):
+        """
+        Reset the state and return it to the pool, the state must not be used afterwards.
+
+        :param state: a state previously returned by :meth:`StatePool.acquire`
+        """
+
+        state.reset()
+
+        with self.__lock:
+            if len(self.__idle) < self.size:
+                self.__idle.append(state)
+            else:
+                self.dropped += 1
+
+    def discard(self, state):
+        """
+        Drop a state that may still be in use instead of returning it to the pool (e.g. when the
+        request running it was cancelled while a thread is still writing to it).
+
+        :param state: a state previously returned by :meth:`StatePool.acquire`
+        """
+
+        with self.__lock:
+            self.dropped += 1
+
+    @contextmanager
+    def borrow(self, **fields):
+        """
+        Context manager that acquires a state and releases it on exit.
+
+        The state is discarded rather than released when the block is interrupted by something
+        other than an ``Exception`` (e.g. ``asyncio.CancelledError`` when a request is cancelled),
+        as the pipeline may still be running with it.
+
+        Example::
+
+            with POOL.borrow(input_data="some data") as data:
+                assembler.run(data)
+        """
+
+        state = self.acquire(**fields)
+        try:
+            yield state
+        except Exception:
+            self.release(state)
+            raise
+        except BaseException:
+            self.discard(state)
+            raise
+        else:
+            self.release(state)
+
+    def stats(self):
+        """
+        Returns the number of hits, misses, dropped and idle states of the pool.
+
+        :rtype: dict
+        """
+
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses, "dropped": self.dropped, "idle": len(self.__idle)}
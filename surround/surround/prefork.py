@@ -0,0 +1,250 @@
+# prefork.py
+#
+# Serves from several forked worker processes that inherit an initialised assembler.
+import os
+import time
+import signal
+import socket
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+class PreforkServer:
+    """
+    Initialises once in a parent process and then forks worker processes that inherit the
+    listening socket and everything loaded in the parent (e.g. models), sharing its memory
+    copy-on-write instead of loading the models once per worker.
+
+    The parent supervises the workers:
+
+    - workers that exit are restarted (without initialising again), waiting twice as long
+      after each consecutive exit of the same worker from ``restart_backoff`` seconds up to
+      ``max_restart_backoff``. A worker that has been running for longer than
+      ``max_restart_backoff`` has its count of exits reset. After ``max_restarts`` consecutive
+      exits (e.g. a worker that crashes while starting) the server is stopped and
+      :meth:`PreforkServer.run` raises a ``RuntimeError``
+    - ``SIGHUP`` gracefully reloads: ``initialise`` is called again, a new generation of workers
+      is forked and the previous generation is sent ``SIGTERM`` to finish its in-flight requests
+    - ``SIGTERM`` or ``SIGINT`` stops every worker and returns from :meth:`PreforkServer.run`
+
+    Example (used by the generated web runner)::
+
+        def initialise():
+            assembler.init_assembler()
+
+        def serve(sock, worker_id):
+            uvicorn.Server(uvicorn.Config(APP)).run(sockets=[sock])
+
+        PreforkServer(initialise, serve, workers=4, port=8081).run()
+
+    .. note:: Requires a platform that supports ``os.fork``. Avoid starting threads in
+              ``initialise`` that the workers rely on, they don't survive the fork.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, initialise, serve, workers=2, host="0.0.0.0", port=8081, backlog=2048, shutdown_timeout=30,
+                 max_restarts=5, restart_backoff=0.5, max_restart_backoff=30):
+        """
+        :param initialise: called in the parent before forking (and on reload), e.g. to load models
+        :type initialise: callable
+        :param serve: called in each worker with the listening socket and the worker's id
+        :type serve: callable
+        :param workers: number of worker processes
+        :type workers: int
+        :param host: address to listen on
+        :type host: str
+        :param port: port to listen on
+        :type port: int
+        :param backlog: maximum number of pending connections on the listening socket
+        :type backlog: int
+        :param shutdown_timeout: seconds to wait for workers to exit before killing them
+        :type shutdown_timeout: float
+        :param max_restarts: consecutive exits of a worker after which the server is stopped
+        :type max_restarts: int
+        :param restart_backoff: seconds to wait before restarting a worker the first time it exits
+        :type restart_backoff: float
+        :param max_restart_backoff: maximum seconds to wait before restarting a worker
+        :type max_restart_backoff: float
+        """
+
+        if not hasattr(os, "fork"):
+            raise RuntimeError("PreforkServer requires a platform that supports os.fork")
+
+        self.initialise = initialise
+        self.serve = serve
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.shutdown_timeout = shutdown_timeout
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.socket = None
+        self.generation = 0
+        self.restarts = 0
+        self.__workers = {}
+        self.__exits = {}
+        self.__scheduled = {}
+        self.__failed = None
+        self.__stopping = False
+        self.__reloading = False
+
+    def run(self):
+        """
+        Initialise, fork the workers and supervise them until ``SIGTERM`` or ``SIGINT`` is received.
+        Raises a ``RuntimeError`` if a worker exited ``max_restarts`` times in a row.
+        """
+
+        self.initialise()
+
+        self.socket = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.socket.set_inheritable(True)
+
+        previous_handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT)}
+        signal.signal(signal.SIGHUP, self.__on_reload)
+        signal.signal(signal.SIGTERM, self.__on_stop)
+        signal.signal(signal.SIGINT, self.__on_stop)
+
+        LOGGER.info("Listening on %s:%d with %d workers", self.host, self.port, self.workers)
+
+        try:
+            for worker_id in range(self.workers):
+                self.__spawn(worker_id)
+
+            while not self.__stopping:
+                self.__reap()
+                self.__restart_scheduled()
+
+                if self.__reloading:
+                    self.__reloading = False
+                    self.__reload()
+
+                time.sleep(0.2)
+        finally:
+            self.__stop_workers(list(self.__workers))
+            self.socket.close()
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+
+        if self.__failed:
+            raise RuntimeError(self.__failed)
+
+    def status(self):
+        """
+        Returns the id, pid, generation and start time of each running worker.
+
+        :rtype: list of dict
+        """
+
+        return [dict(worker, pid=pid) for pid, worker in sorted(self.__workers.items())]
+
+    def __on_reload(self, signum, frame):
+        self.__reloading = True
+
+    def __on_stop(self, signum, frame):
+        self.__stopping = True
+
+    def __spawn(self, worker_id):
+        pid = os.fork()
+
+        if pid == 0:
+            exit_code = 0
+            try:
+                for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+                    signal.signal(sig, signal.SIG_DFL)
+                self.serve(self.socket, worker_id)
+            except BaseException: # pylint: disable=broad-except
+                LOGGER.exception("Worker %d failed", worker_id)
+                exit_code = 1
+            finally:
+                os._exit(exit_code) # pylint: disable=protected-access
+
+        self.__workers[pid] = {"worker_id": worker_id, "generation": self.generation, "started": time.time()}
+        LOGGER.info("Started worker %d (pid %d)", worker_id, pid)
+
+    def __reap(self):
+        for pid in list(self.__workers):
+            try:
+                finished, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished, status = pid, 0
+
+            if not finished:
+                continue
+
+            worker = self.__workers.pop(pid)
+            if worker["generation"] != self.generation or self.__stopping:
+                continue
+
+            worker_id = worker["worker_id"]
+            if time.time() - worker["started"] > self.max_restart_backoff:
+                self.__exits[worker_id] = 0
+            exits = self.__exits[worker_id] = self.__exits.get(worker_id, 0) + 1
+
+            if exits > self.max_restarts:
+                self.__failed = "Worker %d exited %d times in a row, stopping" % (worker_id, exits)
+                LOGGER.error(self.__failed)
+                self.__stopping = True
+                return
+
+            delay = min(self.restart_backoff * 2 ** (exits - 1), self.max_restart_backoff)
+            LOGGER.warning("Worker %d (pid %d) exited with status %d, restarting in %.1fs", worker_id, pid, status, delay)
+            self.__scheduled[worker_id] = time.monotonic() + delay
+
+    def __restart_scheduled(self):
+        now = time.monotonic()
+        for worker_id, restart_at in list(self.__scheduled.items()):
+            if restart_at <= now:
+                del self.__scheduled[worker_id]
+                self.restarts += 1
+                self.__spawn(worker_id)
+
+    def __reload(self):
+        LOGGER.info("Reloading workers")
+
+        try:
+            self.initialise()
+        except Exception: # pylint: disable=broad-except
+            LOGGER.exception("Failed to reload, keeping the current workers")
+            return
+
+        previous = list(self.__workers)
+        self.generation += 1
+        self.__exits.clear()
+        self.__scheduled.clear()
+        for worker_id in range(self.workers):
+            self.__spawn(worker_id)
+
+        # Previous workers stop accepting and finish their in-flight requests
+        for pid in previous:
+            _signal_worker(pid, signal.SIGTERM)
+
+    def __stop_workers(self, pids):
+        for pid in pids:
+            _signal_worker(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for pid in pids:
+            while time.monotonic() < deadline:
+                try:
+                    finished, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if finished:
+                    break
+                time.sleep(0.05)
+            else:
+                LOGGER.warning("Worker (pid %d) didn't stop in time, killing it", pid)
+                _signal_worker(pid, signal.SIGKILL)
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            self.__workers.pop(pid, None)
+
+def _signal_worker(pid, sig):
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,120 @@
+# profiling.py
+#
+# Optional per-stage CPU profiling (cProfile) and allocation tracking (tracemalloc).
+import io
+import os
+import logging
+import pstats
+import cProfile
+import threading
+import tracemalloc
+
+LOGGER = logging.getLogger(__name__)
+
+class StageProfiler:
+    """
+    Profiles the stages ran by an :class:`surround.assembler.Assembler`, aggregating the
+    results across runs until they are dumped with :meth:`StageProfiler.dump`.
+
+    Created by :meth:`surround.assembler.Assembler.init_assembler` when either
+    ``surround.enable_stage_profiling`` or ``surround.enable_stage_memory_tracking`` is enabled,
+    and dumped to ``config.output_path`` by the runner when it finishes.
+
+    .. note:: Only the synchronous part of a stage is profiled, time spent awaiting in
+              ``async def`` stages ran by :meth:`surround.assembler.Assembler.arun` is not.
+    """
+
+    def __init__(self, cpu=True, memory=False, top_n=20):
+        """
+        :param cpu: whether to profile the CPU time of each stage with cProfile
+        :type cpu: bool
+        :param memory: whether to track the allocations of each stage with tracemalloc
+        :type memory: bool
+        :param top_n: number of entries to include in the reports of each stage
+        :type top_n: int
+        """
+
+        self.cpu = cpu
+        self.memory = memory
+        self.top_n = top_n
+        self.stats = {}
+        self.allocations = {}
+        self.__lock = threading.Lock()
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def call(self, stage_name, func, *args):
+        """
+        Call ``func`` with ``args``, recording its profile against ``stage_name``.
+
+        :return: whatever ``func`` returns
+        """
+
+        profile = cProfile.Profile() if self.cpu else None
+        before = _take_snapshot() if self.memory else None
+
+        if profile:
+            profile.enable()
+        try:
+            return func(*args)
+        finally:
+            if profile:
+                profile.disable()
+            after = _take_snapshot() if self.memory else None
+
+            with self.__lock:
+                if profile:
+                    if stage_name in self.stats:
+                        self.stats[stage_name].add(profile)
+                    else:
+                        self.stats[stage_name] = pstats.Stats(profile)
+
+                if after:
+                    allocations = self.allocations.setdefault(stage_name, {})
+                    for diff in after.compare_to(before, "lineno"):
+                        frame = diff.traceback[0]
+                        key = "%s:%d" % (frame.filename, frame.lineno)
+                        size, count = allocations.get(key, (0, 0))
+                        allocations[key] = (size + diff.size_diff, count + diff.count_diff)
+
+    def dump(self, output_path):
+        """
+        Write the aggregated profiles to ``output_path``:
+
+        - ``profile_<stage>.pstats`` for each stage (load with :class:`pstats.Stats` or snakeviz)
+        - ``profile.txt`` the top functions by cumulative time of each stage
+        - ``allocations.txt`` the top lines by net memory allocated in each stage
+
+        :param output_path: the directory to write the reports to
+        :type output_path: str
+        """
+
+        os.makedirs(output_path, exist_ok=True)
+
+        with self.__lock:
+            if self.stats:
+                with open(os.path.join(output_path, "profile.txt"), "w") as report:
+                    for stage_name, stats in self.stats.items():
+                        stats.dump_stats(os.path.join(output_path, "profile_%s.pstats" % stage_name))
+
+                        stream = io.StringIO()
+                        pstats.Stats(stream=stream).add(stats).sort_stats("cumulative").print_stats(self.top_n)
+                        report.write("== %s ==\n%s\n" % (stage_name, stream.getvalue()))
+
+            if self.allocations:
+                with open(os.path.join(output_path, "allocations.txt"), "w") as report:
+                    for stage_name, allocations in self.allocations.items():
+                        report.write("== %s ==\n" % stage_name)
+                        top = sorted(allocations.items(), key=lambda item: item[1][0], reverse=True)[:self.top_n]
+                        for rank, (line, (size, count)) in enumerate(top, 1):
+                            report.write("%d. %s: %+.1f KiB (%+d blocks)\n" % (rank, line, size / 1024, count))
+                        report.write("\n")
+
+        LOGGER.info("Stage profiles written to %s", output_path)
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
@@ -0,0 +1,215 @@
+# registry.py
+#
+# Loads model artifacts once per process and shares their pages between processes.
+import os
+import mmap
+import hashlib
+import logging
+import threading
+from time import perf_counter
+
+LOGGER = logging.getLogger(__name__)
+
+# Size of the blocks read when hashing an artifact
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def load_npy(path):
+    """
+    Memory-map a NumPy ``.npy`` file read-only.
+
+    :param path: path to the file
+    :type path: str
+    :rtype: numpy.ndarray
+    """
+
+    import numpy # pylint: disable=import-outside-toplevel
+    return numpy.load(path, mmap_mode="r")
+
+def load_mmap(path):
+    """
+    Memory-map a file read-only, returning its contents as a buffer (e.g. for ``pickle.loads``,
+    ``numpy.frombuffer`` or a model runtime that accepts bytes).
+
+    :param path: path to the file
+    :type path: str
+    :rtype: mmap.mmap
+    """
+
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class ModelRegistry:
+    """
+    Loads model artifacts once and hands the same object to every stage that requests it.
+
+    Artifacts are memory-mapped read-only by default (``.npy`` files via ``numpy.load(mmap_mode="r")``,
+    anything else as a raw :class:`mmap.mmap` buffer), so every process serving the model
+    (e.g. uvicorn or batch workers) shares the same pages of the operating system's page
+    cache rather than holding its own copy, and models loaded before forking are shared
+    without being read again.
+
+    Models are cached by path (and loader) and are reloaded when the file's modification time or size changes.
+    Each artifact is hashed when it is loaded, identical files loaded with the same loader
+    share the same object.
+
+    Example::
+
+        from surround import MODEL_REGISTRY
+
+        class Predict(Estimator):
+            def initialise(self, config):
+                MODEL_REGISTRY.register("embeddings", "embeddings.npy")
+                self.embeddings = MODEL_REGISTRY.get("embeddings", config)
+
+    Names that haven't been registered are treated as paths relative to ``config.model_path``.
+    """
+
+    def __init__(self, model_path=None):
+        """
+        :param model_path: directory relative paths are resolved against when no config is given
+        :type model_path: str
+        """
+
+        self.model_path = model_path
+        self.loaders = {".npy": load_npy}
+        self.__models = {}
+        self.__entries = {}
+        self.__by_digest = {}
+        self.__lock = threading.Lock()
+        self.__path_locks = {}
+
+    def register(self, name, path, loader=None):
+        """
+        Register the artifact to load for a model name.
+
+        :param name: the name stages request the model by
+        :type name: str
+        :param path: path to the artifact, relative to ``config.model_path`` or absolute
+        :type path: str
+        :param loader: function loading the artifact from its path, by default chosen by extension
+        :type loader: callable
+        """
+
+        with self.__lock:
+            self.__models[name] = (path, loader)
+
+        return self
+
+    def set_loader(self, extension, loader):
+        """
+        Set the default loader for files with the given extension, e.g. ``".onnx"``.
+
+        :param extension: the file extension including the dot
+        :type extension: str
+        :param loader: function loading the artifact from its path
+        :type loader: callable
+        """
+
+        self.loaders[extension] = loader
+
+        return self
+
+    def get(self, name, config=None):
+        """
+        Returns the loaded model, loading it (or reloading it if its file changed) when needed.
+
+        :param name: a registered model name or a path relative to ``config.model_path``
+        :type name: str
+        :param config: configuration used to resolve relative paths
+        :type config: :class:`surround.config.BaseConfig`
+        :raises FileNotFoundError: when the artifact doesn't exist
+        """
+
+        path, loader = self.__resolve(name, config)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        key = (path, loader)
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry and entry["version"] == version:
+                return entry["model"]
+            path_lock = self.__path_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given artifact, other artifacts can load concurrently
+        with path_lock:
+            with self.__lock:
+                entry = self.__entries.get(key)
+                if entry and entry["version"] == version:
+                    return entry["model"]
+
+            start = perf_counter()
+            digest = _hash_file(path)
+
+            with self.__lock:
+                model = self.__by_digest.get((digest, loader))
+
+            if model is None:
+                model = loader(path)
+
+            entry = {
+                "path": path,
+                "version": version,
+                "digest": digest,
+                "model": model,
+                "load_time": perf_counter() - start,
+            }
+
+            with self.__lock:
+                previous = self.__entries.get(key)
+                if previous:
+                    self.__by_digest.pop((previous["digest"], loader), None)
+                self.__entries[key] = entry
+                self.__by_digest[(digest, loader)] = model
+
+        LOGGER.info("Loaded model '%s' from %s in %.3f secs", name, path, entry["load_time"])
+        return model
+
+    def info(self):
+        """
+        Returns the path, size, modification time, hash and load time of each loaded artifact.
+
+        :rtype: list of dict
+        """
+
+        with self.__lock:
+            return [{
+                "path": entry["path"],
+                "size": entry["version"][1],
+                "mtime_ns": entry["version"][0],
+                "digest": entry["digest"],
+                "load_time": entry["load_time"],
+            } for entry in self.__entries.values()]
+
+    def clear(self):
+        """
+        Drop every loaded model, they are loaded again the next time they are requested.
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__by_digest.clear()
+
+    def __resolve(self, name, config):
+        with self.__lock:
+            path, loader = self.__models.get(name, (name, None))
+
+        if not os.path.isabs(path):
+            model_path = config.model_path if config is not None else self.model_path
+            if not model_path:
+                raise ValueError("model_path is required to resolve relative model path '%s'" % path)
+            path = os.path.join(model_path, path)
+
+        path = os.path.realpath(path)
+        return path, loader or self.loaders.get(os.path.splitext(path)[1], load_mmap)
+
+def _hash_file(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Registry shared by every stage in the process
+MODEL_REGISTRY = ModelRegistry()
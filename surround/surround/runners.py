@@ -1,7 +1,12 @@
+import os
 import logging
+import threading
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .run_modes import RunMode
 from .state import State
+from .stage import Stage
 from .assembler import Assembler
 
 LOGGER = logging.getLogger(__name__)
@@ -68,6 +73,15 @@ class Runner(ABC):
 
         return self
 
+    def dump_profiles(self):
+        """
+        Write the stage profiles collected by the assembler (when ``surround.enable_stage_profiling``
+        or ``surround.enable_stage_memory_tracking`` is enabled) to ``config.output_path``.
+        """
+
+        if self.assembler and self.assembler.profiler:
+            self.assembler.profiler.dump(self.assembler.config.output_path)
+
     def run(self, mode=RunMode.PREDICT):
         """
         Prepare data and execute the :class:`surround.assembler.Assembler`.
@@ -88,5 +102,303 @@ class Runner(ABC):
 
             # Run assembler
             self.assembler.run(data, mode)
+            self.dump_profiles()
         else:
             LOGGER.error("No assembler has been set to this runner!")
+
+
+class ParallelBatchRunner(Runner):
+    """
+    Runner that shards the data returned by ``load_data`` into chunks and runs them through
+    the :class:`surround.assembler.Assembler` on a pool of worker processes when running
+    in :attr:`surround.run_modes.RunMode.BATCH_PREDICT` mode (other modes run in this process).
+
+    Each worker calls :meth:`surround.assembler.Assembler.init_assembler` once when it starts,
+    so models are loaded once per worker rather than once per chunk. On platforms that
+    support it workers are forked, otherwise the assembler and its stages must be picklable.
+
+    When stage profiling is enabled each worker writes its own profiles to
+    ``config.output_path/worker_<pid>``.
+
+    The number of workers and the chunk size are configured with ``surround.batch_workers``
+    and ``surround.batch_chunk_size``. Chunk states are sent back to this process and merged
+    in the order they were split, the ``errors``, ``warnings``, ``execution_time`` and
+    ``stage_metadata`` of each chunk are concatenated onto the merged state and, unless
+    ``merge_data`` sets them, each metric becomes a list of the values of each chunk.
+
+    Example::
+
+        class CsvRunner(ParallelBatchRunner):
+            def load_data(self, mode, config):
+                state = AssemblyState()
+                state.rows = load_rows(config.input_path)
+                return state
+
+            def split_data(self, state, chunk_size):
+                for i in range(0, len(state.rows), chunk_size):
+                    chunk = AssemblyState()
+                    chunk.rows = state.rows[i:i + chunk_size]
+                    yield chunk
+
+            def merge_data(self, states, config):
+                merged = AssemblyState()
+                merged.outputs = [output for state in states for output in state.outputs]
+                return merged
+    """
+
+    @abstractmethod
+    def split_data(self, state, chunk_size):
+        """
+        Split the state returned by ``load_data`` into states of at most ``chunk_size`` records.
+
+        :param state: the state returned by ``load_data``
+        :type state: :class:`surround.State`
+        :param chunk_size: the maximum number of records in each chunk
+        :type chunk_size: int
+        :return: the chunks to run through the assembler, in order
+        :rtype: iterable of :class:`surround.State`
+        """
+
+    @abstractmethod
+    def merge_data(self, states, config):
+        """
+        Merge the chunk states, after they have ran through the assembler, into a single state.
+
+        :param states: the chunk states in the order they were split
+        :type states: list of :class:`surround.State`
+        :param config: the configuration of the assembly
+        :type config: :class:`surround.config.BaseConfig`
+        :return: the merged state
+        :rtype: :class:`surround.State`
+        """
+
+    def run(self, mode=RunMode.PREDICT):
+        """
+        Prepare data and execute the :class:`surround.assembler.Assembler` on a pool of
+        worker processes when running in batch-predict mode.
+
+        The merged state is stored on the assembler's ``state`` attribute.
+
+        :param mode: the mode to run the pipeline in
+        :type mode: :class:`surround.run_modes.RunMode`
+        """
+
+        if mode != RunMode.BATCH_PREDICT:
+            super().run(mode)
+            return
+
+        if not self.assembler:
+            LOGGER.error("No assembler has been set to this runner!")
+            return
+
+        config = self.assembler.config
+        data = self.load_data(mode, config)
+
+        if not isinstance(data, State):
+            raise ValueError("load_data must return an instance of State!")
+
+        workers = config.surround.batch_workers or os.cpu_count()
+        chunks = self.split_data(data, config.surround.batch_chunk_size)
+        states = []
+
+        # Imported here so importing surround doesn't load multiprocessing
+        from concurrent.futures import ProcessPoolExecutor # pylint: disable=import-outside-toplevel
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_get_mp_context(),
+                                 initializer=_init_worker, initargs=(self.assembler,)) as executor:
+            # Only keep a couple of chunks per worker in flight to bound memory use
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_run_chunk, chunk, mode))
+                if len(in_flight) >= workers * 2:
+                    states.append(in_flight.popleft().result())
+
+            while in_flight:
+                states.append(in_flight.popleft().result())
+
+        LOGGER.info("Ran %d chunks across %d workers", len(states), workers)
+
+        merged = self.merge_data(states, config)
+        _merge_base_fields(merged, states)
+        self.assembler.state = merged
+
+        if merged.errors:
+            LOGGER.error(merged.errors)
+
+class StreamingRunner(Runner):
+    """
+    Runner for datasets that don't fit in memory, ``load_data`` returns an iterable
+    (e.g. a generator) that yields either a :class:`surround.State` per record or a list of
+    states per batch of records (which are ran with :meth:`surround.assembler.Assembler.run_batch`).
+
+    Records are ran through the assembler as they are yielded and each resulting state is
+    passed, in order, to the ``operate`` method of the sink stage so that results can be written
+    out as they are produced. At most ``surround.stream_window`` records are loaded but not yet
+    sunk at any time (a batch counts as all of its records and is never split, so a batch larger
+    than the window is still ran): when the window is full no more records are pulled from
+    ``load_data`` until the sink has caught up, so a slow sink can't cause unbounded buffering.
+    Records are ran on ``surround.stream_workers`` threads, while the sink runs in the calling thread.
+    The sink's ``teardown`` method is called once the stream ends, even if it raised.
+
+    Example::
+
+        class CsvRunner(StreamingRunner):
+            def load_data(self, mode, config):
+                with open(os.path.join(config.input_path, "data.csv")) as csv_file:
+                    for row in csv.DictReader(csv_file):
+                        yield AssemblyState(row)
+
+        class CsvSink(Stage):
+            def initialise(self, config):
+                self.output = open(os.path.join(config.output_path, "results.csv"), "w")
+
+            def operate(self, state, config):
+                self.output.write("%s\\n" % state.output_data)
+
+            def teardown(self, config):
+                self.output.close()
+
+        CsvRunner(assembler, sink=CsvSink()).run(RunMode.BATCH_PREDICT)
+    """
+
+    def __init__(self, assembler=None, sink=None):
+        """
+        :param assembler: The assembler the runner will execute
+        :type assembler: :class:`surround.assembler.Assembler`
+        :param sink: The stage each resulting state is passed to
+        :type sink: :class:`surround.stage.Stage`
+        """
+
+        super().__init__(assembler)
+        self.sink = sink
+
+    def set_sink(self, sink):
+        """
+        Set the stage each resulting state is passed to.
+
+        :param sink: the sink stage
+        :type sink: :class:`surround.stage.Stage`
+        """
+
+        if not isinstance(sink, Stage):
+            raise TypeError("sink should be of class Stage")
+        self.sink = sink
+
+        return self
+
+    def run(self, mode=RunMode.PREDICT):
+        """
+        Stream the records from ``load_data`` through the :class:`surround.assembler.Assembler`
+        and into the sink.
+
+        :param mode: the mode to run the pipeline in
+        :type mode: :class:`surround.run_modes.RunMode`
+        """
+
+        if not self.assembler:
+            LOGGER.error("No assembler has been set to this runner!")
+            return
+
+        config = self.assembler.config
+        self.assembler.init_assembler()
+
+        if self.sink:
+            self.sink.initialise(config)
+
+        try:
+            counts = self._stream(mode, config)
+        finally:
+            if self.sink:
+                self.sink.teardown(config)
+
+        LOGGER.info("Streamed %d records (%d with errors)", counts["records"], counts["errors"])
+        self.dump_profiles()
+
+    def _stream(self, mode, config):
+        records = self.load_data(mode, config)
+        if isinstance(records, State):
+            records = [records]
+
+        window = max(config.surround.stream_window, 1)
+        in_flight = deque()
+        counts = {"records": 0, "errors": 0, "in_flight": 0}
+
+        with ThreadPoolExecutor(max_workers=config.surround.stream_workers) as executor:
+            for record in records:
+                in_flight.append(executor.submit(self._run_record, record, mode))
+                counts["in_flight"] += len(record) if isinstance(record, list) else 1
+
+                # Back-pressure: stop pulling records until the sink has caught up
+                while in_flight and counts["in_flight"] >= window:
+                    self._sink_states(in_flight.popleft().result(), config, counts)
+
+            while in_flight:
+                self._sink_states(in_flight.popleft().result(), config, counts)
+
+        return counts
+
+    def _run_record(self, record, mode):
+        if isinstance(record, list):
+            self.assembler.run_batch(record, mode)
+            return record
+
+        if not isinstance(record, State):
+            raise ValueError("load_data must yield instances of State or lists of State!")
+
+        self.assembler.run(record, mode)
+        return [record]
+
+    def _sink_states(self, states, config, counts):
+        for state in states:
+            counts["records"] += 1
+            counts["in_flight"] -= 1
+            if state.errors:
+                counts["errors"] += 1
+
+            if not self.sink:
+                continue
+
+            try:
+                self.sink.operate(state, config)
+            except Exception as e:
+                if config.surround.surface_exceptions:
+                    raise e
+                LOGGER.exception(e)
+
+# Assembler of the current worker process, initialised once per worker by _init_worker
+_WORKER_ASSEMBLER = None
+
+def _get_mp_context():
+    import multiprocessing # pylint: disable=import-outside-toplevel
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def _init_worker(assembler):
+    global _WORKER_ASSEMBLER # pylint: disable=global-statement
+
+    # Threads of the parent's stage executor (and any lock they held) don't survive the fork
+    assembler.executor = None
+    assembler.init_lock = threading.Lock()
+
+    if not assembler.init_assembler():
+        raise RuntimeError("Failed to initialise '%s' in worker %d" % (assembler.assembler_name, os.getpid()))
+    _WORKER_ASSEMBLER = assembler
+
+def _run_chunk(state, mode):
+    _WORKER_ASSEMBLER.run(state, mode)
+
+    # Profiles can't be merged across processes, so each worker keeps its own up to date
+    if _WORKER_ASSEMBLER.profiler:
+        _WORKER_ASSEMBLER.profiler.dump(os.path.join(_WORKER_ASSEMBLER.config.output_path, "worker_%d" % os.getpid()))
+
+    return state
+
+def _merge_base_fields(merged, states):
+    merged.stage_metadata = [item for state in states for item in state.stage_metadata]
+    merged.execution_time = [item for state in states for item in state.execution_time]
+    merged.errors = [item for state in states for item in state.errors]
+    merged.warnings = [item for state in states for item in state.warnings]
+
+    if not merged.metrics:
+        keys = [key for state in states for key in state.metrics]
+        merged.metrics = {key: [state.metrics.get(key) for state in states] for key in dict.fromkeys(keys)}
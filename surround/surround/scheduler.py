@@ -0,0 +1,72 @@
+# scheduler.py
+#
+# Builds the dependency graph between stages from the State fields they declare.
+
+def validate_stage_fields(stage):
+    """
+    Checks the ``reads`` and ``writes`` declarations of a stage are either ``None``
+    (undeclared) or a collection of :class:`State` attribute names.
+
+    :param stage: the stage to validate
+    :type stage: :class:`surround.stage.Stage`
+    :raises ValueError: when a declaration is malformed
+    """
+
+    for attribute in ("reads", "writes"):
+        fields = getattr(stage, attribute, None)
+
+        if fields is None:
+            continue
+
+        if isinstance(fields, str) or not isinstance(fields, (list, tuple, set, frozenset)):
+            raise ValueError("%s.%s must be a list, tuple or set of State field names" % (type(stage).__name__, attribute))
+
+        if not all(isinstance(field, str) and field for field in fields):
+            raise ValueError("%s.%s must only contain State field names" % (type(stage).__name__, attribute))
+
+    if stage.reads is not None and stage.writes is None:
+        raise ValueError("%s declares the fields it reads but not the fields it writes" % type(stage).__name__)
+
+def build_stage_graph(stages):
+    """
+    Builds the dependency graph of the stages, a stage depends on every earlier stage that:
+
+    - writes a field it reads or writes (read-after-write, write-after-write)
+    - reads a field it writes (write-after-read)
+    - hasn't declared its fields (which then acts as a barrier)
+
+    Stages that haven't declared both the fields they read and write depend on every earlier
+    stage, undeclared reads are never assumed to be empty (a stage only reading nothing
+    declares ``reads = ()``).
+
+    :param stages: stages in the order they were added to the assembler
+    :type stages: list of :class:`surround.stage.Stage`
+    :return: for each stage, the set of indexes of the stages it depends on
+    :rtype: list of set
+    """
+
+    graph = []
+
+    for index, stage in enumerate(stages):
+        validate_stage_fields(stage)
+        dependencies = set()
+
+        for previous_index, previous in enumerate(stages[:index]):
+            if _is_undeclared(stage) or _is_undeclared(previous):
+                dependencies.add(previous_index)
+                continue
+
+            reads = set(stage.reads)
+            writes = set(stage.writes)
+            previous_reads = set(previous.reads)
+            previous_writes = set(previous.writes)
+
+            if previous_writes & (reads | writes) or writes & previous_reads:
+                dependencies.add(previous_index)
+
+        graph.append(dependencies)
+
+    return graph
+
+def _is_undeclared(stage):
+    return stage.reads is None or stage.writes is None
@@ -0,0 +1,215 @@
+# serialisation.py
+#
+# Encodes and decodes batches of records for the web runner's bulk and streaming endpoints.
+import json
+import importlib
+import importlib.util
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Media types accepted for each format
+_ALIASES = {
+    JSON: JSON,
+    NDJSON: NDJSON,
+    "application/jsonl": NDJSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW: ARROW,
+}
+
+# Packages required to encode and decode each format
+_PACKAGES = {
+    MSGPACK: "msgpack",
+    ARROW: "pyarrow",
+}
+
+def get_format(content_type, default=JSON):
+    """
+    Returns the format of a ``Content-Type`` header, ignoring parameters such as ``charset``.
+    Use :func:`get_accept_format` for ``Accept`` headers.
+
+    :param content_type: the header value (``None`` or ``*/*`` for the default)
+    :type content_type: str
+    :param default: the format returned when no format is given
+    :type default: str
+    :raises ValueError: when the format isn't supported
+    :rtype: str
+    """
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("", "*/*"):
+        return default
+    if media_type not in _ALIASES:
+        raise ValueError("Unsupported media type '%s'" % media_type)
+    return _ALIASES[media_type]
+
+def get_accept_format(accept, default=JSON):
+    """
+    Returns the format to respond in for an ``Accept`` header. The comma separated media ranges
+    are tried in order of their ``q`` weight (then in the order given) and the first one that is
+    supported, with its package installed, is used. ``*/*`` and ``application/*`` select the default.
+
+    :param accept: the header value (``None`` for the default)
+    :type accept: str
+    :param default: the format returned when any format is accepted
+    :type default: str
+    :raises ValueError: when none of the media ranges can be used (e.g. respond with 406)
+    :rtype: str
+    """
+
+    if not accept or not accept.strip():
+        return default
+
+    ranges = []
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *parameters = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if media_type and quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in ("*/*", "application/*"):
+            return default
+
+        body_format = _ALIASES.get(media_type)
+        if body_format and _is_available(body_format):
+            return body_format
+
+    raise ValueError("None of the accepted media types are supported: '%s'" % accept)
+
+def decode_records(body, content_type):
+    """
+    Decode a request body into a list of records.
+
+    JSON bodies may be a single object or a list of objects, NDJSON bodies have one object
+    per line, msgpack bodies are a packed object or list of objects (requires ``msgpack``)
+    and Arrow bodies are an IPC stream with one row per record (requires ``pyarrow``).
+
+    :param body: the request body
+    :type body: bytes
+    :param content_type: the ``Content-Type`` of the body
+    :type content_type: str
+    :raises ValueError: when the format isn't supported or the body is malformed
+    :rtype: list of dict
+    """
+
+    body_format = get_format(content_type)
+
+    if body_format == NDJSON:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    elif body_format == MSGPACK:
+        records = _import("msgpack").unpackb(body, raw=False)
+    elif body_format == ARROW:
+        ipc = _import("pyarrow.ipc")
+        return ipc.open_stream(body).read_all().to_pylist()
+    else:
+        records = json.loads(body)
+
+    if isinstance(records, dict):
+        records = [records]
+    return _check_records(records)
+
+def encode_records(records, content_type):
+    """
+    Encode a list of records in the given format, see :func:`decode_records`.
+
+    :param records: the records to encode
+    :type records: list of dict
+    :param content_type: the format to encode in, e.g. from an ``Accept`` header
+    :type content_type: str
+    :raises ValueError: when the format isn't supported
+    :rtype: bytes
+    """
+
+    body_format = get_format(content_type)
+
+    if body_format == NDJSON:
+        return b"".join(encode_ndjson(record) for record in records)
+
+    if body_format == MSGPACK:
+        return _import("msgpack").packb(records, use_bin_type=True)
+
+    if body_format == ARROW:
+        pyarrow = _import("pyarrow")
+        table = pyarrow.Table.from_pylist(records)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    return json.dumps(records).encode()
+
+def encode_ndjson(record):
+    """
+    Encode a record as a line of NDJSON.
+
+    :rtype: bytes
+    """
+
+    return json.dumps(record).encode() + b"\n"
+
+class NDJSONDecoder:
+    """
+    Incrementally decodes NDJSON from chunks of a streamed body, so records can be processed
+    before the whole body has been received.
+
+    Example::
+
+        decoder = NDJSONDecoder()
+        async for chunk in request.stream():
+            for record in decoder.feed(chunk):
+                ...
+        records = decoder.close()
+    """
+
+    def __init__(self):
+        self.__buffer = b""
+
+    def feed(self, chunk):
+        """
+        Add a chunk of the body and return the records on the lines it completed.
+
+        :param chunk: the next chunk of the body
+        :type chunk: bytes
+        :rtype: list of dict
+        """
+
+        lines = (self.__buffer + chunk).split(b"\n")
+        self.__buffer = lines.pop()
+        return _check_records([json.loads(line) for line in lines if line.strip()])
+
+    def close(self):
+        """
+        Return the record on the last line when the body didn't end with a newline.
+
+        :rtype: list of dict
+        """
+
+        line, self.__buffer = self.__buffer, b""
+        return _check_records([json.loads(line)] if line.strip() else [])
+
+def _check_records(records):
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Expected an object or a list of objects")
+    return records
+
+def _is_available(body_format):
+    package = _PACKAGES.get(body_format)
+    return package is None or importlib.util.find_spec(package) is not None
+
+def _import(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ValueError("'%s' must be installed to use this media type" % name.split(".")[0]) from e
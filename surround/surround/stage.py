@@ -1,3 +1,4 @@
+import copy
 from abc import ABC, abstractmethod
 
 
@@ -5,11 +6,55 @@ class Stage(ABC):
     """
     Base class of all stages in a Surround pipeline.
 
+    Stages may optionally declare the :class:`surround.State` fields they read and write,
+    which allows the assembler to run stages that don't depend on each other concurrently
+    when ``surround.parallel_stages`` is enabled. Stages that don't declare both the fields
+    they read and write are always ran after every stage before them and before every stage
+    after them.
+
+    Example::
+
+        class Tokenise(Stage):
+            reads = ("input_data",)
+            writes = ("tokens",)
+
+            def operate(self, state, config):
+                state.tokens = state.input_data.split()
+
     See the following class for more information:
 
     - :class:`surround.stage.Estimator`
+
+    Stages are assumed to be thread safe: the same instance may be ran by several threads at
+    once when the assembler is ran concurrently (e.g. by a web runner) or with
+    ``surround.parallel_stages``, so ``operate`` should only write to the state it is given.
+    Stages that keep per-call data on ``self`` or wrap a model that can't be called concurrently
+    should set ``thread_safe = False``, the assembler then gives each thread its own instance
+    created with :meth:`surround.stage.Stage.clone`.
+
+    :cvar reads: names of the State fields read by this stage (``None`` if undeclared)
+    :cvar writes: names of the State fields written by this stage (``None`` if undeclared)
+    :cvar thread_safe: whether the stage can be ran by several threads at once
     """
 
+    reads = None
+    writes = None
+    thread_safe = True
+
+    def clone(self):
+        """
+        Create another instance of this initialised stage for a thread to run when the stage
+        isn't :attr:`thread_safe`.
+
+        The default implementation deep copies the stage, override it to share read-only data
+        (e.g. model weights) between the instances or to initialise the new instance differently.
+
+        :return: a stage that can be ran alongside this one
+        :rtype: :class:`surround.stage.Stage`
+        """
+
+        return copy.deepcopy(self)
+
     def dump_output(self, state, config):
         """
         Dump the output of the stage after the stage has transformed the data.
@@ -25,10 +70,34 @@ class Stage(ABC):
     def operate(self, state, config):
         """
         Main function to be called in an assembly.
+
+        May be defined with ``async def``, in which case it is awaited by
+        :meth:`surround.assembler.Assembler.arun` instead of being ran on a thread.
+
         :param state: Contains all pipeline state including input and output data
         :param config: Config for the assembly
         """
 
+    def operate_batch(self, states, config):
+        """
+        Operate on a batch of states in a single call, override this when the stage
+        can process many records more efficiently than one at a time (e.g. vectorised).
+
+        The default implementation calls :meth:`surround.stage.Stage.operate` for each state.
+
+        .. note:: This is called by :meth:`surround.assembler.Assembler.run_batch` only when
+                  overridden, otherwise the assembler calls ``operate`` for each state so that
+                  errors stay isolated to the state that raised them.
+
+        :param states: The states of each record in the batch
+        :type states: list of :class:`surround.State`
+        :param config: Config for the assembly
+        :type config: :class:`surround.config.BaseConfig`
+        """
+
+        for state in states:
+            self.operate(state, config)
+
     def initialise(self, config):
 
         """
@@ -40,6 +109,16 @@ class Stage(ABC):
         :type config: :class:`surround.config.BaseConfig`
         """
 
+    def teardown(self, config):
+        """
+        Release anything acquired in :meth:`surround.stage.Stage.initialise`, e.g. close files.
+
+        .. note:: This is called on the sink of a :class:`surround.runners.StreamingRunner` once the stream ends.
+
+        :param config: Contains the settings for each stage
+        :type config: :class:`surround.config.BaseConfig`
+        """
+
 class Estimator(Stage):
     """
     Base class for an estimator in a Surround pipeline. Responsible for performing estimation
@@ -68,12 +147,33 @@ class Estimator(Stage):
         .. note:: This method is ONLY called by :meth:`surround.assembler.Assembler.run` when
                   running in predict/batch-predict mode.
 
+        May be defined with ``async def``, see :meth:`surround.assembler.Assembler.arun`.
+
         :param state: Stores intermediate data from each stage in the pipeline
         :type state: Instance or child of the :class:`surround.State` class
         :param config: Contains the settings for each stage
         :type config: :class:`surround.config.BaseConfig`
         """
 
+    def estimate_batch(self, states, config):
+        """
+        Process a batch of states and store estimated values, override this when the model
+        is faster when fed many records at once.
+
+        The default implementation calls :meth:`surround.stage.Estimator.estimate` for each state.
+
+        .. note:: This method is ONLY called by :meth:`surround.assembler.Assembler.run_batch` when
+                  overridden and running in predict/batch-predict mode.
+
+        :param states: The states of each record in the batch
+        :type states: list of :class:`surround.State`
+        :param config: Contains the settings for each stage
+        :type config: :class:`surround.config.BaseConfig`
+        """
+
+        for state in states:
+            self.estimate(state, config)
+
     def fit(self, state, config):
         """
         Train a model using the input data.
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from surround import AdmissionController, Overloaded
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_admits_up_to_limit(self):
+        controller = AdmissionController(max_in_flight=2, max_queue=0)
+
+        async def run():
+            await controller.acquire()
+            await controller.acquire()
+            with self.assertRaises(Overloaded) as context:
+                await controller.acquire()
+            self.assertEqual(context.exception.retry_after, 1)
+
+            controller.release()
+            await controller.acquire()
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats(), {"in_flight": 2, "waiting": 0, "admitted": 3, "rejected": 1, "timed_out": 0})
+
+    def test_queue_in_order(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1)
+        order = []
+
+        async def request(name):
+            async with controller.admit():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*(request(name) for name in "abc"))
+
+        asyncio.run(run())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+    def test_queue_full(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1)
+
+        async def request():
+            async with controller.admit():
+                await asyncio.sleep(0.05)
+
+        async def run():
+            return await asyncio.gather(*(request() for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual([isinstance(result, Overloaded) for result in results], [False, False, True])
+        self.assertEqual(controller.stats()["rejected"], 1)
+
+    def test_queue_timeout(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.01, retry_after=5)
+
+        async def run():
+            await controller.acquire()
+            with self.assertRaises(Overloaded) as context:
+                await controller.acquire()
+            self.assertEqual(context.exception.retry_after, 5)
+            controller.release()
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats(), {"in_flight": 0, "waiting": 0, "admitted": 1, "rejected": 1, "timed_out": 1})
+
+    def test_cancelled_while_waiting(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=1)
+
+        async def run():
+            await controller.acquire()
+            waiting = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.sleep(0)
+            controller.release()
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats()["in_flight"], 0)
+        self.assertEqual(controller.stats()["waiting"], 0)
+
+    def test_prometheus(self):
+        controller = AdmissionController(max_in_flight=1)
+        output = controller.to_prometheus()
+
+        self.assertIn("surround_requests_in_flight 0", output)
+        self.assertIn("# TYPE surround_requests_rejected_total counter", output)
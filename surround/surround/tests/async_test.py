@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+import threading
+from surround import Assembler, State, Stage, Estimator, BaseConfig, SurroundConfig, RunMode
+
+class AsyncState(State):
+    def __init__(self):
+        super().__init__()
+        self.fetched = None
+        self.output = None
+        self.trained = False
+        self.throw = False
+        self.final_ran = False
+
+class FetchStage(Stage):
+    reads = ()
+    writes = ("fetched",)
+
+    async def operate(self, state, config):
+        await asyncio.sleep(0)
+        state.fetched = threading.current_thread().name
+
+class SyncStage(Stage):
+    def operate(self, state, config):
+        state.output = threading.current_thread().name
+
+class AsyncEstimator(Estimator):
+    async def estimate(self, state, config):
+        if state.throw:
+            raise Exception("Error!!")
+        state.output = "estimated"
+
+    async def fit(self, state, config):
+        state.trained = True
+
+class FinalStage(Stage):
+    def operate(self, state, config):
+        state.final_ran = True
+
+class TestAsyncAssembler(unittest.TestCase):
+
+    def test_arun(self):
+        data = AsyncState()
+        assembler = Assembler("Async test").set_stages([FetchStage(), SyncStage()])
+        assembler.set_finaliser(FinalStage())
+        asyncio.run(assembler.arun(data))
+
+        # Coroutine stages run on the event loop, sync stages are offloaded to a thread
+        self.assertEqual(data.fetched, threading.current_thread().name)
+        self.assertNotEqual(data.output, threading.current_thread().name)
+        self.assertTrue(data.final_ran)
+        self.assertEqual(len(data.execution_time), 3)
+
+    def test_arun_fit(self):
+        data = AsyncState()
+        assembler = Assembler("Async fit test").set_stages([FetchStage(), AsyncEstimator()])
+        asyncio.run(assembler.arun(data, RunMode.TRAIN))
+        self.assertTrue(data.trained)
+
+    def test_arun_stop_on_exception(self):
+        data = AsyncState()
+        data.throw = True
+        assembler = Assembler("Async fail test").set_stages([AsyncEstimator(), SyncStage()])
+        assembler.set_finaliser(FinalStage())
+        asyncio.run(assembler.arun(data))
+
+        self.assertEqual(data.errors, ["Error!!"])
+        self.assertIsNone(data.output)
+        self.assertTrue(data.final_ran)
+
+    def test_arun_parallel(self):
+        data = AsyncState()
+        config = BaseConfig(surround=SurroundConfig(parallel_stages=True))
+        assembler = Assembler("Async parallel test").set_stages([FetchStage(), AsyncEstimator()]).set_config(config)
+        asyncio.run(assembler.arun(data))
+
+        self.assertIsNotNone(data.fetched)
+        self.assertEqual(data.output, "estimated")
+
+    def test_run_with_async_stages(self):
+        data = AsyncState()
+        assembler = Assembler("Sync run test").set_stages([FetchStage(), AsyncEstimator()])
+        assembler.run(data)
+
+        self.assertIsNotNone(data.fetched)
+        self.assertEqual(data.output, "estimated")
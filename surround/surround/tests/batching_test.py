@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from surround import Assembler, Stage, State, RequestBatcher
+
+class BatchState(State):
+    def __init__(self, input_data):
+        super().__init__()
+        self.input_data = input_data
+        self.output_data = None
+
+class UpperBatch(Stage):
+    def __init__(self):
+        self.batch_sizes = []
+
+    def operate(self, state, config):
+        self.operate_batch([state], config)
+
+    def operate_batch(self, states, config):
+        self.batch_sizes.append(len(states))
+        for state in states:
+            if state.input_data == "fail":
+                raise ValueError("failed")
+            state.output_data = state.input_data.upper()
+
+class TestRequestBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.stage = UpperBatch()
+        self.assembler = Assembler("Batching test").set_stages([self.stage])
+
+    def test_batches_concurrent_requests(self):
+        batcher = RequestBatcher(self.assembler, max_batch_size=4, max_wait=0.05)
+        states = [BatchState(str(i)) for i in range(10)]
+
+        async def run():
+            await asyncio.gather(*(batcher.submit(state) for state in states))
+
+        asyncio.run(run())
+
+        self.assertEqual([state.output_data for state in states], [str(i) for i in range(10)])
+        self.assertEqual(self.stage.batch_sizes, [4, 4, 2])
+
+        stats = batcher.stats()
+        self.assertEqual(stats["batches"], 3)
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["batch_sizes"], {2: 1, 4: 2})
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertGreaterEqual(stats["max_queue_depth"], 4)
+
+    def test_max_wait(self):
+        batcher = RequestBatcher(self.assembler, max_batch_size=8, max_wait=0.01)
+
+        async def run():
+            first = asyncio.ensure_future(batcher.submit(BatchState("a")))
+            await asyncio.sleep(0.1)
+            await asyncio.gather(first, batcher.submit(BatchState("b")))
+
+        asyncio.run(run())
+        self.assertEqual(self.stage.batch_sizes, [1, 1])
+
+    def test_errors_per_batch(self):
+        batcher = RequestBatcher(self.assembler, max_batch_size=2, max_wait=0.05)
+        states = [BatchState("a"), BatchState("fail")]
+
+        async def run():
+            await asyncio.gather(*(batcher.submit(state) for state in states))
+
+        asyncio.run(run())
+        self.assertEqual(states[0].errors, ["failed"])
+        self.assertEqual(states[1].errors, ["failed"])
+
+    def test_prometheus(self):
+        batcher = RequestBatcher(self.assembler, max_batch_size=2, max_wait=0.05)
+
+        async def run():
+            await asyncio.gather(*(batcher.submit(BatchState(value)) for value in "abc"))
+
+        asyncio.run(run())
+        output = batcher.to_prometheus()
+
+        self.assertIn("surround_request_queue_depth 0", output)
+        self.assertIn('surround_request_batch_size_bucket{le="1"} 1', output)
+        self.assertIn('surround_request_batch_size_bucket{le="+Inf"} 2', output)
+        self.assertIn("surround_request_batch_size_sum 3", output)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            RequestBatcher(self.assembler, max_batch_size=0)
@@ -0,0 +1,165 @@
+import time
+import pickle
+import unittest
+import tempfile
+from surround import Assembler, Stage, Estimator, State, ResultCache, CachedStage, RunMode
+
+class CacheState(State):
+    def __init__(self, input_data):
+        super().__init__()
+        self.input_data = input_data
+        self.output_data = None
+
+class Upper(Stage):
+    def __init__(self):
+        self.calls = 0
+
+    def operate(self, state, config):
+        self.calls += 1
+        if state.input_data == "fail":
+            raise ValueError("failed")
+        state.output_data = state.input_data.upper()
+
+class Suffix(Stage):
+    def operate(self, state, config):
+        state.output_data += "!"
+
+class Fit(Estimator):
+    def estimate(self, state, config):
+        state.output_data = state.input_data
+
+    def fit(self, state, config):
+        state.output_data = "fitted"
+
+class TestResultCache(unittest.TestCase):
+
+    def test_assembler_cache(self):
+        stage = Upper()
+        cache = ResultCache(["input_data"], ["output_data"])
+        assembler = Assembler("Cache test").set_stages([stage, Suffix()]).set_cache(cache)
+
+        outputs = []
+        for value in ["a", "b", "a"]:
+            data = CacheState(value)
+            assembler.run(data)
+            outputs.append(data.output_data)
+
+        self.assertEqual(outputs, ["A!", "B!", "A!"])
+        self.assertEqual(stage.calls, 2)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "evictions": 0, "size": 2})
+
+    def test_errors_not_cached(self):
+        stage = Upper()
+        cache = ResultCache(["input_data"], ["output_data"])
+        assembler = Assembler("Cache test").set_stages([stage]).set_cache(cache)
+
+        for _ in range(2):
+            data = CacheState("fail")
+            assembler.run(data)
+            self.assertTrue(data.errors)
+
+        self.assertEqual(stage.calls, 2)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_train_bypasses_cache(self):
+        cache = ResultCache(["input_data"], ["output_data"])
+        assembler = Assembler("Cache test").set_stages([Fit()]).set_cache(cache)
+
+        assembler.run(CacheState("a"), RunMode.TRAIN)
+        self.assertEqual(cache.stats()["misses"], 0)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_run_batch_cache(self):
+        stage = Upper()
+        cache = ResultCache(["input_data"], ["output_data"])
+        assembler = Assembler("Cache test").set_stages([stage]).set_cache(cache)
+
+        assembler.run(CacheState("a"))
+        states = [CacheState(value) for value in ["a", "b", "fail"]]
+        assembler.run_batch(states)
+
+        self.assertEqual([state.output_data for state in states[:2]], ["A", "B"])
+        self.assertTrue(states[2].errors)
+        self.assertEqual(stage.calls, 3)
+        self.assertEqual(cache.stats()["size"], 2)
+
+    def test_lru_eviction(self):
+        cache = ResultCache(["input_data"], ["output_data"], max_size=2)
+
+        for value in ["a", "b"]:
+            data = CacheState(value)
+            data.output_data = value.upper()
+            cache.store(data)
+
+        self.assertTrue(cache.load(CacheState("a")))
+        data = CacheState("c")
+        data.output_data = "C"
+        cache.store(data)
+
+        self.assertFalse(cache.load(CacheState("b")))
+        self.assertTrue(cache.load(CacheState("a")))
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "evictions": 1, "size": 2})
+
+    def test_ttl(self):
+        cache = ResultCache(["input_data"], ["output_data"], ttl=0.05)
+        data = CacheState("a")
+        data.output_data = "A"
+        cache.store(data)
+
+        self.assertTrue(cache.load(CacheState("a")))
+        time.sleep(0.1)
+        self.assertFalse(cache.load(CacheState("a")))
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            stage = Upper()
+            assembler = Assembler("Cache test").set_stages([stage])
+
+            assembler.set_cache(ResultCache(["input_data"], ["output_data"], cache_dir=cache_dir))
+            assembler.run(CacheState("a"))
+
+            # A new cache (e.g. in the next run) picks up the entries written to disk
+            cache = ResultCache(["input_data"], ["output_data"], cache_dir=cache_dir)
+            assembler.set_cache(cache)
+            data = CacheState("a")
+            assembler.run(data)
+
+            self.assertEqual(data.output_data, "A")
+            self.assertEqual(stage.calls, 1)
+            self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_key_func(self):
+        cache = ResultCache(["input_data"], ["output_data"], key_func=lambda state: state.input_data.lower())
+        data = CacheState("a")
+        data.output_data = "A"
+        cache.store(data)
+
+        self.assertTrue(cache.load(CacheState("A")))
+
+    def test_cached_stage(self):
+        upper = Upper()
+        cached = CachedStage([upper], ResultCache(["input_data"], ["output_data"]))
+        assembler = Assembler("Cache test").set_stages([cached, Suffix()])
+        assembler.init_assembler()
+
+        for value in ["a", "a"]:
+            data = CacheState(value)
+            assembler.run(data)
+            self.assertEqual(data.output_data, "A!")
+
+        self.assertEqual(upper.calls, 1)
+        self.assertEqual(cached.reads, ("input_data",))
+        self.assertEqual(cached.writes, ("output_data",))
+
+    def test_cached_stage_rejects_estimator(self):
+        cache = ResultCache(["input_data"], ["output_data"])
+        self.assertRaises(TypeError, CachedStage, [Upper(), Fit()], cache)
+
+    def test_pickle(self):
+        cache = ResultCache(["input_data"], ["output_data"])
+        data = CacheState("a")
+        data.output_data = "A"
+        cache.store(data)
+
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertTrue(copy.load(CacheState("a")))
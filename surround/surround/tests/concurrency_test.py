@@ -0,0 +1,107 @@
+import time
+import pickle
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from surround import Assembler, Stage, State
+
+class ConcurrencyState(State):
+    def __init__(self, input_data):
+        super().__init__()
+        self.input_data = input_data
+        self.output_data = None
+        self.instance = None
+
+class Slow(Stage):
+    def operate(self, state, config):
+        time.sleep(0.01)
+        state.output_data = state.input_data * 2
+
+class AsyncSlow(Stage):
+    async def operate(self, state, config):
+        await asyncio.sleep(0.01)
+        state.output_data = state.input_data * 2
+
+class Unsafe(Stage):
+    thread_safe = False
+
+    def __init__(self):
+        self.current = None
+
+    def operate(self, state, config):
+        # Keeps per-call data on the instance, only safe when each thread has its own copy
+        self.current = state.input_data
+        time.sleep(0.01)
+        state.output_data = self.current
+        state.instance = id(self)
+
+class TestConcurrency(unittest.TestCase):
+
+    def test_concurrent_run(self):
+        assembler = Assembler("Concurrency test").set_stages([Slow()])
+        assembler.init_assembler()
+
+        def run(value):
+            state = ConcurrencyState(value)
+            assembler.run(state)
+            return state, assembler.state
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run, range(32)))
+
+        for value, (state, current) in enumerate(results):
+            self.assertIs(current, state)
+            self.assertEqual(state.output_data, value * 2)
+
+    def test_concurrent_arun(self):
+        assembler = Assembler("Concurrency test").set_stages([AsyncSlow()])
+        assembler.init_assembler()
+
+        async def run(value):
+            state = ConcurrencyState(value)
+            await assembler.arun(state)
+            return state, assembler.state
+
+        async def run_all():
+            return await asyncio.gather(*(run(value) for value in range(16)))
+
+        for value, (state, current) in enumerate(asyncio.run(run_all())):
+            self.assertIs(current, state)
+            self.assertEqual(state.output_data, value * 2)
+
+    def test_unsafe_stage_per_thread(self):
+        stage = Unsafe()
+        assembler = Assembler("Concurrency test").set_stages([stage])
+        assembler.init_assembler()
+
+        first = ConcurrencyState(-1)
+        assembler.run(first)
+        self.assertEqual(first.instance, id(stage))
+
+        barrier = threading.Barrier(4)
+
+        def run(value):
+            barrier.wait()
+            state = ConcurrencyState(value)
+            assembler.run(state)
+            return state
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            states = list(executor.map(run, range(4)))
+
+        self.assertEqual([state.output_data for state in states], list(range(4)))
+        instances = {state.instance for state in states}
+        self.assertEqual(len(instances), 4)
+        self.assertNotIn(id(stage), instances)
+
+    def test_pickle(self):
+        assembler = Assembler("Concurrency test").set_stages([Unsafe()])
+        assembler.init_assembler()
+        assembler.run(ConcurrencyState(1))
+
+        copy = pickle.loads(pickle.dumps(assembler))
+        state = ConcurrencyState(2)
+        copy.run(state)
+        self.assertEqual(state.output_data, 2)
+        self.assertIs(copy.state, state)
@@ -1,9 +1,15 @@
 from unittest.mock import patch
 import unittest
 import os
+import sys
+import shutil
+import tempfile
+import itertools
 from dataclasses import dataclass, field
 from typing import List
+from omegaconf import OmegaConf
 from surround import BaseConfig, config as surround_config, load_config
+from surround.config import get_project_root, find_package_path, clear_project_cache
 
 yaml1 = """
 main:
@@ -30,6 +36,12 @@ class Config(BaseConfig):
     objects: List[DataObject] = field(default_factory=lambda: [])
     enable_logging: bool = False
 
+RUNS = itertools.count()
+
+@dataclass
+class RunConfig(BaseConfig):
+    run: int = field(default_factory=lambda: next(RUNS))
+
 class TestConfig(unittest.TestCase):
 
     def setUp(self):
@@ -68,3 +80,197 @@ class TestConfig(unittest.TestCase):
                 overrides=['main.count=${env:SURROUND_MAIN_COUNT}']
             )
             self.assertEqual(config["main"]["count"], 45)
+
+class TestProjectDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.owd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, ".surround"))
+        os.makedirs(os.path.join(self.root, "project", "stages"))
+        with open(os.path.join(self.root, "project", "config.yaml"), "w") as f:
+            f.write("")
+        os.chdir(os.path.join(self.root, "project", "stages"))
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.root)
+        clear_project_cache()
+
+    def test_discovery(self):
+        root = os.path.realpath(self.root)
+        self.assertEqual(get_project_root(), root)
+        self.assertEqual(find_package_path(), os.path.join(root, "project"))
+
+    def test_skipped_directories(self):
+        # config.yaml files in data, output, hidden or virtualenv directories are ignored
+        for path in ("input", "output/2021/.hydra", ".git", "venv", "env/lib"):
+            os.makedirs(os.path.join(self.root, path))
+            with open(os.path.join(self.root, path, "config.yaml"), "w") as f:
+                f.write("")
+        with open(os.path.join(self.root, "env", "pyvenv.cfg"), "w") as f:
+            f.write("")
+
+        self.assertEqual(find_package_path(), os.path.join(os.path.realpath(self.root), "project"))
+
+    def test_ambiguous_package(self):
+        os.mkdir(os.path.join(self.root, "other"))
+        with open(os.path.join(self.root, "other", "config.yaml"), "w") as f:
+            f.write("")
+
+        self.assertIsNone(find_package_path())
+
+    def test_cached(self):
+        root = get_project_root()
+        package_path = find_package_path()
+
+        # surround.config is shadowed by the config decorator, so patch the module directly
+        module = sys.modules[get_project_root.__module__]
+        with patch.object(module, "_search_project_root") as search_root, \
+             patch.object(module, "_search_package_path") as search_package:
+            self.assertEqual(get_project_root(), root)
+            self.assertEqual(find_package_path(), package_path)
+            search_root.assert_not_called()
+            search_package.assert_not_called()
+
+    def test_invalidated(self):
+        self.assertIsNotNone(get_project_root())
+
+        # Changing the working directory searches again
+        os.chdir(self.owd)
+        outside = tempfile.mkdtemp()
+        try:
+            self.assertIsNone(get_project_root(outside))
+        finally:
+            os.rmdir(outside)
+
+        # Projects that no longer exist are searched for again
+        os.chdir(os.path.join(self.root, "project", "stages"))
+        self.assertIsNotNone(get_project_root())
+        os.rmdir(os.path.join(self.root, ".surround"))
+        self.assertIsNone(get_project_root())
+
+    def test_environment_override(self):
+        with patch.dict("os.environ", {"SURROUND_PROJECT_ROOT": "/srv/project", "SURROUND_PACKAGE_PATH": "/srv/project/app"}):
+            self.assertEqual(get_project_root(), "/srv/project")
+            self.assertEqual(find_package_path(), "/srv/project/app")
+
+class TestConfigSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.owd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, "config"))
+        self.config_dir = os.path.join(self.root, "config")
+        self.snapshot_dir = os.path.join(self.root, "snapshots")
+        self.write_yaml(yaml1)
+        os.chdir(self.root)
+
+    def tearDown(self):
+        os.chdir(self.owd)
+        shutil.rmtree(self.root)
+
+    def write_yaml(self, contents):
+        with open(os.path.join(self.config_dir, "test_config.yaml"), "w") as f:
+            f.write(contents)
+
+    def load(self, overrides=None):
+        return load_config(name="test_config", config_class=Config, config_dir=self.config_dir,
+                           overrides=overrides, snapshot_dir=self.snapshot_dir)
+
+    def test_snapshot_loaded(self):
+        composed = self.load(["main.count=20"])
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+        with patch("hydra.experimental.compose") as compose:
+            loaded = self.load(["main.count=20"])
+            compose.assert_not_called()
+
+        self.assertEqual(loaded.main.count, 20)
+        self.assertEqual(loaded.objects[0].size, 355)
+        self.assertTrue(loaded.enable_logging)
+        self.assertEqual(OmegaConf.get_type(loaded), Config)
+
+        # The output path is generated again, so may differ by a second
+        loaded_values, composed_values = OmegaConf.to_container(loaded), OmegaConf.to_container(composed)
+        loaded_values.pop("output_path")
+        composed_values.pop("output_path")
+        self.assertEqual(loaded_values, composed_values)
+
+        # Values that can't be set are still rejected
+        with self.assertRaises(Exception):
+            loaded.main.count = "many"
+
+    def test_generated_defaults_not_saved(self):
+        self.load()
+        with open(os.path.join(self.snapshot_dir, os.listdir(self.snapshot_dir)[0])) as f:
+            snapshot = f.read()
+
+        self.assertIn("count: 15", snapshot)
+        self.assertNotIn("output_path", snapshot)
+        self.assertNotIn("project_root", snapshot)
+
+    def test_default_factory_not_saved(self):
+        # Every instance of the schema gets a new run number, so it must be generated again
+        first = load_config(name="run_config", config_class=RunConfig, config_dir=self.config_dir,
+                            snapshot_dir=self.snapshot_dir)
+        second = load_config(name="run_config", config_class=RunConfig, config_dir=self.config_dir,
+                             snapshot_dir=self.snapshot_dir)
+
+        with open(os.path.join(self.snapshot_dir, os.listdir(self.snapshot_dir)[0])) as f:
+            self.assertNotIn("run", OmegaConf.load(f).config)
+        self.assertNotEqual(first.run, second.run)
+
+    def test_snapshot_dir_in_config_dir(self):
+        self.snapshot_dir = os.path.join(self.config_dir, "snapshots")
+        self.load()
+
+        with patch("hydra.experimental.compose") as compose:
+            self.assertEqual(self.load().main.count, 15)
+            compose.assert_not_called()
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+    def test_only_config_files_hashed(self):
+        # Only YAML files at the top of the search path and in its config groups are hashed
+        os.makedirs(os.path.join(self.config_dir, "db"))
+        os.makedirs(os.path.join(self.config_dir, "data", "deep"))
+        for path, contents in (("db/local.yaml", "host: localhost"), ("data/deep/labels.yaml", "a: 1")):
+            with open(os.path.join(self.config_dir, path), "w") as f:
+                f.write(contents)
+        self.load()
+
+        with open(os.path.join(self.config_dir, "data", "deep", "labels.yaml"), "w") as f:
+            f.write("a: 2")
+        self.load()
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+        with open(os.path.join(self.config_dir, "db", "local.yaml"), "w") as f:
+            f.write("host: db")
+        self.load()
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 2)
+
+    def test_snapshot_invalidated(self):
+        self.load()
+
+        # Changing the YAML files or the overrides composes the configuration again
+        self.write_yaml(yaml1.replace("count: 15", "count: 16"))
+        self.assertEqual(self.load().main.count, 16)
+        self.assertEqual(self.load(["main.count=17"]).main.count, 17)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 3)
+
+    def test_invalid_snapshot(self):
+        self.load()
+        path = os.path.join(self.snapshot_dir, os.listdir(self.snapshot_dir)[0])
+        with open(path) as f:
+            snapshot = f.read()
+        with open(path, "w") as f:
+            f.write(snapshot.replace("count: 15", "count: fifteen"))
+
+        self.assertEqual(self.load().main.count, 15)
+        with open(path) as f:
+            self.assertIn("count: 15", f.read())
+
+    def test_environment(self):
+        with patch.dict("os.environ", {"SURROUND_CONFIG_SNAPSHOT_DIR": self.snapshot_dir}):
+            load_config(name="test_config", config_class=Config, config_dir=self.config_dir)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
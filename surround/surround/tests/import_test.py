@@ -0,0 +1,46 @@
+import sys
+import unittest
+import subprocess
+
+# Modules that are slow to import and should only be loaded once they are used
+LAZY_MODULES = ["hydra", "omegaconf", "pkg_resources", "numpy", "cProfile", "tracemalloc", "multiprocessing"]
+
+def measure_import(statement):
+    """
+    Runs the statement in a new interpreter with ``-X importtime`` and returns the
+    cumulative import time in microseconds of every top-level package imported.
+    """
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                             stderr=subprocess.PIPE, encoding="utf-8", check=True)
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            package = name.strip().split(".")[0]
+            times[package] = max(times.get(package, 0), int(cumulative))
+    return times
+
+class TestImportTime(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        times = measure_import("import surround")
+
+        self.assertIn("surround", times)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, times)
+
+    def test_version(self):
+        times = measure_import("import surround; print(surround.__version__)")
+        self.assertNotIn("pkg_resources", times)
+
+def main():
+    # Benchmark: python -m surround.tests.import_test
+    for name, microseconds in sorted(measure_import("import surround").items(), key=lambda item: -item[1])[:15]:
+        print("%-24s %8.1f ms" % (name, microseconds / 1000))
+
+if __name__ == "__main__":
+    main()
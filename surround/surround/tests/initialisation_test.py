@@ -0,0 +1,123 @@
+import time
+import pickle
+import asyncio
+import threading
+import unittest
+from surround import Assembler, Stage, State, BaseConfig, SurroundConfig
+
+class InitState(State):
+    def __init__(self):
+        super().__init__()
+        self.outputs = []
+
+class SlowInit(Stage):
+    def __init__(self, name, delay=0.1):
+        self.name = name
+        self.delay = delay
+        self.initialised = 0
+        self.threads = set()
+
+    def initialise(self, config):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        self.initialised += 1
+
+    def operate(self, state, config):
+        state.outputs.append(self.name)
+
+class AsyncInit(SlowInit):
+    async def operate(self, state, config):
+        state.outputs.append(self.name)
+
+class FailingInit(Stage):
+    def initialise(self, config):
+        raise ValueError("failed to load model")
+
+    def operate(self, state, config):
+        pass
+
+def make_config(**kwargs):
+    return BaseConfig(surround=SurroundConfig(**kwargs))
+
+class TestStageInitialisation(unittest.TestCase):
+
+    def test_serial_init(self):
+        stages = [SlowInit("a", 0), SlowInit("b", 0)]
+        finaliser = SlowInit("final", 0)
+        assembler = Assembler("Init test").set_stages(stages).set_finaliser(finaliser)
+
+        self.assertFalse(assembler.readiness()["ready"])
+        self.assertTrue(assembler.init_assembler())
+
+        readiness = assembler.readiness()
+        self.assertTrue(readiness["ready"])
+        self.assertEqual([stage["name"] for stage in readiness["stages"]], ["SlowInit"] * 3)
+        self.assertTrue(all(stage["warm"] and stage["init_time"] >= 0 for stage in readiness["stages"]))
+        self.assertEqual(finaliser.initialised, 1)
+
+    def test_parallel_init(self):
+        stages = [SlowInit(name, 0.2) for name in "abcd"]
+        assembler = Assembler("Init test", make_config(parallel_stage_init=True, max_init_workers=4))
+        assembler.set_stages(stages)
+
+        start = time.perf_counter()
+        self.assertTrue(assembler.init_assembler())
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.6)
+        self.assertTrue(all(stage.initialised == 1 for stage in stages))
+        self.assertEqual(len(set.union(*(stage.threads for stage in stages))), 4)
+
+    def test_parallel_init_failure(self):
+        assembler = Assembler("Init test", make_config(parallel_stage_init=True))
+        assembler.set_stages([SlowInit("a", 0), FailingInit()])
+
+        self.assertFalse(assembler.init_assembler())
+        self.assertFalse(assembler.readiness()["ready"])
+
+    def test_lazy_init(self):
+        stages = [SlowInit("a", 0), SlowInit("b", 0)]
+        assembler = Assembler("Init test", make_config(lazy_stage_init=True)).set_stages(stages)
+
+        self.assertTrue(assembler.init_assembler())
+        readiness = assembler.readiness()
+        self.assertTrue(readiness["ready"])
+        self.assertFalse(any(stage["warm"] for stage in readiness["stages"]))
+
+        for _ in range(2):
+            data = InitState()
+            assembler.run(data)
+            self.assertEqual(data.outputs, ["a", "b"])
+
+        self.assertEqual([stage.initialised for stage in stages], [1, 1])
+        self.assertTrue(all(stage["warm"] for stage in assembler.readiness()["stages"]))
+
+    def test_lazy_init_async(self):
+        stage = AsyncInit("a", 0)
+        assembler = Assembler("Init test", make_config(lazy_stage_init=True)).set_stages([stage])
+        assembler.init_assembler()
+
+        data = InitState()
+        asyncio.run(assembler.arun(data))
+
+        self.assertEqual(data.outputs, ["a"])
+        self.assertEqual(stage.initialised, 1)
+
+    def test_lazy_init_failure(self):
+        assembler = Assembler("Init test", make_config(lazy_stage_init=True))
+        assembler.set_stages([FailingInit(), SlowInit("a", 0)])
+        self.assertTrue(assembler.init_assembler())
+
+        data = InitState()
+        assembler.run(data)
+
+        self.assertEqual(data.errors, ["failed to load model"])
+        self.assertEqual(data.outputs, [])
+
+    def test_pickle(self):
+        assembler = Assembler("Init test").set_stages([SlowInit("a", 0)])
+        assembler.init_assembler()
+
+        copy = pickle.loads(pickle.dumps(assembler))
+        self.assertTrue(copy.readiness()["stages"][0]["warm"])
+        self.assertIsNotNone(copy.init_lock)
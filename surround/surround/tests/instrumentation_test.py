@@ -0,0 +1,111 @@
+import pickle
+import unittest
+import threading
+from unittest import mock
+from surround import Assembler, State, Stage, BaseConfig, SurroundConfig
+from surround.instrumentation import LatencyHistogram, StageInstrumentation, perf_counter_ns
+
+class CountState(State):
+    def __init__(self, fail=False):
+        super().__init__()
+        self.fail = fail
+
+class CountStage(Stage):
+    def operate(self, state, config):
+        if state.fail:
+            state.errors.append("Error!!")
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.observe(1000000)
+        for _ in range(10):
+            histogram.observe(300000000)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertLessEqual(histogram.percentile(0.5), 0.001)
+        self.assertGreater(histogram.percentile(0.5), 0.0005)
+        self.assertGreater(histogram.percentile(0.99), 0.25)
+        self.assertLessEqual(histogram.percentile(0.99), 0.3)
+        self.assertIsNone(LatencyHistogram().percentile(0.5))
+
+    def test_assembler_stats(self):
+        assembler = Assembler("Stats test").set_stages([CountStage()])
+        assembler.init_assembler()
+
+        for fail in [False, False, True]:
+            state = CountState(fail)
+            assembler.run(state)
+            self.assertIsInstance(state.execution_time[0], float)
+
+        stats = assembler.instrumentation.summary()["CountStage"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["errors"], 1)
+        self.assertIsNotNone(stats["p99"])
+
+    def test_batch_stats(self):
+        assembler = Assembler("Batch stats test").set_stages([CountStage()])
+        assembler.run_batch([CountState(), CountState(True)])
+
+        stats = assembler.instrumentation.summary()["CountStage"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["errors"], 1)
+
+    def test_sampling(self):
+        config = BaseConfig(surround=SurroundConfig(stage_timing_sample_rate=0.1))
+        assembler = Assembler("Sampling test").set_stages([CountStage()]).set_config(config)
+        assembler.init_assembler()
+
+        states = [CountState() for _ in range(100)]
+        with mock.patch("surround.instrumentation.perf_counter_ns", wraps=perf_counter_ns) as clock:
+            for state in states:
+                assembler.run(state)
+
+        # Unsampled runs aren't timed at all
+        self.assertEqual(clock.call_count, 10)
+        self.assertEqual(sum(state.execution_time[0] is None for state in states), 90)
+        self.assertEqual(assembler.instrumentation.calls["CountStage"], 100)
+        self.assertEqual(assembler.instrumentation.histograms["CountStage"].count, 10)
+        self.assertRaises(ValueError, assembler.instrumentation.set_sample_rate, 0)
+
+    def test_calls_across_threads(self):
+        instrumentation = StageInstrumentation("Threads test")
+        instrumentation.set_sample_rate(0.5)
+
+        threads = [threading.Thread(target=lambda: [instrumentation.record("CountStage", 1000) for _ in range(1000)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(instrumentation.calls["CountStage"], 4000)
+        self.assertEqual(instrumentation.histograms["CountStage"].count, 2000)
+        self.assertEqual(instrumentation.summary()["CountStage"]["calls"], 4000)
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.calls, {})
+
+    def test_prometheus(self):
+        instrumentation = StageInstrumentation('Export "test"')
+        instrumentation.record("CountStage", 20000)
+        instrumentation.record_error("CountStage")
+
+        text = instrumentation.to_prometheus()
+        labels = 'assembler="Export \\"test\\"",stage="CountStage"'
+        self.assertIn('surround_stage_duration_seconds_bucket{%s,le="1e-05"} 0' % labels, text)
+        self.assertIn('surround_stage_duration_seconds_bucket{%s,le="2.5e-05"} 1' % labels, text)
+        self.assertIn('surround_stage_duration_seconds_bucket{%s,le="+Inf"} 1' % labels, text)
+        self.assertIn('surround_stage_duration_seconds_count{%s} 1' % labels, text)
+        self.assertIn('surround_stage_calls_total{%s} 1' % labels, text)
+        self.assertIn('surround_stage_errors_total{%s} 1' % labels, text)
+
+    def test_pickle(self):
+        instrumentation = StageInstrumentation("Pickle test")
+        instrumentation.record("CountStage", 20000)
+
+        copy = pickle.loads(pickle.dumps(instrumentation))
+        copy.record("CountStage", 20000)
+        self.assertEqual(copy.calls["CountStage"], 2)
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+import threading
+from surround import Assembler, Stage, State, SlottedState, StatePool
+
+class RecordState(SlottedState):
+    input_data: str = None
+    outputs: list = []
+
+class Record(Stage):
+    def operate(self, state, config):
+        state.outputs.append(state.input_data.upper())
+
+class TestStatePool(unittest.TestCase):
+
+    def test_acquire_release(self):
+        pool = StatePool(RecordState, size=2)
+        first = pool.acquire(input_data="a")
+        second = pool.acquire(input_data="b")
+        third = pool.acquire(input_data="c")
+
+        self.assertEqual([first.input_data, second.input_data, third.input_data], ["a", "b", "c"])
+        self.assertEqual(pool.stats(), {"hits": 2, "misses": 1, "dropped": 0, "idle": 0})
+
+        first.outputs.append("A")
+        for state in (first, second, third):
+            pool.release(state)
+        self.assertEqual(pool.stats(), {"hits": 2, "misses": 1, "dropped": 1, "idle": 2})
+
+        reused = pool.acquire()
+        self.assertIn(reused, (first, second))
+        self.assertIsNone(reused.input_data)
+        self.assertEqual(reused.outputs, [])
+
+    def test_borrow(self):
+        pool = StatePool(RecordState, size=1, preallocate=False)
+        assembler = Assembler("Pool test").set_stages([Record()])
+
+        for value in ["a", "b"]:
+            with pool.borrow(input_data=value) as state:
+                assembler.run(state)
+                self.assertEqual(state.outputs, [value.upper()])
+
+        self.assertEqual(pool.stats(), {"hits": 1, "misses": 1, "dropped": 0, "idle": 1})
+
+    def test_borrow_cancelled(self):
+        pool = StatePool(RecordState, size=1)
+        started, finish = threading.Event(), threading.Event()
+
+        def operate(state):
+            started.set()
+            finish.wait(5)
+            state.outputs.append("done")
+
+        async def request():
+            with pool.borrow(input_data="a") as state:
+                await asyncio.get_running_loop().run_in_executor(None, operate, state)
+
+        async def cancel():
+            task = asyncio.ensure_future(request())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            # The state is still being written to by the thread, so isn't returned to the pool
+            self.assertEqual(pool.stats(), {"hits": 1, "misses": 0, "dropped": 1, "idle": 0})
+            finish.set()
+
+        asyncio.run(cancel())
+
+        # Ordinary errors still return the state
+        with self.assertRaises(ValueError):
+            with pool.borrow():
+                raise ValueError()
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_requires_reset(self):
+        self.assertRaises(TypeError, StatePool, State)
+
+    def test_thread_safety(self):
+        pool = StatePool(RecordState, size=4)
+
+        def work():
+            for _ in range(200):
+                with pool.borrow(input_data="a") as state:
+                    state.outputs.append(1)
+                    assert state.outputs == [1]
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 1600)
+        self.assertEqual(stats["idle"], 4)
@@ -0,0 +1,108 @@
+import os
+import time
+import signal
+import socket
+import tempfile
+import unittest
+import multiprocessing
+from surround import PreforkServer
+
+GENERATION = 0
+
+def initialise():
+    global GENERATION # pylint: disable=global-statement
+    GENERATION += 1
+
+def serve(sock, worker_id):
+    while True:
+        conn, _ = sock.accept()
+        conn.sendall(("%d:%d:%d" % (GENERATION, worker_id, os.getpid())).encode())
+        conn.close()
+
+def run_server(port):
+    PreforkServer(initialise, serve, workers=2, host="127.0.0.1", port=port, shutdown_timeout=5).run()
+
+def run_crashing_server(port, path):
+    def crash(sock, worker_id):
+        with open(path, "a") as starts:
+            starts.write("%f\n" % time.monotonic())
+        raise RuntimeError("Failed to start")
+
+    PreforkServer(lambda: None, crash, workers=1, host="127.0.0.1", port=port,
+                  max_restarts=3, restart_backoff=0.1, max_restart_backoff=1).run()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+class TestPreforkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.process = multiprocessing.get_context("fork").Process(target=run_server, args=(self.port,))
+        self.process.start()
+
+    def tearDown(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+    def request(self):
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=5) as conn:
+                    generation, worker_id, pid = conn.recv(64).decode().split(":")
+                    return int(generation), int(worker_id), int(pid)
+            except (ConnectionError, ValueError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def wait_for(self, predicate):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            response = self.request()
+            if predicate(response):
+                return response
+            time.sleep(0.05)
+        self.fail("condition not met")
+
+    def test_restart_reload_stop(self):
+        generation, worker_id, pid = self.request()
+        self.assertEqual(generation, 1)
+        self.assertIn(worker_id, (0, 1))
+
+        # Workers that die are restarted without initialising again
+        os.kill(pid, signal.SIGKILL)
+        self.wait_for(lambda response: response[1] == worker_id and response[2] != pid)
+        self.assertEqual(self.request()[0], 1)
+
+        # SIGHUP initialises again and replaces the workers
+        os.kill(self.process.pid, signal.SIGHUP)
+        self.wait_for(lambda response: response[0] == 2)
+
+        os.kill(self.process.pid, signal.SIGTERM)
+        self.process.join(10)
+        self.assertEqual(self.process.exitcode, 0)
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+class TestPreforkRestarts(unittest.TestCase):
+
+    def test_crashing_worker_stops_server(self):
+        with tempfile.NamedTemporaryFile() as starts:
+            process = multiprocessing.get_context("fork").Process(target=run_crashing_server, args=(free_port(), starts.name))
+            process.start()
+            process.join(20)
+
+            self.assertFalse(process.is_alive())
+            self.assertNotEqual(process.exitcode, 0)
+
+            # Started once and restarted max_restarts times, waiting longer each time
+            times = [float(line) for line in open(starts.name).read().split()]
+            self.assertEqual(len(times), 4)
+            delays = [end - start for start, end in zip(times, times[1:])]
+            self.assertLess(delays[0], delays[2])
+            self.assertGreaterEqual(delays[2], 0.4)
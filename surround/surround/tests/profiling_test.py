@@ -0,0 +1,54 @@
+import os
+import shutil
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+from surround import Assembler, Runner, State, Stage, BaseConfig, SurroundConfig, RunMode
+
+class ProfileState(State):
+    def __init__(self):
+        super().__init__()
+        self.data = None
+
+class AllocateStage(Stage):
+    def operate(self, state, config):
+        state.data = [str(i) for i in range(10000)]
+
+class ProfileRunner(Runner):
+    def load_data(self, mode, config):
+        return ProfileState()
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+        tracemalloc.stop()
+
+    def test_disabled_by_default(self):
+        assembler = Assembler("No profile test").set_stages([AllocateStage()])
+        assembler.init_assembler()
+        self.assertIsNone(assembler.profiler)
+
+    def test_profiles_dumped_by_runner(self):
+        config = BaseConfig(output_path=self.output_path, surround=SurroundConfig(
+            enable_stage_profiling=True, enable_stage_memory_tracking=True, profile_report_top_n=5))
+        assembler = Assembler("Profile test").set_stages([AllocateStage()]).set_config(config)
+        runner = ProfileRunner(assembler)
+
+        runner.run(RunMode.BATCH_PREDICT)
+        assembler.run(ProfileState())
+        runner.dump_profiles()
+
+        stats = pstats.Stats(os.path.join(self.output_path, "profile_AllocateStage.pstats"))
+        calls = [count for (_, _, name), (count, *_) in stats.stats.items() if name == "operate"]
+        self.assertEqual(calls, [2])
+
+        with open(os.path.join(self.output_path, "allocations.txt")) as f:
+            report = f.read()
+        self.assertIn("== AllocateStage ==", report)
+        self.assertIn("profiling_test.py", report)
+        self.assertTrue(os.path.exists(os.path.join(self.output_path, "profile.txt")))
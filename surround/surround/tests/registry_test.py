@@ -0,0 +1,104 @@
+import os
+import mmap
+import time
+import pickle
+import tempfile
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from surround import ModelRegistry, BaseConfig
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.TemporaryDirectory()
+        self.model_path = self.model_dir.name
+
+    def tearDown(self):
+        self.model_dir.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.model_path, name), "wb") as f:
+            f.write(data)
+
+    def test_load_once(self):
+        self.write("model.pkl", pickle.dumps({"weights": [1, 2, 3]}))
+        registry = ModelRegistry(self.model_path).register("classifier", "model.pkl")
+
+        model = registry.get("classifier")
+        self.assertIsInstance(model, mmap.mmap)
+        self.assertEqual(pickle.loads(model), {"weights": [1, 2, 3]})
+        self.assertIs(registry.get("classifier"), model)
+        self.assertEqual(len(registry.info()), 1)
+
+    def test_relative_to_config(self):
+        self.write("model.bin", b"weights")
+        config = BaseConfig(model_path=self.model_path)
+
+        self.assertEqual(bytes(ModelRegistry().get("model.bin", config)), b"weights")
+
+    def test_missing_model(self):
+        with self.assertRaises(FileNotFoundError):
+            ModelRegistry(self.model_path).get("missing.bin")
+
+    def test_reload_on_change(self):
+        self.write("model.bin", b"old")
+        registry = ModelRegistry(self.model_path)
+        old = registry.get("model.bin")
+
+        self.write("model.bin", b"new weights")
+        new_mtime = time.time() + 10
+        os.utime(os.path.join(self.model_path, "model.bin"), (new_mtime, new_mtime))
+
+        new = registry.get("model.bin")
+        self.assertIsNot(new, old)
+        self.assertEqual(bytes(new), b"new weights")
+
+    def test_identical_files_shared(self):
+        self.write("a.bin", b"same weights")
+        self.write("b.bin", b"same weights")
+        registry = ModelRegistry(self.model_path)
+
+        self.assertIs(registry.get("a.bin"), registry.get("b.bin"))
+
+    def test_custom_loader(self):
+        self.write("model.txt", b"hello")
+        registry = ModelRegistry(self.model_path).set_loader(".txt", lambda path: open(path).read())
+        registry.register("upper", "model.txt", loader=lambda path: open(path).read().upper())
+
+        self.assertEqual(registry.get("model.txt"), "hello")
+        self.assertEqual(registry.get("upper"), "HELLO")
+
+    def test_concurrent_get(self):
+        calls = []
+        lock = threading.Lock()
+
+        def loader(path):
+            with lock:
+                calls.append(path)
+            time.sleep(0.05)
+            return object()
+
+        self.write("model.bin", b"weights")
+        registry = ModelRegistry(self.model_path).register("model", "model.bin", loader=loader)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            models = list(executor.map(lambda _: registry.get("model"), range(8)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(model is models[0] for model in models))
+
+    @unittest.skipUnless(numpy, "numpy is not installed")
+    def test_npy_memory_mapped(self):
+        numpy.save(os.path.join(self.model_path, "embeddings.npy"), numpy.arange(10, dtype=numpy.float32))
+        registry = ModelRegistry(self.model_path)
+
+        embeddings = registry.get("embeddings.npy")
+        self.assertIsInstance(embeddings, numpy.memmap)
+        self.assertEqual(float(embeddings.sum()), 45.0)
+        self.assertFalse(embeddings.flags.writeable)
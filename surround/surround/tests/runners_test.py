@@ -0,0 +1,143 @@
+import os
+import unittest
+from surround import Assembler, State, Stage, Estimator, BaseConfig, SurroundConfig, RunMode, ParallelBatchRunner, StreamingRunner
+
+class NumbersState(State):
+    def __init__(self, numbers=None):
+        super().__init__()
+        self.numbers = numbers or []
+        self.outputs = []
+        self.worker_pids = []
+
+class Double(Estimator):
+    def initialise(self, config):
+        self.init_pid = os.getpid()
+
+    def estimate(self, state, config):
+        if 13 in state.numbers:
+            raise Exception("Unlucky chunk")
+        state.outputs = [number * 2 for number in state.numbers]
+        state.worker_pids = [self.init_pid]
+
+class CountMetric(Stage):
+    def operate(self, state, config):
+        state.metrics["count"] = len(state.outputs)
+
+class NumbersRunner(ParallelBatchRunner):
+    def __init__(self, numbers, assembler=None):
+        super().__init__(assembler)
+        self.numbers = numbers
+
+    def load_data(self, mode, config):
+        return NumbersState(self.numbers)
+
+    def split_data(self, state, chunk_size):
+        for i in range(0, len(state.numbers), chunk_size):
+            yield NumbersState(state.numbers[i:i + chunk_size])
+
+    def merge_data(self, states, config):
+        merged = NumbersState()
+        merged.outputs = [output for state in states for output in state.outputs]
+        merged.worker_pids = [pid for state in states for pid in state.worker_pids]
+        return merged
+
+class NumbersStreamRunner(StreamingRunner):
+    def __init__(self, numbers, batch_size=None, assembler=None, sink=None):
+        super().__init__(assembler, sink)
+        self.numbers = numbers
+        self.batch_size = batch_size
+        self.max_in_flight = 0
+
+    def load_data(self, mode, config):
+        for i, number in enumerate(self.numbers):
+            self.max_in_flight = max(self.max_in_flight, i - len(self.sink.outputs))
+            if self.batch_size:
+                if i % self.batch_size == 0:
+                    yield [NumbersState([n]) for n in self.numbers[i:i + self.batch_size]]
+            else:
+                yield NumbersState([number])
+
+class ListSink(Stage):
+    def initialise(self, config):
+        self.outputs = []
+        self.closed = False
+
+    def teardown(self, config):
+        self.closed = True
+
+    def operate(self, state, config):
+        self.outputs.append(state.outputs[0] if state.outputs else None)
+
+class TestParallelBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        config = BaseConfig(surround=SurroundConfig(batch_workers=2, batch_chunk_size=3))
+        self.assembler = Assembler("Parallel batch test").set_stages([Double()]).set_config(config)
+        self.assembler.set_metrics(CountMetric())
+
+    def test_run_in_order(self):
+        NumbersRunner(list(range(10)), self.assembler).run(RunMode.BATCH_PREDICT)
+        state = self.assembler.state
+
+        self.assertEqual(state.outputs, [number * 2 for number in range(10)])
+        self.assertEqual(state.metrics, {"count": [3, 3, 3, 1]})
+        self.assertEqual(len(state.execution_time), 8)
+        self.assertFalse(state.errors)
+
+        # Stages are initialised in the workers, not in this process
+        self.assertNotIn(os.getpid(), state.worker_pids)
+        self.assertLessEqual(len(set(state.worker_pids)), 2)
+
+    def test_chunk_errors(self):
+        NumbersRunner([1, 2, 3, 13, 14, 15, 16], self.assembler).run(RunMode.BATCH_PREDICT)
+        state = self.assembler.state
+
+        self.assertEqual(state.errors, ["Unlucky chunk"])
+        self.assertEqual(state.outputs, [2, 4, 6, 32])
+
+    def test_other_modes_run_in_process(self):
+        NumbersRunner([1, 2], self.assembler).run(RunMode.PREDICT)
+        self.assertEqual(self.assembler.state.outputs, [2, 4])
+
+class TestStreamingRunner(unittest.TestCase):
+
+    def setUp(self):
+        config = BaseConfig(surround=SurroundConfig(stream_window=3, stream_workers=2))
+        self.assembler = Assembler("Streaming test").set_stages([Double()]).set_config(config)
+
+    def test_stream_in_order(self):
+        sink = ListSink()
+        runner = NumbersStreamRunner(list(range(12)), assembler=self.assembler, sink=sink)
+        runner.run(RunMode.BATCH_PREDICT)
+
+        self.assertEqual(sink.outputs, [number * 2 for number in range(12)])
+        self.assertLessEqual(runner.max_in_flight, 3)
+
+    def test_stream_batches(self):
+        sink = ListSink()
+        NumbersStreamRunner(list(range(10)), batch_size=4, assembler=self.assembler, sink=sink).run(RunMode.BATCH_PREDICT)
+        self.assertEqual(sink.outputs, [number * 2 for number in range(10)])
+
+    def test_stream_window_counts_records(self):
+        sink = ListSink()
+        runner = NumbersStreamRunner(list(range(12)), batch_size=2, assembler=self.assembler, sink=sink)
+        runner.run(RunMode.BATCH_PREDICT)
+
+        self.assertEqual(sink.outputs, [number * 2 for number in range(12)])
+        self.assertLessEqual(runner.max_in_flight, 3)
+
+    def test_sink_teardown(self):
+        sink = ListSink()
+        NumbersStreamRunner([1, 2], assembler=self.assembler, sink=sink).run(RunMode.BATCH_PREDICT)
+        self.assertTrue(sink.closed)
+
+        sink = ListSink()
+        runner = NumbersStreamRunner([1, "2"], assembler=self.assembler, sink=sink)
+        runner.load_data = lambda mode, config: iter([NumbersState([1]), "not a state"])
+        self.assertRaises(ValueError, runner.run, RunMode.BATCH_PREDICT)
+        self.assertTrue(sink.closed)
+
+    def test_stream_errors(self):
+        sink = ListSink()
+        NumbersStreamRunner([12, 13, 14], assembler=self.assembler, sink=sink).run(RunMode.BATCH_PREDICT)
+        self.assertEqual(sink.outputs, [24, None, 28])
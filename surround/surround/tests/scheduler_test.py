@@ -0,0 +1,112 @@
+import unittest
+import threading
+from surround import Assembler, State, Stage, BaseConfig, SurroundConfig
+from surround.scheduler import build_stage_graph, validate_stage_fields
+
+class ParallelState(State):
+    def __init__(self):
+        super().__init__()
+        self.left = None
+        self.right = None
+        self.joined = None
+        self.throw = False
+        self.final_ran = False
+
+class ParallelStage(Stage):
+    reads = ()
+
+    def __init__(self, field, barrier):
+        self.writes = (field,)
+        self.field = field
+        self.barrier = barrier
+
+    def operate(self, state, config):
+        # Both stages must be running at the same time to pass the barrier
+        self.barrier.wait()
+        if state.throw:
+            raise Exception("Error!!")
+        setattr(state, self.field, threading.current_thread().name)
+
+class JoinStage(Stage):
+    reads = ("left", "right")
+    writes = ("joined",)
+
+    def operate(self, state, config):
+        state.joined = (state.left, state.right)
+
+class UndeclaredStage(Stage):
+    def operate(self, state, config):
+        pass
+
+class BadFieldsStage(Stage):
+    reads = "left"
+    writes = ("right",)
+
+class WriteOnlyStage(Stage):
+    writes = ("joined",)
+
+    def operate(self, state, config):
+        state.joined = (state.left, state.right)
+
+class ReadOnlyStage(Stage):
+    reads = ("left",)
+
+class FinalStage(Stage):
+    def operate(self, state, config):
+        state.final_ran = True
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.config = BaseConfig(surround=SurroundConfig(parallel_stages=True))
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def test_build_stage_graph(self):
+        stages = [ParallelStage("left", self.barrier), ParallelStage("right", self.barrier), JoinStage()]
+        self.assertEqual(build_stage_graph(stages), [set(), set(), {0, 1}])
+
+    def test_undeclared_stage_is_barrier(self):
+        stages = [ParallelStage("left", self.barrier), UndeclaredStage(), ParallelStage("right", self.barrier)]
+        self.assertEqual(build_stage_graph(stages), [set(), {0}, {1}])
+
+    def test_undeclared_reads_is_barrier(self):
+        # Reads left without declaring it, so can't run alongside the stage writing left
+        stages = [ParallelStage("left", self.barrier), WriteOnlyStage(), ParallelStage("right", self.barrier)]
+        self.assertEqual(build_stage_graph(stages), [set(), {0}, {1}])
+
+    def test_write_after_read(self):
+        stages = [JoinStage(), ParallelStage("left", self.barrier)]
+        self.assertEqual(build_stage_graph(stages), [set(), {0}])
+
+    def test_invalid_fields(self):
+        self.assertRaises(ValueError, validate_stage_fields, BadFieldsStage())
+        self.assertRaises(ValueError, validate_stage_fields, ReadOnlyStage())
+
+        assembler = Assembler("Invalid fields test").set_stages([BadFieldsStage()])
+        self.assertFalse(assembler.init_assembler())
+
+    def test_parallel_stages(self):
+        data = ParallelState()
+        assembler = Assembler("Parallel test").set_config(self.config)
+        assembler.set_stages([ParallelStage("left", self.barrier), ParallelStage("right", self.barrier), JoinStage()])
+        assembler.set_finaliser(FinalStage())
+        self.assertTrue(assembler.init_assembler())
+
+        assembler.run(data)
+
+        self.assertFalse(data.errors)
+        self.assertNotEqual(data.left, data.right)
+        self.assertEqual(data.joined, (data.left, data.right))
+        self.assertTrue(data.final_ran)
+
+    def test_parallel_stages_stop_on_error(self):
+        data = ParallelState()
+        data.throw = True
+        assembler = Assembler("Parallel fail test").set_config(self.config)
+        assembler.set_stages([ParallelStage("left", self.barrier), ParallelStage("right", self.barrier), JoinStage()])
+        assembler.set_finaliser(FinalStage())
+        assembler.run(data)
+
+        self.assertEqual(len(data.errors), 2)
+        self.assertIsNone(data.joined)
+        self.assertTrue(data.final_ran)
@@ -0,0 +1,87 @@
+import json
+import unittest
+from surround.serialisation import (JSON, NDJSON, MSGPACK, ARROW, NDJSONDecoder, get_format,
+                                    get_accept_format, decode_records, encode_records)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+RECORDS = [{"message": "a"}, {"message": "b"}]
+
+class TestSerialisation(unittest.TestCase):
+
+    def test_get_format(self):
+        self.assertEqual(get_format(None), JSON)
+        self.assertEqual(get_format("*/*", default=NDJSON), NDJSON)
+        self.assertEqual(get_format("application/json; charset=utf-8"), JSON)
+        self.assertEqual(get_format("application/x-msgpack"), MSGPACK)
+
+        with self.assertRaises(ValueError):
+            get_format("text/html")
+
+    def test_get_accept_format(self):
+        self.assertEqual(get_accept_format(None, default=NDJSON), NDJSON)
+        self.assertEqual(get_accept_format("application/json, */*;q=0.8"), JSON)
+        self.assertEqual(get_accept_format("text/html, application/xml;q=0.9, */*;q=0.8", default=NDJSON), NDJSON)
+        self.assertEqual(get_accept_format("application/json;q=0.5, application/x-ndjson"), NDJSON)
+        self.assertEqual(get_accept_format("application/x-ndjson;q=0, application/*", default=JSON), JSON)
+
+        with self.assertRaises(ValueError):
+            get_accept_format("text/html, application/xml;q=0.9")
+
+    @unittest.skipIf(pyarrow, "requires pyarrow to be missing")
+    def test_get_accept_format_missing_package(self):
+        self.assertEqual(get_accept_format("%s, application/json;q=0.5" % ARROW), JSON)
+
+        with self.assertRaises(ValueError):
+            get_accept_format(ARROW)
+
+    def test_json(self):
+        self.assertEqual(decode_records(encode_records(RECORDS, JSON), JSON), RECORDS)
+        self.assertEqual(decode_records(b'{"message": "a"}', JSON), RECORDS[:1])
+
+        with self.assertRaises(ValueError):
+            decode_records(b'["a"]', JSON)
+
+    def test_ndjson(self):
+        body = encode_records(RECORDS, NDJSON)
+        self.assertEqual(body, b'{"message": "a"}\n{"message": "b"}\n')
+        self.assertEqual(decode_records(body, NDJSON), RECORDS)
+
+    def test_ndjson_decoder(self):
+        decoder = NDJSONDecoder()
+        body = b'{"message": "a"}\n{"message": "b"}'
+
+        self.assertEqual(decoder.feed(body[:5]), [])
+        self.assertEqual(decoder.feed(body[5:20]), RECORDS[:1])
+        self.assertEqual(decoder.feed(body[20:]), [])
+        self.assertEqual(decoder.close(), RECORDS[1:])
+
+        with self.assertRaises(ValueError):
+            NDJSONDecoder().feed(b'{"message": \n')
+
+    @unittest.skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack(self):
+        body = encode_records(RECORDS, MSGPACK)
+        self.assertEqual(msgpack.unpackb(body), RECORDS)
+        self.assertEqual(decode_records(body, MSGPACK), RECORDS)
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_arrow(self):
+        body = encode_records(RECORDS, ARROW)
+        self.assertEqual(decode_records(body, ARROW), RECORDS)
+
+    @unittest.skipIf(pyarrow, "pyarrow is installed")
+    def test_missing_dependency(self):
+        with self.assertRaises(ValueError):
+            encode_records(RECORDS, ARROW)
+
+    def test_encode_json(self):
+        self.assertEqual(json.loads(encode_records(RECORDS, None)), RECORDS)
@@ -0,0 +1,69 @@
+# pylint: disable=unsupported-assignment-operation
+import pickle
+import unittest
+from dataclasses import field
+from typing import ClassVar
+from surround import Assembler, Stage, State, SlottedState
+
+class RecordState(SlottedState):
+    input_data: str = None
+    outputs: list = []
+    scores: dict = field(default_factory=lambda: {"count": 0})
+    threshold: float = field(default=0.5)
+    label: ClassVar[str] = "record"
+
+class ExtendedState(RecordState):
+    extra: int = 1
+
+class Record(Stage):
+    def operate(self, state, config):
+        state.outputs.append(state.input_data.upper())
+        state.scores["count"] += 1
+
+class TestSlottedState(unittest.TestCase):
+
+    def test_slots(self):
+        state = RecordState(input_data="a")
+        self.assertIsInstance(state, State)
+        self.assertFalse(hasattr(state, "__dict__"))
+        self.assertEqual(state.input_data, "a")
+        self.assertEqual(state.threshold, 0.5)
+        self.assertEqual(RecordState.label, "record")
+        self.assertRaises(AttributeError, setattr, state, "unknown", 1)
+
+    def test_fresh_defaults(self):
+        first = RecordState()
+        second = RecordState()
+        first.outputs.append(1)
+        first.errors.append("Error!!")
+        first.scores["count"] += 1
+
+        self.assertEqual(second.outputs, [])
+        self.assertEqual(second.errors, [])
+        self.assertEqual(second.scores, {"count": 0})
+
+    def test_inheritance(self):
+        state = ExtendedState(extra=2)
+        self.assertEqual(ExtendedState.__slots__, ("extra",))
+        self.assertEqual(state.outputs, [])
+        self.assertEqual(state.extra, 2)
+
+    def test_run_and_reset(self):
+        assembler = Assembler("Slotted test").set_stages([Record()])
+        state = RecordState(input_data="a")
+        assembler.run(state)
+
+        self.assertEqual(state.outputs, ["A"])
+        self.assertEqual(state.scores["count"], 1)
+        self.assertEqual(len(state.execution_time), 1)
+
+        state.reset()
+        self.assertIsNone(state.input_data)
+        self.assertEqual(state.outputs, [])
+        self.assertEqual(state.execution_time, [])
+
+    def test_pickle(self):
+        state = RecordState(input_data="a")
+        copy = pickle.loads(pickle.dumps(state))
+        self.assertEqual(copy.input_data, "a")
+        self.assertEqual(copy.scores, {"count": 0})
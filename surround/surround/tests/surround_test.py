@@ -73,6 +73,14 @@ class PostFilter(Stage):
     def operate(self, state, config):
         state.post_filter_ran = True
 
+class BatchStage(Stage):
+    def operate_batch(self, states, config):
+        if any(state.use_errors_instead for state in states):
+            raise Exception("This will fail the whole batch")
+
+        for state in states:
+            state.text = str(len(states))
+
 class TestFinalStage(Stage):
     def operate(self, state, config):
         state.final_ran = True
@@ -204,3 +212,47 @@ class TestSurround(unittest.TestCase):
 
         self.assertIsNone(data.text)
         self.assertFalse(data.post_filter_ran)
+
+    def test_run_batch(self):
+        states = [AssemblerState() for _ in range(3)]
+        assembler = Assembler("Batch test").set_stages([InputValidator(), HelloStage(), PostFilter()])
+        assembler.set_finaliser(TestFinalStage())
+        assembler.run_batch(states)
+
+        for state in states:
+            self.assertEqual(state.text, test_text)
+            self.assertTrue(state.post_filter_ran)
+            self.assertTrue(state.final_ran)
+            self.assertEqual(len(state.execution_time), 4)
+
+    def test_run_batch_isolates_errors(self):
+        states = [AssemblerState() for _ in range(3)]
+        states[1].estimator_throw = True
+
+        assembler = Assembler("Batch fail test").set_stages([InputValidator(), HelloStage(), PostFilter()])
+        assembler.set_finaliser(TestFinalStage())
+        assembler.run_batch(states)
+
+        self.assertTrue(states[0].post_filter_ran)
+        self.assertFalse(states[1].post_filter_ran)
+        self.assertTrue(states[2].post_filter_ran)
+        self.assertEqual(len(states[1].errors), 1)
+        self.assertTrue(all(state.final_ran for state in states))
+
+    def test_run_batch_hook(self):
+        states = [AssemblerState() for _ in range(3)]
+        assembler = Assembler("Batch hook test").set_stages([BatchStage(), PostFilter()])
+        assembler.run_batch(states)
+
+        self.assertEqual([state.text for state in states], ["3"] * 3)
+        self.assertTrue(all(state.post_filter_ran for state in states))
+
+    def test_run_batch_hook_failure(self):
+        states = [AssemblerState() for _ in range(2)]
+        states[0].use_errors_instead = True
+
+        assembler = Assembler("Batch hook fail test").set_stages([BatchStage(), PostFilter()])
+        assembler.run_batch(states)
+
+        self.assertTrue(all(state.errors for state in states))
+        self.assertFalse(any(state.post_filter_ran for state in states))
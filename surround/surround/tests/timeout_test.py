@@ -0,0 +1,80 @@
+import time
+import asyncio
+import unittest
+from surround import Assembler, Stage, State, BaseConfig, SurroundConfig
+from surround.assembler import TIMEOUT_MESSAGE
+
+class TimeoutState(State):
+    def __init__(self):
+        super().__init__()
+        self.ran = []
+
+class Slow(Stage):
+    reads = ()
+
+    def __init__(self, name, delay=0.1):
+        self.name = name
+        self.delay = delay
+        self.writes = (name,)
+
+    def operate(self, state, config):
+        time.sleep(self.delay)
+        state.ran.append(self.name)
+
+class Finaliser(Stage):
+    def operate(self, state, config):
+        state.ran.append("finaliser")
+
+class TestPipelineTimeout(unittest.TestCase):
+
+    def setUp(self):
+        self.assembler = Assembler("Timeout test").set_stages([Slow("a"), Slow("b"), Slow("c")])
+        self.assembler.set_finaliser(Finaliser())
+
+    def test_run_timeout(self):
+        data = TimeoutState()
+        self.assembler.run(data, timeout=0.15)
+
+        self.assertEqual(data.ran, ["a", "b", "finaliser"])
+        self.assertEqual(data.errors, ["%s before running Slow" % TIMEOUT_MESSAGE])
+
+    def test_no_timeout(self):
+        data = TimeoutState()
+        self.assembler.run(data, timeout=5)
+
+        self.assertEqual(data.ran, ["a", "b", "c", "finaliser"])
+        self.assertEqual(data.errors, [])
+
+    def test_arun_timeout(self):
+        data = TimeoutState()
+        asyncio.run(self.assembler.arun(data, timeout=0.05))
+
+        self.assertEqual(data.ran, ["a", "finaliser"])
+        self.assertTrue(data.errors[0].startswith(TIMEOUT_MESSAGE))
+
+    def test_run_batch_timeout(self):
+        states = [TimeoutState(), TimeoutState()]
+        self.assembler.run_batch(states, timeout=0.3)
+
+        for data in states:
+            self.assertEqual(data.ran, ["a", "b", "finaliser"])
+            self.assertTrue(data.errors[0].startswith(TIMEOUT_MESSAGE))
+
+    def test_parallel_timeout(self):
+        config = BaseConfig(surround=SurroundConfig(parallel_stages=True))
+        assembler = Assembler("Timeout test", config).set_stages([Slow("a"), Slow("b"), Slow("c", 0)])
+        # c depends on a and b through the fields it reads
+        assembler.stages[2].reads = ("a", "b")
+
+        data = TimeoutState()
+        assembler.run(data, timeout=0.01)
+
+        self.assertEqual(sorted(data.ran), ["a", "b"])
+        self.assertTrue(data.errors[0].startswith(TIMEOUT_MESSAGE))
+
+    def test_surface_timeout(self):
+        config = BaseConfig(surround=SurroundConfig(surface_exceptions=True))
+        self.assembler.set_config(config)
+
+        with self.assertRaises(TimeoutError):
+            self.assembler.run(TimeoutState(), timeout=0.01)
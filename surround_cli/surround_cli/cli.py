@@ -5,9 +5,8 @@ import sys
 import inspect
 import logging
 import subprocess
-import pkg_resources
+from importlib.metadata import version
 
-from surround.project import PROJECTS
 from .remote import cli as remote_cli
 from .split import cli as split_cli
 from .visualise import cli as visualise_cli
@@ -46,7 +45,7 @@ def process_files(files, project_dir, project_name, project_description, require
 
     for afile, content in files:
         actual_file = afile.format(project_name=project_name, project_description=project_description)
-        actual_content = content.format(project_name=project_name, project_description=project_description, version=pkg_resources.get_distribution("surround").version)
+        actual_content = content.format(project_name=project_name, project_description=project_description, version=version("surround"))
         file_path = os.path.join(project_dir, actual_file)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
@@ -89,7 +88,7 @@ def process_templates(templates, folder, project_dir, project_name, project_desc
             name = project_name.capitalize() if capitalize else project_name
             actual_contents = contents.format(project_name=name, project_description=project_description,
                                               author_name=author_name, author_email=author_email,
-                                              version=pkg_resources.get_distribution("surround").version)
+                                              version=version("surround"))
             if require_web and afile == "pyproject.toml":
                 actual_contents = actual_contents.replace(
                     "\n[build-system]",
@@ -331,6 +330,9 @@ def parse_init_args(parser, args, extra_args):
     :param args: <class 'argparse.Namespace'>
     """
 
+    # Importing surround loads the whole framework, so it is only done when creating a project
+    from surround.project import PROJECTS # pylint: disable=import-outside-toplevel
+
     if allowed_to_access_dir(args.path):
         if args.project_name:
             project_name = args.project_name
@@ -386,7 +388,7 @@ def print_version():
     Prints the current Surround package version to the console.
     """
 
-    print("Surround v" + pkg_resources.get_distribution("surround").version)
+    print("Surround v" + version("surround"))
 
 def execute_cli():
     """
@@ -1,2 +1,3 @@
 from .container import DataContainer
+from .dataset import ContainerDataset, Sample
 from .metadata import Metadata
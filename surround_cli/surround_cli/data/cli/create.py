@@ -130,6 +130,7 @@ def get_data_create_parser():
 
     parser.add_argument('-o', '--output', type=lambda x: is_valid_output_file(parser, x), help="Path to file to export container to (default: specified-path.data.zip)")
     parser.add_argument('-e', '--export-metadata', type=lambda x: is_valid_json_output(parser, x), help="Path to JSON file to export metadata to")
+    parser.add_argument('-s', '--store-larger-than', type=float, metavar='MB', help="Store files larger than this many megabytes without compression, so they can be memory-mapped when read")
 
     return parser
 
@@ -611,7 +612,8 @@ def create_container(metadata, groups, args):
     print("Importing the data...")
 
     # Create the container
-    container.export(output_file)
+    store_larger_than = int(args.store_larger_than * 1024 * 1024) if args.store_larger_than is not None else None
+    container.export(output_file, store_larger_than=store_larger_than)
 
     print("Success! Data container exported to path %s" % output_file)
 
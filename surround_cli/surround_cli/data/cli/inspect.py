@@ -114,11 +114,12 @@ def execute_data_inspect_tool(parser, args):
         print("error: failed to open the container: %s" % args.container_file)
         return
 
-    if not args.content_only:
-        perform_metadata_inspection(container)
+    with container:
+        if not args.content_only:
+            perform_metadata_inspection(container)
 
-    if not args.metadata_only:
-        perform_content_inspection(container)
+        if not args.metadata_only:
+            perform_content_inspection(container)
 
 def main():
     """
@@ -67,6 +67,7 @@ def get_data_lint_parser():
     parser.add_argument("container_path", help="Path to the container to perform checks on", type=lambda x: is_valid_file(parser, x))
     parser.add_argument("-l", "--list", action='store_true', help="List the checks the linter will perform")
     parser.add_argument("-c", "--check-id", help="Specify a single check to perform (get id from --list)", type=lambda x: is_valid_check_id(parser, x))
+    parser.add_argument("-f", "--full", action='store_true', help="Hash every file when checking the integrity, by default only files whose CRC-32 or size changed are hashed")
 
     return parser
 
@@ -76,7 +77,7 @@ def execute_data_lint_tool(parser, args):
     Which uses the data linter to check the validity of a data container file provided.
     """
 
-    linter = DataLinter()
+    linter = DataLinter(full=args.full)
 
     if args.list:
         linter.list_stages()
@@ -1,13 +1,37 @@
 import os
+import mmap
+import time
+import zlib
+import struct
 import zipfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .metadata import Metadata
-from .util import hash_zip
+from .util import DEFAULT_HASH_ALGORITHM, HASH_BUFFER_SIZE, HASH_TABLE_FILE
+from .util import get_hasher, is_compressed_format, merkle_root, pack_hash_table
+
+# Files larger than this (in bytes) are streamed into a container instead of being read into memory
+STREAM_THRESHOLD = 32 * 1024 * 1024
+
+# Files read into memory to be compressed but not yet written to the container are limited to this many bytes
+MAX_BUFFERED_BYTES = 64 * 1024 * 1024
+
+# Size of the chunks streamed files are read in
+CHUNK_SIZE = HASH_BUFFER_SIZE
+
+# Stored (uncompressed) members start at a multiple of this many bytes so they can be mapped as arrays
+ALIGNMENT = 64
+
+# Header ID of the extra field padding stored members to the alignment (the same one zipalign uses)
+ALIGNMENT_EXTRA_ID = 0xD935
 
 class MetadataNotFoundError(Exception):
     """
     Thrown when no metadata was found in the data container loaded
     """
 
+# pylint: disable=too-many-instance-attributes
 class DataContainer:
     """
     Represents a data container which holds both data and metadata.
@@ -17,6 +41,16 @@ class DataContainer:
     - Import files into a container and export
     - Load existing containers
     - Extract files
+
+    A loaded container keeps the archive open for reading until :meth:`DataContainer.close`
+    is called, which may be done with a ``with`` statement::
+
+        with DataContainer("dataset.data.zip") as container:
+            images = container.read_many(["images/1.png", "images/2.png"])
+
+    Reading members from several threads at once is supported. Members stored without compression
+    can be read without copying them with :meth:`DataContainer.member_view` and
+    :meth:`DataContainer.member_array`.
     """
 
     def __init__(self, path=None, metadata_version='v0.1'):
@@ -31,6 +65,10 @@ class DataContainer:
         self.metadata = Metadata(metadata_version)
         self.__imported_files = []
         self.__loaded_files = []
+        self.__index = {}
+        self.__reader = None
+        self.__mapping = None
+        self.__reader_lock = threading.Lock()
 
         if path:
             self.load(path)
@@ -43,53 +81,184 @@ class DataContainer:
         :type path: str
         """
 
+        self.close()
         self.path = path
 
-        # Open the zip file and get all the contents
-        with zipfile.ZipFile(path, 'r', compression=zipfile.ZIP_DEFLATED) as container:
-            self.__loaded_files = container.namelist()
+        # Open the zip file and index its contents, the central directory is only parsed once
+        self.__index_members(self.__get_reader())
 
         # If we have metadata, get the information, otherwise throw an exception
         if self.file_exists('manifest.yaml'):
             self.metadata.load_from_data(self.extract_file_bytes('manifest.yaml'))
         else:
-            self.__loaded_files = []
+            self.close()
+            self.__index_members(None)
             raise MetadataNotFoundError
 
-    def export(self, export_to):
+    def close(self):
+        """
+        Close the archive opened for reading the loaded container, it is opened again when needed.
+        """
+
+        with self.__reader_lock:
+            if self.__reader:
+                self.__reader.close()
+                self.__reader = None
+
+            if self.__mapping:
+                try:
+                    self.__mapping.close()
+                except BufferError:
+                    # Views returned by member_view are still in use, it's unmapped once they're released
+                    pass
+                self.__mapping = None
+
+    def __getstate__(self):
+        # Open archives and locks can't be pickled (e.g. when sent to worker processes)
+        state = self.__dict__.copy()
+        state["_DataContainer__reader"] = None
+        state["_DataContainer__mapping"] = None
+        state["_DataContainer__reader_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__reader_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __get_reader(self):
+        # Opened lazily and kept open, ZipFile serialises reads of the underlying file so members
+        # can be read from several threads
+        reader = self.__reader
+        if reader is None:
+            with self.__reader_lock:
+                if self.__reader is None:
+                    self.__reader = zipfile.ZipFile(self.path, 'r')
+                reader = self.__reader
+        return reader
+
+    def __get_mapping(self):
+        mapping = self.__mapping
+        if mapping is None:
+            with self.__reader_lock:
+                if self.__mapping is None:
+                    with open(self.path, 'rb') as f:
+                        self.__mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mapping = self.__mapping
+        return mapping
+
+    def __get_stored_member(self, path):
+        # Returns the member info and offset of its data in the archive
+        info = self.__index.get(path)
+        if info is None:
+            return None, None
+
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            raise ValueError("%s is compressed or encrypted, only members stored without compression can be mapped" % path)
+
+        # The local header's extra field can differ from the one in the central directory
+        mapping = self.__get_mapping()
+        name_length, extra_length = struct.unpack_from('<HH', mapping, info.header_offset + 26)
+        return info, info.header_offset + 30 + name_length + extra_length
+
+    def __index_members(self, reader):
+        infos = reader.infolist() if reader else []
+        self.__loaded_files = [info.filename for info in infos]
+        self.__index = {info.filename: info for info in infos}
+
+    # pylint: disable=too-many-locals
+    def export(self, export_to, compression_level=None, workers=None, store_compressed_formats=True,
+               store_larger_than=None, hash_algorithm=DEFAULT_HASH_ALGORITHM):
         """
         Import all staged files into the container, hash the contents, set the hash to the
         metadata and import the metadata file.
 
+        The files are read, hashed and compressed on a pool of threads while the container is
+        written in a single pass, with at most ``MAX_BUFFERED_BYTES`` of files (or a single file)
+        waiting to be written. Files larger than ``STREAM_THRESHOLD`` are streamed into the
+        container instead of being read into memory. The hash, CRC-32 and size of each file are
+        stored in the ``HASH_TABLE_FILE`` member and the identifier is the :func:`merkle_root` of
+        the hashes, so the linter only has to hash the files that changed.
+
         :param export_to: path to export the file to
         :type export_to: str
+        :param compression_level: zlib compression level from 0 to 9 (default: zlib's default)
+        :type compression_level: int
+        :param workers: number of threads compressing files (default: number of CPUs, up to 8)
+        :type workers: int
+        :param store_compressed_formats: whether files in already compressed formats (e.g. JPEG or MP4) are stored without compression
+        :type store_compressed_formats: bool
+        :param store_larger_than: files larger than this many bytes are stored without compression, so they can be mapped with :meth:`DataContainer.member_view` (default: None)
+        :type store_larger_than: int
+        :param hash_algorithm: name of the algorithm hashing the files (default: blake2b)
+        :type hash_algorithm: str
         """
 
+        self.close()
         self.path = export_to
-        self.__loaded_files.clear()
+        self.__index_members(None)
+
+        workers = workers or min(os.cpu_count() or 1, 8)
+        digests = {}
+        pending = deque()
+        buffered = 0
+
+        def write_next():
+            nonlocal buffered
+            info, size, future = pending.popleft()
+            compressed, digests[info.filename] = future.result()
+            _write_compressed(container, info, compressed)
+            buffered -= size
 
         # Import all the files waiting
-        with zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED) as container:
+        with ThreadPoolExecutor(max_workers=workers) as executor, \
+             zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED) as container:
             for path, internal_path, data in self.__imported_files:
-                if path:
-                    container.write(path, internal_path, compress_type=zipfile.ZIP_DEFLATED)
-                elif data:
-                    container.writestr(internal_path, data, compress_type=zipfile.ZIP_DEFLATED)
+                if not path and not data:
+                    continue
 
-                self.__loaded_files.append(internal_path)
+                info = _get_member_info(path, internal_path, data, store_compressed_formats,
+                                        store_larger_than)
 
-        self.__imported_files.clear()
+                if path and info.file_size > STREAM_THRESHOLD:
+                    # Written in order, so the files being compressed are written first
+                    while pending:
+                        write_next()
+                    digests[info.filename] = _write_streamed(container, info, path, compression_level, hash_algorithm)
+                    continue
+
+                # Bound the memory held by files waiting to be written rather than their number
+                while pending and buffered + info.file_size > MAX_BUFFERED_BYTES:
+                    write_next()
 
-        # Hash the zip file without the metadata
-        container_hash = hash_zip(self.path)
+                size = info.file_size
+                buffered += size
+                pending.append((info, size, executor.submit(_compress, info, path, data, compression_level, hash_algorithm)))
 
-        with zipfile.ZipFile(self.path, 'a') as container:
-            # Set the identifier field to the calculated hash
-            self.metadata.set_property("summary.identifier", container_hash)
+            while pending:
+                write_next()
+
+            # Set the identifier field to the Merkle root of the file hashes (equal to hash_zip with
+            # the algorithm, skipping manifest.yaml and HASH_TABLE_FILE)
+            self.metadata.set_property("summary.identifier", merkle_root(digests, hash_algorithm))
+
+            # Write the hash table the linter reads next to (not in) the metadata, keeping it small
+            container.writestr(HASH_TABLE_FILE, pack_hash_table(hash_algorithm, [
+                (info.filename, info.CRC, info.file_size, digests[info.filename])
+                for info in container.infolist() if info.filename in digests
+            ]))
 
             # Write the metadata yaml file to the container
-            metadata = self.metadata.save_to_data()
-            container.writestr('manifest.yaml', metadata)
+            container.writestr('manifest.yaml', self.metadata.save_to_data())
+
+            self.__index_members(container)
+
+        self.__imported_files.clear()
 
     def import_files(self, files, generate_metadata=True):
         """
@@ -172,13 +341,79 @@ class DataContainer:
         :rtype: bytes
         """
 
-        if self.file_exists(path):
-            with zipfile.ZipFile(self.path, "r") as container:
-                with container.open(path) as myfile:
-                    return myfile.read()
+        info = self.__index.get(path)
+        if info is not None:
+            return self.__get_reader().read(info)
 
         return None
 
+    def read_many(self, paths):
+        """
+        Extract the bytes of many files in the current data container, reading them in the
+        order they are stored in the archive.
+
+        :param paths: paths inside the container
+        :type paths: list
+        :returns: the bytes of each file (or None for files that don't exist) in the order of ``paths``
+        :rtype: list
+        """
+
+        results = [None] * len(paths)
+        members = [(self.__index[path], i) for i, path in enumerate(paths) if path in self.__index]
+
+        if members:
+            reader = self.__get_reader()
+            for info, i in sorted(members, key=lambda member: member[0].header_offset):
+                results[i] = reader.read(info)
+
+        return results
+
+    def member_view(self, path):
+        """
+        Returns a read-only view of the bytes of a file stored without compression (see
+        ``store_larger_than`` in :meth:`DataContainer.export`), mapped from the archive without
+        copying. Raises a ValueError if the file is compressed.
+
+        :param path: path inside the container
+        :type path: str
+        :returns: the view of the file or None if it doesn't exist
+        :rtype: memoryview
+        """
+
+        info, offset = self.__get_stored_member(path)
+        if info is None:
+            return None
+
+        return memoryview(self.__get_mapping())[offset:offset + info.file_size]
+
+    def member_array(self, path, dtype='uint8', shape=None, order='C'):
+        """
+        Returns a read-only :class:`numpy.memmap` of a file stored without compression, mapped from
+        the archive without copying. Raises a ValueError if the file is compressed.
+
+        :param path: path inside the container
+        :type path: str
+        :param dtype: data type of the array (default: uint8)
+        :type dtype: :class:`numpy.dtype`
+        :param shape: shape of the array (default: one dimension covering the whole file)
+        :type shape: tuple
+        :param order: memory layout of the array, either C or F (default: C)
+        :type order: str
+        :returns: the array or None if the file doesn't exist
+        :rtype: :class:`numpy.memmap`
+        """
+
+        import numpy as np # pylint: disable=import-outside-toplevel
+
+        info, offset = self.__get_stored_member(path)
+        if info is None:
+            return None
+
+        if shape is None:
+            shape = (info.file_size // np.dtype(dtype).itemsize,)
+
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape, order=order)
+
     def extract_file(self, internal_path, extract_path="."):
         """
         Extract a file in the current data container to a path on disk
@@ -190,10 +425,10 @@ class DataContainer:
         :rtype: bool
         """
 
-        if self.file_exists(internal_path):
-            with zipfile.ZipFile(self.path, "r") as container:
-                container.extract(internal_path, path=extract_path)
-                return True
+        info = self.__index.get(internal_path)
+        if info is not None:
+            self.__get_reader().extract(info, path=extract_path)
+            return True
 
         return False
 
@@ -226,12 +461,13 @@ class DataContainer:
         """
 
         if self.path:
-            with zipfile.ZipFile(self.path, 'r') as container:
-                container.extractall(extract_to)
-                return True
-        else:
-            print("Unable to extract when no container loaded!")
-            return False
+            # The hash table is only read by the linter
+            members = [name for name in self.__loaded_files if name != HASH_TABLE_FILE]
+            self.__get_reader().extractall(extract_to, members)
+            return True
+
+        print("Unable to extract when no container loaded!")
+        return False
 
     def file_exists(self, path):
         """
@@ -241,7 +477,7 @@ class DataContainer:
         :rtype: bool
         """
 
-        return path in self.__loaded_files
+        return path in self.__index
 
     def get_files(self):
         """
@@ -252,3 +488,107 @@ class DataContainer:
         """
 
         return self.__loaded_files
+
+def _get_member_info(path, internal_path, data, store_compressed_formats, store_larger_than):
+    if path:
+        info = zipfile.ZipInfo.from_file(path, internal_path)
+    else:
+        info = zipfile.ZipInfo(internal_path, date_time=time.localtime(time.time())[:6])
+        info.external_attr = 0o600 << 16
+        info.file_size = len(data)
+
+    # Compressing already compressed formats (e.g. JPEG or MP4) takes time without saving space
+    if store_compressed_formats and is_compressed_format(internal_path):
+        info.compress_type = zipfile.ZIP_STORED
+    elif store_larger_than is not None and info.file_size > store_larger_than:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+
+    return info
+
+def _compress(info, path, data, compression_level, hash_algorithm):
+    """
+    Read, hash and compress a file on a worker thread (hashlib and zlib release the GIL).
+    """
+
+    if path:
+        with open(path, 'rb') as f:
+            data = f.read()
+    elif isinstance(data, str):
+        data = data.encode('utf-8')
+
+    info.file_size = len(data)
+    info.CRC = zlib.crc32(data)
+
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        level = zlib.Z_DEFAULT_COMPRESSION if compression_level is None else compression_level
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+    else:
+        compressed = data
+
+    info.compress_size = len(compressed)
+
+    hasher = get_hasher(hash_algorithm)
+    hasher.update(data)
+    return compressed, hasher.hexdigest()
+
+# _align, _write_compressed and _write_streamed use ZipFile internals that aren't part of its public
+# API: ZipFile.fp, start_dir, filelist, NameToInfo, _writecheck and _didModify, and ZipInfo.FileHeader,
+# header_offset and _compresslevel. They need CPython 3.7 or later (for _compresslevel) and are
+# tested up to 3.11 (CI runs 3.9), check them against zipfile.py and run the tests round-tripping
+# exports through ZipFile.testzip before supporting a later version.
+def _align(info, zip64):
+    """
+    Pad the extra field of a stored member's header so its data starts at a multiple of ``ALIGNMENT``.
+    """
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        return
+
+    # Fixed size header, file name, padding field header and the ZIP64 field FileHeader adds
+    offset = info.header_offset + 30 + len(info.filename.encode('utf-8')) + 4 + (20 if zip64 else 0)
+    padding = -offset % ALIGNMENT
+    info.extra = struct.pack('<HH', ALIGNMENT_EXTRA_ID, padding) + b'\0' * padding
+
+def _write_compressed(container, info, compressed):
+    """
+    Write a member compressed by :func:`_compress` to the container, ZipFile can only write
+    members that it compresses itself so this does the same as ``ZipFile.writestr`` would.
+    """
+
+    # pylint: disable=protected-access
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    container.fp.seek(container.start_dir)
+    info.header_offset = container.fp.tell()
+    _align(info, zip64)
+    container._writecheck(info)
+    container._didModify = True
+
+    container.fp.write(info.FileHeader(zip64))
+    container.fp.write(compressed)
+    container.start_dir = container.fp.tell()
+
+    container.filelist.append(info)
+    container.NameToInfo[info.filename] = info
+
+def _write_streamed(container, info, path, compression_level, hash_algorithm):
+    # pylint: disable=protected-access
+    info._compresslevel = compression_level
+
+    # ZipFile writes the header at the end of the archive (using ZIP64 if the file may be too large)
+    info.header_offset = container.start_dir
+    _align(info, info.file_size * 1.05 > zipfile.ZIP64_LIMIT)
+
+    hasher = get_hasher(hash_algorithm)
+    with open(path, 'rb') as source, container.open(info, 'w') as destination:
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+            destination.write(data)
+
+    return hasher.hexdigest()
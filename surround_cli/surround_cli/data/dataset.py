@@ -0,0 +1,204 @@
+import re
+import random
+import mimetypes
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .container import DataContainer
+from .util import HASH_TABLE_FILE
+
+# A member of a container read by a ContainerDataset
+Sample = namedtuple('Sample', ['path', 'group', 'mime_type', 'data'])
+
+# pylint: disable=too-many-instance-attributes
+class ContainerDataset:
+    """
+    Iterates over the files in a data container without extracting them to disk, e.g. to feed
+    them to ``Estimator.fit``.
+
+    Responsibilities:
+
+    - Select the files in the container by group (the paths of ``Metadata['manifests']``)
+    - Shuffle the files with a seed (reshuffled each epoch, see :meth:`ContainerDataset.set_epoch`)
+    - Shard the files across worker processes
+    - Read files ahead on a pool of threads while they are being consumed
+    - Decode files with the hooks registered for their MIME type
+
+    Each item is a :class:`Sample` of the file's path, group, MIME type and decoded data::
+
+        dataset = ContainerDataset("images.data.zip", groups=["train"], shuffle=True, seed=42,
+                                   decoders={"image/.*": decode_image})
+
+        for sample in dataset:
+            train(sample.data)
+
+    Datasets (and their containers) can be pickled, so they can be sent to worker processes,
+    each using a different ``shard_index``. Like ``torch.utils.data.Dataset`` it supports ``len``
+    and indexing.
+    """
+
+    def __init__(self, container, groups=None, shuffle=False, seed=None, num_shards=1, shard_index=0,
+                 prefetch=16, workers=4, decoders=None):
+        """
+        :param container: the container or the path to one
+        :type container: :class:`surround_cli.data.container.DataContainer` or str
+        :param groups: paths of the groups to read, None reads every group or every file when the container has no groups (default: None)
+        :type groups: list
+        :param shuffle: whether the files are read in a random order (default: False)
+        :type shuffle: bool
+        :param seed: seed of the random order, every shard must use the same seed (default: None)
+        :type seed: int
+        :param num_shards: number of shards the files are split into (default: 1)
+        :type num_shards: int
+        :param shard_index: the shard of the files read by this dataset (default: 0)
+        :type shard_index: int
+        :param prefetch: maximum number of files read ahead while iterating, 0 to read them as needed (default: 16)
+        :type prefetch: int
+        :param workers: number of threads reading and decoding files ahead (default: 4)
+        :type workers: int
+        :param decoders: functions called with the bytes and path of a file returning the decoded data, by regular expression of the MIME types they decode (default: None)
+        :type decoders: dict
+        """
+
+        if not 0 <= shard_index < num_shards:
+            raise ValueError("shard_index must be between 0 and num_shards - 1")
+
+        self.container = DataContainer(container) if isinstance(container, str) else container
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.prefetch = prefetch
+        self.workers = workers
+        self.decoders = []
+        self.epoch = 0
+
+        for pattern, decoder in (decoders or {}).items():
+            self.add_decoder(pattern, decoder)
+
+        self.members = self.__get_members(groups)
+        self.__order = None
+
+    def __get_members(self, groups):
+        # Returns the (path, group) of every file in the groups, in the order they are stored
+        manifests = self.container.metadata.get('manifests') or []
+        paths = [manifest['path'].strip('/') for manifest in manifests]
+
+        if groups is not None:
+            groups = [group.strip('/') for group in groups]
+            unknown = [group for group in groups if group not in paths]
+            if unknown:
+                raise ValueError("Groups not found in the container: %s" % ", ".join(unknown))
+            paths = groups
+
+        members = []
+        for name in self.container.get_files():
+            if name in ('manifest.yaml', HASH_TABLE_FILE) or name.endswith('/'):
+                continue
+
+            group = next((path for path in paths if name.startswith(path + '/')), None)
+            if group is not None or (groups is None and not manifests):
+                members.append((name, group))
+
+        return members
+
+    def add_decoder(self, pattern, decoder):
+        """
+        Register a function decoding files with MIME types matching the pattern, the first pattern
+        registered matching a file is used. Files without a decoder are returned as bytes.
+
+        :param pattern: regular expression matching the full MIME type (e.g. ``image/.*``)
+        :type pattern: str
+        :param decoder: function called with the bytes and path of the file
+        :type decoder: callable
+        """
+
+        self.decoders.append((re.compile(pattern), decoder))
+
+    def set_epoch(self, epoch):
+        """
+        Set the epoch, shuffled datasets are shuffled with a different order every epoch
+        (the same in every shard).
+
+        :param epoch: the epoch number
+        :type epoch: int
+        """
+
+        self.epoch = epoch
+        self.__order = None
+
+    def get_order(self):
+        """
+        Returns the indexes of the files in the container read by this dataset, in the order they are read.
+
+        :returns: indexes into :attr:`ContainerDataset.members`
+        :rtype: list
+        """
+
+        if self.__order is None:
+            order = list(range(len(self.members)))
+
+            if self.shuffle:
+                # Shards shuffle with the same seed so they read different files
+                seed = None if self.seed is None else "%s:%s" % (self.seed, self.epoch)
+                random.Random(seed).shuffle(order)
+
+            self.__order = order[self.shard_index::self.num_shards]
+
+        return self.__order
+
+    def decode(self, path, data):
+        """
+        Decode the bytes of a file with the decoder registered for its MIME type.
+
+        :param path: path of the file in the container
+        :type path: str
+        :param data: the bytes of the file
+        :type data: bytes
+        :returns: the MIME type and the decoded data
+        :rtype: tuple
+        """
+
+        mime_type = mimetypes.guess_type(path)[0]
+
+        if mime_type:
+            for pattern, decoder in self.decoders:
+                if pattern.fullmatch(mime_type):
+                    return mime_type, decoder(data, path)
+
+        return mime_type, data
+
+    def __read(self, index):
+        path, group = self.members[index]
+        mime_type, data = self.decode(path, self.container.extract_file_bytes(path))
+        return Sample(path, group, mime_type, data)
+
+    def __len__(self):
+        return len(self.get_order())
+
+    def __getitem__(self, index):
+        return self.__read(self.get_order()[index])
+
+    def __iter__(self):
+        order = self.get_order()
+
+        if not self.prefetch:
+            for index in order:
+                yield self.__read(index)
+            return
+
+        # Keep up to prefetch files being read (and decoded) by the threads, yielded in order
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            try:
+                for index in order:
+                    pending.append(executor.submit(self.__read, index))
+                    if len(pending) > self.prefetch:
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Stopped early, don't read the rest
+                for future in pending:
+                    future.cancel()
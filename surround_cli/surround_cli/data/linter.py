@@ -1,6 +1,8 @@
+import struct
+import zipfile
 from abc import ABC, abstractmethod
 from .container import DataContainer
-from .util import hash_zip, get_formats_from_files
+from .util import HASH_TABLE_FILE, hash_zip, hash_members, merkle_root, unpack_hash_table, get_formats_from_files
 
 class DataLinterStage(ABC):
     """
@@ -69,14 +71,73 @@ class CheckDataIntegrity(DataLinterStage):
     """
     Represents the data integrity stage of the Data Linter.
     Checks whether the hash stored in the metadata matches the actual hash of the data in the container.
+
+    Containers with a hash table (the ``HASH_TABLE_FILE`` member) only have the files whose CRC-32
+    or size in the archive differs from the table hashed again, unless ``full`` is set. So by
+    default a file changed without changing its CRC-32 or size (e.g. crafted to collide, or with
+    the central directory edited to match) isn't detected, set ``full`` to rule that out.
     """
 
-    def __init__(self):
+    def __init__(self, full=False):
+        """
+        :param full: whether every file is hashed again, even if it hasn't changed (default: False)
+        :type full: bool
+        """
+
         super().__init__("Data Integrity", "Checks whether the contents of the container are the same as when it was genererated.")
+        self.full = full
+
+    def hash_changed_files(self, container, algorithm, table):
+        """
+        Hash the files whose CRC-32 or size changed since the hash table was generated (every
+        file when ``full`` is set), returning the hash of every file in the container.
+
+        :param container: the data container
+        :type container: :class:`surround.data.container.DataContainer`
+        :param algorithm: name of the algorithm the table was hashed with
+        :type algorithm: str
+        :param table: the CRC-32, size and hash of each file by name, see :func:`unpack_hash_table`
+        :type table: dict
+        :returns: the hash in hexadecimal of each file by name
+        :rtype: dict
+        """
+
+        skipped = ('manifest.yaml', HASH_TABLE_FILE)
+        with zipfile.ZipFile(container.path) as archive:
+            infos = [info for info in archive.infolist() if info.filename not in skipped and not info.is_dir()]
+
+        changed = [info.filename for info in infos if self.full or
+                   table.get(info.filename, (None, None))[:2] != (info.CRC, info.file_size)]
+        self.log_info("Hashing %i of %i files..." % (len(changed), len(infos)))
+
+        digests = {info.filename: table[info.filename][2] for info in infos if info.filename in table}
+        current = hash_members(container.path, names=changed, algorithm=algorithm)
+
+        for name, digest in current.items():
+            if name not in table:
+                self.log_error("File %s was added to the container!" % name)
+            elif digest != table[name][2]:
+                self.log_error("File %s has changed!" % name)
+            digests[name] = digest
+
+        for name in set(table) - {info.filename for info in infos}:
+            self.log_error("File %s was removed from the container!" % name)
+
+        return digests
 
     def execute(self, container, metadata):
         self.log_info("Calculating hash of the contents...")
-        current_hash = hash_zip(container.path, skip_files=['manifest.yaml'])
+        if container.file_exists(HASH_TABLE_FILE):
+            try:
+                algorithm, table = unpack_hash_table(container.extract_file_bytes(HASH_TABLE_FILE))
+            except (ValueError, IndexError, struct.error):
+                self.log_error("The hash table (%s) is corrupt!" % HASH_TABLE_FILE)
+                return
+
+            current_hash = merkle_root(self.hash_changed_files(container, algorithm, table), algorithm)
+        else:
+            # Created before the hash table was added, hashed with SHA-1 in order
+            current_hash = hash_zip(container.path, skip_files=['manifest.yaml'])
         self.log_info("Calculated hash: %s" % current_hash)
 
         self.log_info("Comparing calculated hash with the hash in the metadata...")
@@ -181,11 +242,16 @@ class DataLinter:
     Represents the linter pipeline that checks the validity of the data container provided.
     """
 
-    def __init__(self):
+    def __init__(self, full=False):
+        """
+        :param full: whether every file is hashed when checking the integrity, not just changed ones (default: False)
+        :type full: bool
+        """
+
         self.info = []
         self.warnings = []
         self.errors = []
-        self.stages = [CheckDataIntegrity(), CheckFormats(), CheckMetadata()]
+        self.stages = [CheckDataIntegrity(full), CheckFormats(), CheckMetadata()]
 
     def list_stages(self):
         """
@@ -224,33 +290,35 @@ class DataLinter:
 
             return False
 
-        metadata = container.metadata
-        stages = [self.stages[check_id - 1]] if check_id is not None else self.stages
+        # The container keeps the archive open, close it once the checks are done
+        with container:
+            metadata = container.metadata
+            stages = [self.stages[check_id - 1]] if check_id is not None else self.stages
 
-        for i, stage in enumerate(stages):
-            # If we are just doing one check, skip all the rest
-            if check_id is not None and check_id != i + 1:
-                continue
+            for i, stage in enumerate(stages):
+                # If we are just doing one check, skip all the rest
+                if check_id is not None and check_id != i + 1:
+                    continue
 
-            if verbose:
-                print("============[Check #%i: %s]============" % (i + 1, stage.name))
+                if verbose:
+                    print("============[Check #%i: %s]============" % (i + 1, stage.name))
 
-            # Setup the stage
-            stage.verbose = verbose
-            stage.info.clear()
-            stage.errors.clear()
-            stage.warnings.clear()
+                # Setup the stage
+                stage.verbose = verbose
+                stage.info.clear()
+                stage.errors.clear()
+                stage.warnings.clear()
 
-            # Perform the linting stage
-            stage.execute(container, metadata)
+                # Perform the linting stage
+                stage.execute(container, metadata)
 
-            if verbose:
-                print()
+                if verbose:
+                    print()
 
-            # Keep all results from the stage
-            self.info.extend(stage.info)
-            self.warnings.extend(stage.warnings)
-            self.errors.extend(stage.errors)
+                # Keep all results from the stage
+                self.info.extend(stage.info)
+                self.warnings.extend(stage.warnings)
+                self.errors.extend(stage.errors)
 
         if verbose:
             passed = [stage for stage in stages if not stage.errors]
@@ -1,8 +1,24 @@
 import os
 import re
+import struct
 import mimetypes
 import hashlib
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Algorithm hashing the files in new containers, see hash_members
+DEFAULT_HASH_ALGORITHM = 'blake2b'
+
+# Size of the chunks files are read in while hashing
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Member of new containers storing the hash, CRC and size of each file, see pack_hash_table
+HASH_TABLE_FILE = 'manifest.hashes'
+
+# Start of the hash table member and the layout of its header and of each file's entry
+HASH_TABLE_MAGIC = b'SRHT\x01'
+HASH_TABLE_HEADER = struct.Struct('<B32sI')
+HASH_TABLE_ENTRY = struct.Struct('<HIQ')
 
 # Format to Type mapping via regular expression
 TYPE_FORMAT_MAPPING = {
@@ -14,6 +30,26 @@ TYPE_FORMAT_MAPPING = {
     'Collection': ['application/x-zip-compressed']
 }
 
+# Formats that are already compressed, so are stored in containers without compression
+COMPRESSED_FORMATS = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'video/.*', 'audio/mpeg', 'audio/aac', 'audio/ogg', 'audio/flac',
+    'application/zip', 'application/x-zip-compressed', 'application/gzip', 'application/x-gzip',
+    'application/x-bzip2', 'application/x-xz', 'application/x-7z-compressed',
+]
+
+def is_compressed_format(path):
+    """
+    Returns whether the format of the file (guessed from its extension) is already compressed.
+
+    :param path: path or name of the file
+    :type path: str
+    :rtype: bool
+    """
+
+    mime = mimetypes.guess_type(path)[0]
+    return bool(mime) and any(re.fullmatch(pattern, mime) for pattern in COMPRESSED_FORMATS)
+
 def get_formats_from_directory(directory):
     results = []
     for _, _, files in os.walk(directory):
@@ -79,22 +115,62 @@ def prompt(question, required=True, answer_type=str, error_msg='Invalid answer,
         print()
         return answer
 
-def hash_file(path):
-    sha1 = hashlib.sha1()
-    block_size = 256 * 1024 * 1024
+def get_hasher(algorithm):
+    """
+    Returns a new hash object of the algorithm, any available in :mod:`hashlib` or ``blake3``
+    (requires the blake3 package).
+
+    :param algorithm: name of the algorithm e.g. sha1, sha256 or blake2b
+    :type algorithm: str
+    :returns: the hash object
+    """
+
+    if algorithm == 'blake3':
+        try:
+            import blake3 # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise ValueError("The blake3 package is required to use BLAKE3 hashes")
+        return blake3.blake3()
+
+    return hashlib.new(algorithm)
+
+def hash_file(path, algorithm='sha1'):
+    hasher = get_hasher(algorithm)
 
     with open(path, 'rb') as f:
         while True:
-            data = f.read(block_size)
+            data = f.read(HASH_BUFFER_SIZE)
             if not data:
                 break
-            sha1.update(data)
+            hasher.update(data)
 
-    return sha1.hexdigest()
+    return hasher.hexdigest()
+
+def hash_zip(path, skip_files=None, algorithm=None, workers=None):
+    """
+    Returns the hash of the contents of a zip file.
+
+    When an algorithm is given the files are hashed in parallel and combined with
+    :func:`merkle_root`, otherwise the hash is the SHA-1 of the contents of every file
+    concatenated in the order they are stored (as in containers created without a
+    ``HASH_TABLE_FILE``).
+
+    :param path: path to the zip file
+    :type path: str
+    :param skip_files: names of files that aren't hashed (default: None)
+    :type skip_files: list
+    :param algorithm: name of the algorithm hashing each file (default: None)
+    :type algorithm: str
+    :param workers: number of threads hashing files (default: number of CPUs, up to 8)
+    :type workers: int
+    :returns: the hash in hexadecimal
+    :rtype: str
+    """
+
+    if algorithm:
+        return merkle_root(hash_members(path, skip_files=skip_files, algorithm=algorithm, workers=workers), algorithm)
 
-def hash_zip(path, skip_files=None):
     sha1 = hashlib.sha1()
-    block_size = 256 * 1024 * 1024
 
     with zipfile.ZipFile(path) as zipf:
         for name in zipf.namelist():
@@ -103,7 +179,7 @@ def hash_zip(path, skip_files=None):
 
             with zipf.open(name) as f:
                 while True:
-                    data = f.read(block_size)
+                    data = f.read(HASH_BUFFER_SIZE)
 
                     if not data:
                         break
@@ -112,5 +188,136 @@ def hash_zip(path, skip_files=None):
 
     return sha1.hexdigest()
 
+def hash_members(path, names=None, skip_files=None, algorithm=DEFAULT_HASH_ALGORITHM, workers=None):
+    """
+    Hash the contents of files in a zip file on a pool of threads (decompressing and hashing
+    release the GIL).
+
+    :param path: path to the zip file
+    :type path: str
+    :param names: names of the files to hash, None hashes every file (default: None)
+    :type names: list
+    :param skip_files: names of files that aren't hashed (default: None)
+    :type skip_files: list
+    :param algorithm: name of the algorithm (default: blake2b)
+    :type algorithm: str
+    :param workers: number of threads hashing files (default: number of CPUs, up to 8)
+    :type workers: int
+    :returns: the hash in hexadecimal of each file by name
+    :rtype: dict
+    """
+
+    def hash_member(zipf, info):
+        hasher = get_hasher(algorithm)
+        with zipf.open(info) as f:
+            while True:
+                data = f.read(HASH_BUFFER_SIZE)
+                if not data:
+                    break
+                hasher.update(data)
+        return hasher.hexdigest()
+
+    with zipfile.ZipFile(path) as zipf:
+        infos = [info for info in zipf.infolist() if not info.is_dir()]
+        if names is not None:
+            names = set(names)
+            infos = [info for info in infos if info.filename in names]
+        if skip_files:
+            infos = [info for info in infos if info.filename not in skip_files]
+
+        # Reads of the shared file are serialised by ZipFile, hash the largest files first
+        infos.sort(key=lambda info: -info.file_size)
+        with ThreadPoolExecutor(max_workers=workers or min(os.cpu_count() or 1, 8)) as executor:
+            digests = executor.map(lambda info: hash_member(zipf, info), infos)
+            return {info.filename: digest for info, digest in zip(infos, digests)}
+
+def merkle_root(digests, algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Combine the hashes of files into the root of a Merkle tree. The leaves are sorted by name
+    so the root doesn't depend on the order the files are stored or hashed in.
+
+    :param digests: the hash in hexadecimal of each file by name
+    :type digests: dict
+    :param algorithm: name of the algorithm (default: blake2b)
+    :type algorithm: str
+    :returns: the root hash in hexadecimal
+    :rtype: str
+    """
+
+    def digest(*parts):
+        hasher = get_hasher(algorithm)
+        for part in parts:
+            hasher.update(part)
+        return hasher.digest()
+
+    # Leaves and nodes are prefixed differently so a node can't be passed off as a leaf
+    level = []
+    for name, file_digest in sorted(digests.items()):
+        name = name.encode('utf-8')
+        level.append(digest(b'\x00', struct.pack('<I', len(name)), name, bytes.fromhex(file_digest)))
+
+    if not level:
+        return digest(b'').hex()
+
+    while len(level) > 1:
+        level = [digest(b'\x01', *level[i:i + 2]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+
+    return level[0].hex()
+
+def pack_hash_table(algorithm, entries):
+    """
+    Pack the hashes of the files in a container into the compact binary table stored in
+    ``HASH_TABLE_FILE``: a header with the algorithm and the number of files, then the name,
+    CRC-32, size and raw digest of each file.
+
+    :param algorithm: name of the algorithm the files were hashed with
+    :type algorithm: str
+    :param entries: the name, CRC-32, size and hash in hexadecimal of each file
+    :type entries: list of tuple
+    :returns: the packed table
+    :rtype: bytes
+    """
+
+    entries = list(entries)
+    parts = [HASH_TABLE_MAGIC, HASH_TABLE_HEADER.pack(len(algorithm), algorithm.encode('ascii'), len(entries))]
+
+    for name, crc, size, digest in entries:
+        name = name.encode('utf-8')
+        digest = bytes.fromhex(digest)
+        parts.append(HASH_TABLE_ENTRY.pack(len(name), crc, size))
+        parts.extend((name, bytes([len(digest)]), digest))
+
+    return b''.join(parts)
+
+def unpack_hash_table(data):
+    """
+    Unpack a table packed by :func:`pack_hash_table`.
+
+    :param data: the packed table
+    :type data: bytes
+    :returns: the algorithm and the CRC-32, size and hash in hexadecimal of each file by name
+    :rtype: tuple
+    """
+
+    if not data.startswith(HASH_TABLE_MAGIC):
+        raise ValueError("Unsupported hash table")
+
+    offset = len(HASH_TABLE_MAGIC)
+    length, algorithm, count = HASH_TABLE_HEADER.unpack_from(data, offset)
+    offset += HASH_TABLE_HEADER.size
+
+    table = {}
+    for _ in range(count):
+        name_length, crc, size = HASH_TABLE_ENTRY.unpack_from(data, offset)
+        offset += HASH_TABLE_ENTRY.size
+        name = data[offset:offset + name_length].decode('utf-8')
+        digest_length = data[offset + name_length]
+        offset += name_length + 1
+        table[name] = (crc, size, data[offset:offset + digest_length].hex())
+        offset += digest_length
+
+    return algorithm[:length].decode('ascii'), table
+
 def split_unique(pattern, data, strip=False):
     return list({d.strip() if strip else d for d in re.split(pattern, data)})
@@ -1,7 +1,6 @@
 
 import os
 from pathlib import Path
-from pylint.lint import Run
 
 class Linter():
     """
@@ -23,6 +22,8 @@ class Linter():
         print("Checkers in Surround's linter")
         print("=============================")
 
+        from pylint.lint import Run # pylint: disable=import-outside-toplevel
+
         try:
             Run(['--list-msgs-enabled'])
         except SystemExit:
@@ -57,5 +58,8 @@ class Linter():
         for msg in disable_msgs:
             args.append('--disable=%s' % msg)
 
+        # Pylint is slow to import, so it is only imported when linting
+        from pylint.lint import Run # pylint: disable=import-outside-toplevel
+
         result = Run(args, do_exit=False)
         return result.linter.msg_status == 0
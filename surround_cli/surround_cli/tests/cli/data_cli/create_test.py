@@ -1,6 +1,7 @@
 import os
 import shutil
 import unittest
+import zipfile
 import subprocess
 
 from surround_cli.data.container import DataContainer
@@ -69,3 +70,22 @@ class CreateDataContainerTest(unittest.TestCase):
 
         self.assertTrue(all([container.file_exists("test_group/%i.png" % i) for i in range(100)]))
         self.assertTrue(all([container.file_exists("derp_%i.jpg" % i) for i in range(20)]))
+
+    def test_store_larger_than(self):
+        with open("temp/large.bin", "wb") as f:
+            f.write(b'\x00' * 2 * 1024 * 1024)
+
+        with open("temp/notes.txt", "w") as f:
+            f.write("test notes")
+
+        std_input = "Test name\nTest title\nTest description\nTest publisher\nTest contributor\n"
+        std_input += "2019-02-03T24:00\ntest\n1\n1\nn\n\n\n\nTest group description\n1\n"
+
+        subprocess.run(['surround', 'data', 'create', '-d', 'temp', '-o', 'temp.data.zip', '--store-larger-than', '1'], input=std_input, encoding='ascii', check=True)
+
+        with zipfile.ZipFile("temp.data.zip") as archive:
+            self.assertEqual(archive.getinfo("large.bin").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo("notes.txt").compress_type, zipfile.ZIP_DEFLATED)
+
+        with DataContainer('temp.data.zip') as container:
+            self.assertEqual(len(container.member_view("large.bin")), 2 * 1024 * 1024)
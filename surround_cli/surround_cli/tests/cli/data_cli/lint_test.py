@@ -1,9 +1,40 @@
 import os
 import shutil
+import zipfile
 import unittest
 import subprocess
+from unittest import mock
 
+import yaml
+
+from surround_cli.data import linter
 from surround_cli.data.container import DataContainer
+from surround_cli.data.linter import DataLinter
+from surround_cli.data.util import HASH_TABLE_FILE, hash_zip, hash_members, merkle_root
+from surround_cli.data.util import pack_hash_table, unpack_hash_table
+
+def rewrite_container(path, changes):
+    """
+    Rewrite the files in the container, changes maps the names of files to their new contents
+    (or None to remove them).
+    """
+
+    with zipfile.ZipFile(path) as archive:
+        files = [(name, archive.read(name)) for name in archive.namelist()]
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            data = changes.pop(name, data)
+            if data is not None:
+                archive.writestr(name, data)
+
+        for name, data in changes.items():
+            archive.writestr(name, data)
+
+def integrity_errors(path, full=False):
+    lint = DataLinter(full=full)
+    lint.lint(path, check_id=1)
+    return lint.errors
 
 class LintDataContainerTest(unittest.TestCase):
     def setUp(self):
@@ -46,3 +77,87 @@ class LintDataContainerTest(unittest.TestCase):
         self.assertIn("Your container looks good.", output)
 
         process.stdout.close()
+
+    def test_container_closed(self):
+        # The container keeps its archive open, the linter must close it when done
+        containers = []
+
+        def open_container(path):
+            containers.append(DataContainer(path))
+            return containers[-1]
+
+        with mock.patch.object(linter, 'DataContainer', side_effect=open_container):
+            self.assertEqual(integrity_errors('temp.data.zip'), [])
+
+        self.assertEqual(len(containers), 1)
+        self.assertIsNone(containers[0]._DataContainer__reader) # pylint: disable=protected-access
+
+    def test_only_changed_files_hashed(self):
+        with mock.patch.object(linter, 'hash_members', wraps=hash_members) as hashed:
+            self.assertEqual(integrity_errors('temp.data.zip'), [])
+            self.assertEqual(hashed.call_args[1]['names'], [])
+
+            rewrite_container('temp.data.zip', {'test_group/3.png': b'changed data'})
+            errors = integrity_errors('temp.data.zip')
+
+            self.assertEqual(hashed.call_args[1]['names'], ['test_group/3.png'])
+            self.assertIn("File test_group/3.png has changed!", errors)
+            self.assertIn("Hash mismatch detected!", errors)
+
+            self.assertIn("File test_group/3.png has changed!", integrity_errors('temp.data.zip', full=True))
+            self.assertEqual(len(hashed.call_args[1]['names']), 120)
+
+    def test_added_and_removed_files(self):
+        rewrite_container('temp.data.zip', {'test_group/3.png': None, 'extra.png': b'test data'})
+        errors = integrity_errors('temp.data.zip')
+
+        self.assertIn("File test_group/3.png was removed from the container!", errors)
+        self.assertIn("File extra.png was added to the container!", errors)
+
+    def test_legacy_container(self):
+        # Containers created without a hash table have a SHA-1 of their contents as an identifier
+        with zipfile.ZipFile('temp.data.zip') as archive:
+            metadata = yaml.safe_load(archive.read('manifest.yaml'))
+
+        metadata['summary']['identifier'] = hash_zip('temp.data.zip', skip_files=['manifest.yaml', HASH_TABLE_FILE])
+        rewrite_container('temp.data.zip', {'manifest.yaml': yaml.dump(metadata), HASH_TABLE_FILE: None})
+        self.assertEqual(integrity_errors('temp.data.zip'), [])
+
+        rewrite_container('temp.data.zip', {'derp_1.jpg': b'changed data'})
+        self.assertIn("Hash mismatch detected!", integrity_errors('temp.data.zip'))
+
+    def test_hash_algorithms(self):
+        container = DataContainer()
+        container.import_directory('temp/')
+        container.export('temp.data.zip', hash_algorithm='sha256')
+
+        skip_files = ['manifest.yaml', HASH_TABLE_FILE]
+        identifier = container.metadata['summary']['identifier']
+        with zipfile.ZipFile('temp.data.zip') as archive:
+            self.assertEqual(unpack_hash_table(archive.read(HASH_TABLE_FILE))[0], 'sha256')
+        self.assertEqual(len(identifier), 64)
+        self.assertEqual(hash_zip('temp.data.zip', skip_files=skip_files, algorithm='sha256', workers=2), identifier)
+
+        # The root doesn't depend on the order of the files
+        digests = hash_members('temp.data.zip', skip_files=skip_files, algorithm='sha256')
+        self.assertEqual(merkle_root(dict(reversed(list(digests.items()))), 'sha256'), identifier)
+        self.assertNotEqual(merkle_root(digests, 'blake2b'), identifier)
+        self.assertEqual(integrity_errors('temp.data.zip'), [])
+
+    def test_hash_table(self):
+        # The table is kept out of the metadata
+        with zipfile.ZipFile('temp.data.zip') as archive:
+            self.assertNotIn('hashes', yaml.safe_load(archive.read('manifest.yaml')))
+            algorithm, table = unpack_hash_table(archive.read(HASH_TABLE_FILE))
+            info = archive.getinfo('test_group/3.png')
+
+        self.assertEqual(algorithm, 'blake2b')
+        self.assertEqual(len(table), 120)
+        self.assertEqual(table['test_group/3.png'][:2], (info.CRC, info.file_size))
+
+        entries = [('a.txt', 1, 2, 'ab' * 32), ('dir/\u00e9.txt', 3, 2 ** 40, 'cd' * 20)]
+        packed = pack_hash_table('sha1', entries)
+        self.assertEqual(unpack_hash_table(packed), ('sha1', {name: (crc, size, digest) for name, crc, size, digest in entries}))
+
+        rewrite_container('temp.data.zip', {HASH_TABLE_FILE: packed[:20]})
+        self.assertIn("The hash table (%s) is corrupt!" % HASH_TABLE_FILE, integrity_errors('temp.data.zip'))
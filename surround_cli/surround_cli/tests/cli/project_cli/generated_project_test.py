@@ -1,9 +1,27 @@
 import os
+import sys
 import shutil
+import importlib.util
 from pathlib import Path
 import unittest
 import subprocess
 
+# Reloads the generated web runner with admission control and sends it a request
+WEB_RELOAD_SCRIPT = """
+from fastapi.testclient import TestClient
+from surround import Assembler, BaseConfig, SurroundConfig
+from webtemp.stages import Baseline, InputValidator
+from webtemp import web_runner
+
+config = BaseConfig(surround=SurroundConfig(max_in_flight_requests=1, max_queued_requests=0))
+runner = web_runner.WebRunner(Assembler("baseline", config).set_stages([InputValidator(), Baseline()]))
+runner.initialise()
+runner.initialise()
+
+response = TestClient(web_runner.APP).post("/estimate", json={"message": "hi"})
+print(len(web_runner.APP.user_middleware), response.status_code)
+"""
+
 class InitTest(unittest.TestCase):
 
     def setUp(self):
@@ -114,3 +132,19 @@ class InitTest(unittest.TestCase):
         # Remove residual directories and files
         shutil.rmtree('temp')
         shutil.rmtree('remote')
+
+@unittest.skipUnless(importlib.util.find_spec('fastapi'), "requires fastapi")
+class WebProjectTest(unittest.TestCase):
+
+    def setUp(self):
+        subprocess.run(['surround', 'init', './', '-p', 'webtemp', '-d', 'webtemp', '-n', 'Stefanus Kurniawan', '-e', 'stefanus.kurniawan@deakin.edu.au', '-w', 'True'],
+                       encoding='utf-8', stdout=subprocess.PIPE, check=True)
+
+    def test_reload_admission_control(self):
+        # Initialising again (as on SIGHUP) must not register the admission middleware twice
+        process = subprocess.run([sys.executable, '-c', WEB_RELOAD_SCRIPT], encoding='utf-8', stdout=subprocess.PIPE,
+                                 cwd='webtemp', check=True)
+        self.assertEqual(process.stdout.split(), ['1', '200'])
+
+    def tearDown(self):
+        shutil.rmtree('webtemp')
@@ -0,0 +1,29 @@
+import sys
+import unittest
+import subprocess
+
+# Packages only needed by some sub-commands, which shouldn't slow down the rest
+LAZY_PACKAGES = ["surround", "hydra", "pandas", "numpy", "pylint", "pkg_resources"]
+
+def imported_packages(args):
+    """
+    Runs the CLI with ``-X importtime`` and returns the top-level packages it imported.
+    """
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-m", "surround_cli.cli"] + args,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8", check=True)
+
+    return {line.split("|")[-1].strip().split(".")[0]
+            for line in process.stderr.splitlines() if line.startswith("import time:")}
+
+class StartupTest(unittest.TestCase):
+
+    def test_version(self):
+        packages = imported_packages(["--version"])
+        for package in LAZY_PACKAGES:
+            self.assertNotIn(package, packages)
+
+    def test_help(self):
+        packages = imported_packages(["--help"])
+        for package in LAZY_PACKAGES:
+            self.assertNotIn(package, packages)
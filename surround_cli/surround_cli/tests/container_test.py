@@ -1,9 +1,15 @@
 import os
+import pickle
 import unittest
 import zipfile
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
 
 from surround_cli.data import DataContainer
 from surround_cli.data.container import MetadataNotFoundError
+from surround_cli.data.util import HASH_TABLE_FILE, hash_zip
 
 class TestDataContainer(unittest.TestCase):
     def setUp(self):
@@ -246,3 +252,142 @@ class TestDataContainer(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             container.import_directory('this_folder_doesnt_exist')
             container.export('test-container.data.zip')
+
+    def test_read_many(self):
+        container = DataContainer()
+        container.import_directory('test_data')
+        container.export('test-container.data.zip')
+
+        with DataContainer('test-container.data.zip') as container:
+            paths = ['test_group/image3.png', 'missing.txt', 'test_file.csv', 'test_group/image0.png']
+            contents = container.read_many(paths)
+
+            self.assertEqual(contents[0], b'FAKE_DATA')
+            self.assertIsNone(contents[1])
+            self.assertTrue(contents[2].startswith(b'ground_truth,predict_value'))
+            self.assertEqual(contents[3], b'FAKE_DATA')
+            self.assertEqual(container.read_many([]), [])
+
+        os.unlink('test-container.data.zip')
+
+    def test_export_parallel(self):
+        container = DataContainer()
+        container.import_directory('test_data')
+        container.import_data(b'\xff\xd8\xff' * 1000, 'photo.jpg')
+        container.export('test-container.data.zip', compression_level=9, workers=3)
+
+        self.assertEqual(container.metadata['summary']['identifier'],
+                         hash_zip('test-container.data.zip', skip_files=['manifest.yaml', HASH_TABLE_FILE],
+                                  algorithm='blake2b'))
+
+        with zipfile.ZipFile('test-container.data.zip', 'r') as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist()[-1], 'manifest.yaml')
+            self.assertEqual(archive.getinfo('photo.jpg').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo('test_file.csv').compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.read('photo.jpg'), b'\xff\xd8\xff' * 1000)
+
+        with DataContainer('test-container.data.zip') as loaded:
+            self.assertEqual(loaded.extract_file_bytes('test_group/image0.png'), b'FAKE_DATA')
+
+        os.unlink('test-container.data.zip')
+
+    def test_export_streamed(self):
+        container = DataContainer()
+        container.import_directory('test_data')
+        container.export('test-container.data.zip', store_compressed_formats=False)
+        expected = container.metadata['summary']['identifier']
+
+        with zipfile.ZipFile('test-container.data.zip', 'r') as archive:
+            self.assertEqual(archive.getinfo('test_group/image0.png').compress_type, zipfile.ZIP_DEFLATED)
+
+        # Stream every file instead of compressing them on the workers
+        with mock.patch('surround_cli.data.container.STREAM_THRESHOLD', 0):
+            container = DataContainer()
+            container.import_directory('test_data')
+            container.export('test-container-streamed.data.zip', store_compressed_formats=False)
+
+        self.assertEqual(container.metadata['summary']['identifier'], expected)
+        with zipfile.ZipFile('test-container-streamed.data.zip', 'r') as archive:
+            self.assertIsNone(archive.testzip())
+
+        os.unlink('test-container.data.zip')
+        os.unlink('test-container-streamed.data.zip')
+
+    def test_export_round_trip(self):
+        photo = b'\xff\xd8\xff' * 1000
+
+        # Stream the CSV file and buffer at most two images at a time on the workers
+        with mock.patch('surround_cli.data.container.STREAM_THRESHOLD', 16), \
+             mock.patch('surround_cli.data.container.MAX_BUFFERED_BYTES', 20):
+            container = DataContainer()
+            container.import_directory('test_data')
+            container.import_data(photo, 'photo.jpg')
+            container.export('test-container.data.zip', workers=4, store_larger_than=8)
+
+        with zipfile.ZipFile('test-container.data.zip', 'r') as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.getinfo('photo.jpg').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo('test_group/image0.png').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.read('photo.jpg'), photo)
+
+            with open('test_data/test_file.csv', 'rb') as f:
+                self.assertEqual(archive.read('test_file.csv'), f.read())
+
+            for i in range(20):
+                self.assertEqual(archive.read('test_group/image%i.png' % i), b'FAKE_DATA')
+
+        os.unlink('test-container.data.zip')
+
+    def test_member_view(self):
+        array = numpy.arange(1000, dtype='float32')
+
+        container = DataContainer()
+        container.import_directory('test_data')
+        container.import_data(array.tobytes(), 'array.bin')
+        container.export('test-container.data.zip', store_larger_than=1000)
+
+        with DataContainer('test-container.data.zip') as container:
+            view = container.member_view('array.bin')
+            self.assertEqual(view.tobytes(), array.tobytes())
+            self.assertTrue(view.readonly)
+
+            mapped = container.member_array('array.bin', dtype='float32')
+            self.assertEqual(mapped.offset % 64, 0)
+            self.assertTrue(numpy.array_equal(mapped, array))
+            self.assertEqual(container.member_array('array.bin', dtype='float32', shape=(10, 100)).shape, (10, 100))
+
+            self.assertIsNone(container.member_view('missing.bin'))
+            self.assertRaises(ValueError, container.member_view, 'test_file.csv')
+
+        # Closing the container while the view is in use leaves it valid
+        self.assertEqual(view.tobytes(), array.tobytes())
+        del view, mapped
+
+        os.unlink('test-container.data.zip')
+
+    def test_concurrent_reads(self):
+        container = DataContainer()
+        container.import_directory('test_data')
+        container.export('test-container.data.zip')
+
+        container = DataContainer('test-container.data.zip')
+        paths = ['test_group/image%i.png' % i for i in range(20)] * 10
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            contents = list(executor.map(container.extract_file_bytes, paths))
+
+        self.assertEqual(contents, [b'FAKE_DATA'] * len(paths))
+
+        # Closed containers are opened again when read
+        container.close()
+        self.assertEqual(container.extract_file_bytes('test_group/image0.png'), b'FAKE_DATA')
+
+        # Containers can be sent to other processes
+        copy = pickle.loads(pickle.dumps(container))
+        self.assertEqual(copy.extract_file_bytes('test_group/image1.png'), b'FAKE_DATA')
+        self.assertTrue(copy.file_exists('test_file.csv'))
+
+        container.close()
+        copy.close()
+        os.unlink('test-container.data.zip')
@@ -0,0 +1,102 @@
+import os
+import json
+import pickle
+import shutil
+import unittest
+
+from surround_cli.data import DataContainer, ContainerDataset
+
+def decode_json(data, path):
+    return json.loads(data)
+
+class TestContainerDataset(unittest.TestCase):
+    def setUp(self):
+        os.makedirs('dataset_data/train')
+        os.makedirs('dataset_data/test')
+
+        for i in range(20):
+            with open('dataset_data/train/%i.json' % i, 'w+') as f:
+                json.dump({'index': i}, f)
+
+        for i in range(5):
+            with open('dataset_data/test/%i.txt' % i, 'w+') as f:
+                f.write('test %i' % i)
+
+        with open('dataset_data/labels.csv', 'w+') as f:
+            f.write('index,label\n')
+
+        container = DataContainer()
+        container.import_directory('dataset_data')
+        container.export('dataset.data.zip')
+
+    def tearDown(self):
+        shutil.rmtree('dataset_data')
+        os.unlink('dataset.data.zip')
+
+    def test_groups(self):
+        dataset = ContainerDataset('dataset.data.zip', prefetch=0)
+        self.assertEqual(len(dataset), 25)
+        self.assertEqual({sample.group for sample in dataset}, {'train', 'test'})
+
+        dataset = ContainerDataset('dataset.data.zip', groups=['test'])
+        samples = list(dataset)
+        self.assertEqual(sorted(sample.path for sample in samples), ['test/%i.txt' % i for i in range(5)])
+        self.assertEqual(samples[0].data, ('test %s' % samples[0].path[5]).encode())
+        self.assertEqual(samples[0].mime_type, 'text/plain')
+        self.assertEqual(dataset[1], samples[1])
+
+        self.assertRaises(ValueError, ContainerDataset, 'dataset.data.zip', groups=['missing'])
+
+    def test_no_groups(self):
+        container = DataContainer()
+        container.import_file('dataset_data/labels.csv', 'labels.csv')
+        container.export('labels.data.zip')
+
+        dataset = ContainerDataset('labels.data.zip')
+        self.assertEqual([sample.path for sample in dataset], ['labels.csv'])
+
+        os.unlink('labels.data.zip')
+
+    def test_decoders(self):
+        dataset = ContainerDataset('dataset.data.zip', groups=['train', 'test'], decoders={'application/json': decode_json})
+        dataset.add_decoder('text/.*', lambda data, path: data.decode('utf-8'))
+
+        samples = {sample.path: sample.data for sample in dataset}
+        self.assertEqual(samples['train/3.json'], {'index': 3})
+        self.assertEqual(samples['test/3.txt'], 'test 3')
+
+    def test_shuffle(self):
+        ordered = [sample.path for sample in ContainerDataset('dataset.data.zip')]
+
+        dataset = ContainerDataset('dataset.data.zip', shuffle=True, seed=1)
+        first = [sample.path for sample in dataset]
+        self.assertNotEqual(first, ordered)
+        self.assertEqual(sorted(first), sorted(ordered))
+        self.assertEqual([sample.path for sample in ContainerDataset('dataset.data.zip', shuffle=True, seed=1)], first)
+
+        dataset.set_epoch(1)
+        second = [sample.path for sample in dataset]
+        self.assertNotEqual(second, first)
+        self.assertEqual(sorted(second), sorted(ordered))
+
+    def test_shards(self):
+        shards = [ContainerDataset('dataset.data.zip', shuffle=True, seed=7, num_shards=3, shard_index=i, prefetch=4, workers=2)
+                  for i in range(3)]
+        paths = [[sample.path for sample in shard] for shard in shards]
+
+        self.assertEqual([len(shard) for shard in shards], [9, 8, 8])
+        self.assertEqual(sum(len(shard_paths) for shard_paths in paths), 25)
+        self.assertEqual(len(set().union(*paths)), 25)
+
+        self.assertRaises(ValueError, ContainerDataset, 'dataset.data.zip', num_shards=2, shard_index=2)
+
+    def test_pickle(self):
+        dataset = ContainerDataset('dataset.data.zip', groups=['train'], decoders={'application/json': decode_json}, shuffle=True, seed=3)
+        copy = pickle.loads(pickle.dumps(dataset))
+        self.assertEqual(list(copy), list(dataset))
+
+    def test_stop_early(self):
+        dataset = ContainerDataset('dataset.data.zip', prefetch=2)
+        iterator = iter(dataset)
+        self.assertEqual(next(iterator).path, dataset[0].path)
+        iterator.close()
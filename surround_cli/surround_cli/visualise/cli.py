@@ -2,10 +2,7 @@ import argparse
 import os
 import json
 import datetime
-import pkg_resources
-import pandas as pd
-
-from .visualise_classifier import VisualiseClassifier, VisualiseClassifierData
+from importlib.metadata import version
 
 def get_failed_set(y_true, y_pred):
     """
@@ -106,6 +103,12 @@ def execute_visualise_tool(parser, args, extra_args):
     :type args: :class:`argparse.Namespace`
     """
 
+    # Imported here so the rest of the CLI doesn't have to wait for pandas and numpy to load
+    # pylint: disable=import-outside-toplevel
+    import pandas as pd
+    from omegaconf import OmegaConf
+    from .visualise_classifier import VisualiseClassifier, VisualiseClassifierData
+
     # Get the ground truth and prediction column names from the users arguments
     ground_truth_columns = args.ground_truth.split(",")
     prediction_columns = args.predictions.split(",")
@@ -196,6 +199,8 @@ def export_incorrect_results(dir_path, file_contents, sep, ground_truth_columns,
     :type prediction_columns: list
     """
 
+    import pandas as pd # pylint: disable=import-outside-toplevel
+
     incorrect_records_df = pd.DataFrame(data=None, index=None, columns=ground_truth_columns + prediction_columns)
 
     for i, ground_truth_column in enumerate(ground_truth_columns):
@@ -260,7 +265,7 @@ def export_results_html(results, output_dir, normalize):
                 predict_label=data["predict_label"],
                 input_path=data["input_file"],
                 date_string=datetime.datetime.now(),
-                version='v%s' % pkg_resources.get_distribution('surround').version)
+                version='v%s' % version('surround'))
 
         # Write new HTML file to directory specified
         output_path = os.path.join(output_dir, "report_%s_%s.html" % (data["ground_truth_label"], data["predict_label"]))